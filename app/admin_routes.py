@@ -290,6 +290,12 @@ async def admin_update_user_info(
         raise HTTPException(status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR, detail="用户更新操作失败。")
 
     _admin_routes_logger.info(f"管理员 '{actor_uid}' 成功更新用户 '{user_uid}' 的信息。")
+    if UserTag.BANNED in updated_user.tags:
+        # 封禁时立即吊销该用户的所有活动Token (Revoke all active tokens of the user on ban)
+        revoked_count = await invalidate_all_tokens_for_user(user_uid)
+        _admin_routes_logger.info(
+            f"用户 '{user_uid}' 已被封禁，吊销了其 {revoked_count} 个活动Token。"
+        )
     await audit_logger_service.log_event(
         action_type="ADMIN_UPDATE_USER", status="SUCCESS",
         actor_uid=actor_uid, actor_ip=client_ip,
@@ -419,6 +419,25 @@ class Settings(BaseModel):
         le=64,
         description="生成的Token的字节长度（最终字符串长度为其2倍）(Byte length of generated token (string length is 2x))",
     )
+    token_storage_type: str = Field(
+        "memory",
+        description="访问Token存储类型 ('memory', 'redis')；多worker/多实例部署需使用 'redis'，连接参数复用 REDIS_* 配置 (Access token storage type; use 'redis' for multi-worker deployments, reusing REDIS_* settings)",
+    )
+    allow_query_token: bool = Field(
+        True,
+        description="是否仍接受通过查询参数 `token` 传递的访问Token（兼容旧客户端）；关闭后只接受 X-Auth-Token 请求头 (Whether access tokens passed in the `token` query parameter are still accepted for older clients; when off only the X-Auth-Token header is accepted)",
+    )
+    bcrypt_target_ms: int = Field(
+        250,
+        ge=0,
+        description="启动时按本机CPU调整 bcrypt 轮数，使单次密码哈希不超过此毫秒数（最低10轮）；0 表示不调整 (Tune bcrypt rounds at startup so one password hash stays within this many ms (at least 10 rounds); 0 disables tuning)",
+    )
+    bcrypt_rounds: Optional[int] = Field(
+        None,
+        ge=4,
+        le=31,
+        description="固定的 bcrypt 轮数；设置后不再按 bcrypt_target_ms 自动调整。生产环境建议不低于12，测试/开发环境可设为4 (Fixed bcrypt cost; when set, bcrypt_target_ms tuning is skipped. Keep at least 12 in production; test/dev may use 4)",
+    )
 
     num_questions_per_paper_default: int = Field(
         50,
@@ -481,6 +500,19 @@ class Settings(BaseModel):
         default_factory=DatabaseFilesConfig,
         description="JSON数据库文件名配置 (JSON database filename config)",
     )
+    json_flush_interval_seconds: float = Field(
+        0.0,
+        ge=0,
+        description="JSON存储的写入合并窗口（秒）；窗口内的多次修改只重写一次文件，0 表示每次修改立即写入 (Write-coalescing window in seconds for JSON storage; changes within the window rewrite the file once, 0 writes on every change)",
+    )
+    json_lazy_load: bool = Field(
+        False,
+        description="JSON存储是否在首次访问某实体类型时才加载其数据文件，而不是启动时全部加载 (Whether JSON storage loads an entity type's data file on first access instead of all files at startup)",
+    )
+    json_durable_entity_types: List[str] = Field(
+        default_factory=lambda: ["user"],
+        description="JSON存储中每次写入都 fsync 落盘的实体类型；其他类型仍原子替换文件但不等待 fsync (JSON entity types fsynced on every write; others are still replaced atomically without fsync)",
+    )
     question_library_path: str = Field(
         "library",
         description="题库文件存放的相对路径 (相对于 data_dir) (Relative path for question library (to data_dir))",
@@ -495,7 +527,7 @@ class Settings(BaseModel):
 
     data_storage_type: str = Field(
         "json",
-        description="数据存储类型 ('json', 'sqlite', 'postgres', 'mysql', 'redis') (Data storage type)",
+        description="数据存储类型 ('json', 'jsonl', 'sqlite', 'postgres', 'mysql', 'redis')；'jsonl' 为追加写入的JSON Lines文件 (Data storage type; 'jsonl' is append-only JSON Lines files)",
     )
 
     POSTGRES_HOST: Optional[str] = Field(
@@ -542,6 +574,26 @@ class Settings(BaseModel):
     MYSQL_DB: Optional[str] = Field(
         None, env="MYSQL_DB", description="MySQL 数据库名 (MySQL database name)"
     )
+    MYSQL_POOL_MINSIZE: int = Field(
+        default_factory=lambda: int(os.getenv("MYSQL_POOL_MINSIZE", "1")),
+        env="MYSQL_POOL_MINSIZE",
+        description="MySQL 连接池最少连接数 (MySQL pool minimum size)",
+    )
+    MYSQL_POOL_MAXSIZE: int = Field(
+        default_factory=lambda: int(os.getenv("MYSQL_POOL_MAXSIZE", "10")),
+        env="MYSQL_POOL_MAXSIZE",
+        description="MySQL 连接池最大连接数，所有 worker 合计应低于服务器 max_connections (MySQL pool maximum size; the total across workers should stay below the server's max_connections)",
+    )
+    MYSQL_POOL_RECYCLE_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("MYSQL_POOL_RECYCLE_SECONDS", "3600")),
+        env="MYSQL_POOL_RECYCLE_SECONDS",
+        description="MySQL 连接回收秒数，应小于服务器 wait_timeout，-1 表示不回收 (Seconds after which MySQL connections are recycled; keep below wait_timeout, -1 disables)",
+    )
+    MYSQL_CONNECT_TIMEOUT_SECONDS: int = Field(
+        default_factory=lambda: int(os.getenv("MYSQL_CONNECT_TIMEOUT_SECONDS", "10")),
+        env="MYSQL_CONNECT_TIMEOUT_SECONDS",
+        description="MySQL 建立连接的超时秒数 (MySQL connect timeout in seconds)",
+    )
 
     REDIS_HOST: str = Field(
         os.getenv("REDIS_HOST", "localhost"), description="Redis 主机名 (Redis host)"
@@ -5,10 +5,11 @@
 此模块定义了数据存储库的抽象基类 (ABC)，为应用提供了一个统一的数据访问接口。
 通过实现此接口，可以支持多种不同的后端存储（例如 JSON 文件、SQL 数据库、NoSQL 数据库等），
 使得上层业务逻辑与具体的存储实现解耦。
+此外还定义了外部访问Token存储的抽象基类，供多进程/多实例部署共享Token状态。
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class IDataStorageRepository(ABC):
@@ -171,7 +172,82 @@ class IDataStorageRepository(ABC):
         pass
 
 
-__all__ = ["IDataStorageRepository"]
+class ITokenStore(ABC):
+    """
+    外部访问Token存储的抽象基类 (ABC)。
+    `app.core.security` 默认使用进程内存存储Token；配置了实现此接口的外部存储后，
+    Token的签发、验证与吊销都会委托给该存储，使多个worker/实例共享同一份Token状态。
+    实现应自行处理过期（例如依赖后端的TTL机制）。
+    """
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """建立与Token存储后端的连接。"""
+        pass
+
+    @abstractmethod
+    async def disconnect(self) -> None:
+        """关闭与Token存储后端的连接。"""
+        pass
+
+    @abstractmethod
+    async def add(
+        self, token: str, user_uid: str, tags: List[str], expires_at: float
+    ) -> None:
+        """
+        保存一个新签发的Token。
+
+        参数:
+            token (str): Token字符串。
+            user_uid (str): Token所属用户的UID。
+            tags (List[str]): 用户标签的字符串值列表。
+            expires_at (float): 过期时间戳 (time.time() 的浮点数表示)。
+        """
+        pass
+
+    @abstractmethod
+    async def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        获取Token数据。
+
+        返回:
+            Optional[Dict[str, Any]]: 包含 "user_uid"、"tags" (字符串值列表) 和 "expires_at" 的字典；
+                                      Token不存在或已过期时返回 None。
+        """
+        pass
+
+    @abstractmethod
+    async def remove(self, token: str) -> bool:
+        """
+        删除单个Token。
+
+        返回:
+            bool: 如果Token存在并被删除则返回 True。
+        """
+        pass
+
+    @abstractmethod
+    async def remove_all_for_user(self, user_uid: str) -> int:
+        """
+        删除指定用户的所有Token。
+
+        返回:
+            int: 被删除的Token数量。
+        """
+        pass
+
+    @abstractmethod
+    async def list_all(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        列出所有未过期的Token。此操作可能较慢，仅用于管理接口。
+
+        返回:
+            List[Tuple[str, Dict[str, Any]]]: (Token字符串, Token数据) 元组列表，Token数据结构同 `get`。
+        """
+        pass
+
+
+__all__ = ["IDataStorageRepository", "ITokenStore"]
 
 if __name__ == "__main__":
     # 此模块不应作为主脚本执行
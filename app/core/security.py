@@ -13,26 +13,49 @@ It uses passlib for password handling and implements a simple in-memory token st
 
 # region 模块导入 (Module Imports)
 import asyncio  # 用于异步锁 (For asynchronous locks)
+import heapq  # 用于按过期时间排序的Token索引 (For the expiry-ordered token index)
 import logging  # 标准日志模块 (Standard logging module)
-import secrets  # 用于生成安全的随机字符串作为Token (For generating secure random strings as tokens)
+import os  # 用于从操作系统CSPRNG读取随机字节 (For reading random bytes from the OS CSPRNG)
+import threading  # 用于保护随机字节缓冲区 (For guarding the random byte buffer)
 import time
+from collections import (
+    OrderedDict,
+)  # 用于权限判定的LRU缓存 (For the permission decision LRU cache)
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)  # 用于在事件循环外执行bcrypt (For running bcrypt off the event loop)
 from datetime import (
     datetime,
-    timedelta,
     timezone,
-)  # 用于处理Token过期时间 (For handling token expiration times)
-from typing import Any, Dict, List, Optional, Set
+)  # 用于格式化Token过期时间 (For formatting token expiration times)
+from typing import (
+    Annotated,
+    Any,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from fastapi import (  # FastAPI 相关导入
     Depends,
     HTTPException,
     Query,
+    Security,
     status as http_status,
 )
+from fastapi.security import APIKeyHeader
 from passlib.context import CryptContext  # 用于密码哈希 (For password hashing)
+from starlette.requests import HTTPConnection
 
 from ..models.user_models import UserTag  # 用户标签枚举 (UserTag enum from models)
 from .config import settings  # 应用全局配置 (Application global settings)
+from .interfaces import (
+    ITokenStore,
+)  # 外部Token存储接口 (External token store interface)
 
 # endregion
 
@@ -48,10 +71,66 @@ _security_module_logger = logging.getLogger(
 # `deprecated="auto"` 会在验证旧格式哈希时自动升级到新配置（如果将来更改schemes）。
 # (`deprecated="auto"` will automatically upgrade to the new configuration when validating old format hashes
 #  (if schemes are changed in the future).)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__ident="2b")
+if settings.bcrypt_rounds is not None:
+    # 显式配置的轮数优先，启动时不再自动调整（测试/开发环境可设为4以加快哈希）
+    # (An explicitly configured cost wins and startup tuning is skipped; test/dev environments
+    #  may set 4 for fast hashing)
+    pwd_context.update(bcrypt__rounds=settings.bcrypt_rounds)
+# `tune_bcrypt_rounds` 的轮数范围；下限避免在慢速设备上降级为弱哈希
+# (Cost range for `tune_bcrypt_rounds`; the floor prevents weak hashes on slow hardware)
+_BCRYPT_MIN_ROUNDS = 10
+_BCRYPT_MAX_ROUNDS = 15
+
+# bcrypt 是CPU密集操作，在事件循环中直接执行会阻塞其他所有请求。异步版本的密码函数在此线程池中执行；
+# bcrypt 的C实现在计算期间释放GIL，多个哈希可在多核上并行。线程数有上限以限制CPU压力。
+# (bcrypt is CPU-bound and would block every other request if run on the event loop. The async password
+#  helpers run in this pool; bcrypt's C implementation releases the GIL while hashing, so several hashes
+#  run in parallel across cores. The pool is bounded to cap CPU pressure.)
+_password_executor = ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 1) * 2),
+    thread_name_prefix="bcrypt",
+)
+
+
+class _TokenEntry:
+    """
+    内存Token存储中的单个条目。使用 `__slots__` 而非字典，每个条目占用的内存约为字典的四分之一，
+    属性访问也比按字符串键取值更快。
+    (A single entry of the in-memory token store. `__slots__` instead of a dict takes roughly a
+    quarter of the memory per entry, and attribute access is faster than string-keyed lookups.)
+    """
+
+    __slots__ = ("user_uid", "tags", "expires_at_ns", "expires_at_iso")
+
+    def __init__(
+        self,
+        user_uid: str,
+        tags: FrozenSet[UserTag],
+        expires_at_ns: int,
+        expires_at_iso: Optional[str] = None,
+    ):
+        self.user_uid = user_uid
+        # 创建Token时构建一次，验证时原样返回，供权限检查直接做子集判断
+        # (Built once at token creation and returned as-is on validation, so permission
+        #  checks can test subsets directly)
+        self.tags = tags
+        # `time.monotonic_ns()` 整数时钟上的过期时间，用于所有过期比较，不受系统时间调整影响
+        # (Expiry on the integer `time.monotonic_ns()` clock, used for every expiry comparison
+        #  and unaffected by wall-clock adjustments)
+        self.expires_at_ns = expires_at_ns
+        # 过期时间的ISO字符串（墙上时间）只格式化一次，仅用于日志与管理端展示
+        # (The wall-clock ISO expiry string is formatted once, for logs and admin listings only)
+        if expires_at_iso is None:
+            expires_at_wall = time.time() + (expires_at_ns - time.monotonic_ns()) / 1e9
+            expires_at_iso = datetime.fromtimestamp(
+                expires_at_wall, tz=timezone.utc
+            ).isoformat()
+        self.expires_at_iso = expires_at_iso
+
 
 # 内存中的活动Token存储: (In-memory active token storage)
-# 结构 (Structure): {"token_string": {"user_uid": "uid", "tags": ["tag_value1"], "expires_at": timestamp}}
+# 结构 (Structure): {"token_string": _TokenEntry(...)}
 # 注意：此内存存储方案仅适用于单进程部署。
 # (Note: This in-memory storage scheme is only suitable for single-process deployments.)
 # 在多进程或多实例（如使用Gunicorn多worker或Kubernetes部署）环境中，
@@ -59,9 +138,137 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # (In multi-process or multi-instance environments (e.g., using Gunicorn multi-workers or Kubernetes),
 #  external shared storage (like Redis, Memcached, or a database) is needed to manage tokens
 #  to ensure all instances share the same token state.)
-_active_tokens: Dict[str, Dict[str, Any]] = {}
+_active_tokens: Dict[str, _TokenEntry] = {}
+# 用户到其Token的反向索引，随 `_active_tokens` 同步维护，使按用户吊销无需扫描全部Token
+# (Reverse index from user to their tokens, kept in step with `_active_tokens` so per-user
+#  revocation does not scan every token)
+_user_tokens: Dict[str, Set[str]] = {}
 _token_lock = asyncio.Lock()  # 用于对 `_active_tokens`字典进行异步操作时的并发控制
 # (Async lock for concurrent control of operations on `_active_tokens` dictionary)
+# 所有Token操作都在同一个事件循环中执行，不含 await 的字典操作天然不会被其他协程打断，
+# 因此热路径 `validate_token_and_get_user_info` 不获取此锁；写操作仍持有它以保持 `_active_tokens`
+# 与 `_expiry_heap` 的一致更新。
+# (All token operations run on one event loop, so dict operations without an await cannot be
+#  interleaved by other coroutines. The hot path `validate_token_and_get_user_info` therefore skips this
+#  lock; writers still hold it to keep `_active_tokens` and `_expiry_heap` updated together.)
+
+# 按过期时间排序的最小堆: [(expires_at_ns, token), ...] (Min-heap ordered by monotonic expiry time)
+# 定期清理只需弹出堆顶已过期的条目，无需扫描全部Token。被提前失效的Token会在堆中留下
+# 陈旧条目，弹出时通过重新检查 `_active_tokens` 惰性丢弃。
+# (Periodic cleanup only pops expired entries off the top instead of scanning every token.
+#  Tokens invalidated early leave stale heap entries, discarded lazily by re-checking `_active_tokens`.)
+_expiry_heap: List[Tuple[int, str]] = []
+
+# 一次清理中过期条目超过此数量（且超过堆的一半）时，改为按快照分批扫描 `_active_tokens` 并重建 `_expiry_heap`
+# (When a sweep hits more expired entries than this (and more than half the heap), scan a snapshot
+#  of `_active_tokens` in batches and rebuild `_expiry_heap` instead of popping key by key)
+_BULK_EVICT_MIN_COUNT = 64
+
+# 分批重建 `_expiry_heap` 期间新建Token的堆条目也记录在此，换入新堆时一并加入；未在重建时为 None
+# (While `_expiry_heap` is rebuilt in batches, heap entries of newly created tokens are also recorded
+#  here and added when the new heap is swapped in; None when no rebuild is running)
+_heap_rebuild_journal: Optional[List[Tuple[int, str]]] = None
+
+# 清理与全量遍历每批处理的条目数，每批之间释放锁并让出事件循环
+# (Entries handled per batch by cleanup and full scans; the lock is released and the event loop
+#  is yielded between batches)
+_CLEANUP_CHUNK_SIZE = 1024
+
+# 可选的外部Token存储 (Optional external token store)
+# 为 None 时使用上面的进程内存存储；通过 `configure_token_store` 设置后（如 RedisTokenStore），
+# 所有Token操作都委托给外部存储，多个worker/实例即可共享Token状态，过期由存储后端自行处理。
+# (When None, the in-process storage above is used. Once set via `configure_token_store`
+#  (e.g. RedisTokenStore), all token operations are delegated to it so several workers/instances
+#  share token state, with expiry handled by the backend.)
+_token_store: Optional[ITokenStore] = None
+
+# 外部Token存储的验证结果缓存 (Validation cache for the external token store)
+# 每次验证都要访问一次外部存储（如Redis往返）。同一Token在短时间内通常被反复使用，因此按Token缓存
+# 验证结果，并记录写入时的时间桶 (`int(time.time()) // _VALIDATE_CACHE_BUCKET_SECONDS`)，
+# 时间桶变化后缓存自动失效。本进程内的失效操作会立即清除相应条目；其他worker吊销的Token
+# 最多在一个时间桶内仍可能被本进程接受。内存存储的验证本身只是一次字典查找，不使用此缓存。
+# (Each validation costs a round trip to the external store (e.g. Redis). A token is usually reused
+#  many times in a short window, so results are cached per token together with the time bucket
+#  (`int(time.time()) // _VALIDATE_CACHE_BUCKET_SECONDS`) they were written in, and go stale when the
+#  bucket ticks. Invalidations in this process evict entries immediately; a token revoked by another
+#  worker may still be accepted here for at most one bucket. In-memory validation is a single dict
+#  lookup already and does not use this cache.)
+# 结构 (Structure): {token: (bucket, user_info, expires_at)}
+_VALIDATE_CACHE_MAX_SIZE = 4096
+_VALIDATE_CACHE_BUCKET_SECONDS = 30
+_validate_cache: "OrderedDict[str, Tuple[int, Dict[str, Any], float]]" = OrderedDict()
+
+# Token有效期（秒），在模块加载时计算一次 (Token validity in seconds, computed once at import)
+_TOKEN_TTL_SECONDS: float = settings.token_expiry_hours * 3600.0
+_TOKEN_TTL_NS: int = int(
+    _TOKEN_TTL_SECONDS * 1_000_000_000
+)  # 单调时钟上的有效期 (Validity on the monotonic clock)
+
+# 携带访问Token的请求头名称。经请求头传递的Token不会出现在URL、访问日志或Referer中；
+# 查询参数 `token` 仅在 `settings.allow_query_token` 开启时作为兼容旧客户端的后备方式。
+# (Request header carrying the access token. Tokens sent this way never appear in URLs, access logs
+#  or Referer headers; the `token` query parameter is only a fallback for older clients while
+#  `settings.allow_query_token` is enabled.)
+AUTH_TOKEN_HEADER = "X-Auth-Token"
+
+# 预先构建的认证/授权失败异常，避免每次拒绝请求都重新分配异常对象和headers字典。
+# 抛出时使用 `.with_traceback(None)` 重置回溯，防止共享实例累积历史调用栈。
+# (Prebuilt auth failure exceptions, so denials don't allocate a new exception and headers dict each time.
+#  They are raised with `.with_traceback(None)` so the shared instances don't accumulate old tracebacks.)
+_EXC_INVALID_TOKEN = HTTPException(
+    status_code=http_status.HTTP_401_UNAUTHORIZED,
+    detail="无效或已过期的Token",  # 完全中文 (Fully Chinese)
+    # 提示客户端通过 X-Auth-Token 请求头提供Token (Tells clients to send the token in the X-Auth-Token header)
+    headers={"WWW-Authenticate": f'ApiKey header="{AUTH_TOKEN_HEADER}"'},
+)
+_EXC_BANNED = HTTPException(
+    status_code=http_status.HTTP_403_FORBIDDEN,
+    detail="用户账户已被封禁",  # 完全中文 (Fully Chinese)
+)
+_EXC_FORBIDDEN = HTTPException(
+    status_code=http_status.HTTP_403_FORBIDDEN,
+    detail="权限不足 (Insufficient permissions)",
+)
+
+
+class _AuthTokenHeader(APIKeyHeader):
+    """
+    `X-Auth-Token` 请求头的安全方案，使其出现在 OpenAPI 文档中。
+    与 `APIKeyHeader` 不同，它接收 `HTTPConnection`，因此也可用于 WebSocket 路由的依赖项。
+    (Security scheme for the `X-Auth-Token` header so it appears in the OpenAPI schema. Unlike
+    `APIKeyHeader` it takes an `HTTPConnection`, so it also works in WebSocket route dependencies.)
+    """
+
+    async def __call__(self, request: HTTPConnection) -> Optional[str]:  # type: ignore[override]
+        return request.headers.get(self.model.name) or None
+
+
+auth_token_header = _AuthTokenHeader(
+    name=AUTH_TOKEN_HEADER,
+    scheme_name="AuthToken",  # OpenAPI 中的安全方案名称 (Security scheme name in OpenAPI)
+    description="用户访问Token (User access token)",
+    auto_error=False,  # 缺失时由 `_resolve_request_token` 决定是否回退到查询参数
+)
+
+# 标签值到枚举成员的映射及封禁标签，绑定为模块级名称以省去认证路径上的重复属性查找
+# (Tag value -> enum member map and the banned tag, bound at module level so the auth
+#  path skips repeated attribute lookups)
+_TAG_MAP = UserTag._value2member_map_
+_BANNED = UserTag.BANNED
+
+# Token 随机字节缓冲区 (Random byte buffer for token generation)
+# 每次生成Token都单独调用 `os.urandom` 会为区区几十字节触发一次系统调用。
+# 这里按块预取随机字节并逐段切分使用，已使用的字节不会被再次分发。
+# (Calling `os.urandom` per token costs a syscall for a few dozen bytes. Random bytes
+#  are prefetched in chunks and handed out slice by slice; consumed bytes are never reused.)
+_RAND_BUFFER_SIZE = (
+    4096  # 单次预取的字节数，保持在几KB以内 (Bytes per refill, kept to a few KB)
+)
+_rand_buf = bytearray()
+_rand_pos = 0
+_rand_lock = (
+    threading.Lock()
+)  # 缓冲区可能被多个线程访问 (Buffer may be accessed from several threads)
 # endregion
 
 # region 密码工具函数 (Password Utility Functions)
@@ -105,18 +312,158 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    `verify_password` 的异步版本，在密码线程池中执行，不阻塞事件循环。
+    (Async version of `verify_password`; runs in the password thread pool without blocking the event loop.)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def aget_password_hash(password: str) -> str:
+    """
+    `get_password_hash` 的异步版本，在密码线程池中执行，不阻塞事件循环。
+    (Async version of `get_password_hash`; runs in the password thread pool without blocking the event loop.)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
+def tune_bcrypt_rounds(
+    target_ms: int,
+    min_rounds: int = _BCRYPT_MIN_ROUNDS,
+    max_rounds: int = _BCRYPT_MAX_ROUNDS,
+) -> int:
+    """
+    在当前CPU上测量 bcrypt 哈希耗时，选择耗时不超过 `target_ms` 的最大轮数，
+    并将其设为 `pwd_context` 的默认轮数。轮数每加一耗时翻倍，因此一旦超时即停止测量。
+    结果不会低于 `min_rounds`，即使在慢速设备上也不会降级到不安全的成本。
+    已有的哈希中记录了各自的轮数，仍可正常验证。
+
+    (Measures bcrypt hashing time on the current CPU, picks the largest cost that stays within
+    `target_ms`, and makes it the default for `pwd_context`. Each extra round doubles the cost,
+    so measuring stops at the first round over budget. The result never drops below `min_rounds`,
+    even on slow hardware. Existing hashes carry their own cost and still verify.)
+
+    参数 (Args):
+        target_ms (int): 单次哈希的目标耗时上限（毫秒）。(Target upper bound per hash, in ms.)
+        min_rounds (int): 允许的最小轮数。(Lowest cost allowed.)
+        max_rounds (int): 测量的最大轮数。(Highest cost measured.)
+
+    返回 (Returns):
+        int: 选定的轮数。(The chosen cost.)
+    """
+    bcrypt_handler = pwd_context.handler("bcrypt")
+    chosen_rounds = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        bcrypt_handler.using(rounds=rounds).hash("bcrypt-calibration")
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        if elapsed_ms > target_ms:
+            break
+        chosen_rounds = rounds
+    pwd_context.update(bcrypt__rounds=chosen_rounds)  # 原地更新，已导入的引用同样生效
+    _security_module_logger.info(
+        "bcrypt 轮数已调整为 %d (目标 %d ms)。(bcrypt rounds tuned to %d (target %d ms).)",
+        chosen_rounds,
+        target_ms,
+        chosen_rounds,
+        target_ms,
+    )
+    return chosen_rounds
+
+
 # endregion
 
 # region Token 工具函数 (Token Utility Functions)
 
 
+def _discard_user_token(user_uid: str, token: str) -> None:
+    """
+    从反向索引中移除Token，用户已无Token时删除其集合。
+    (Removes a token from the reverse index, dropping the user's set once it is empty.)
+    """
+    user_token_set = _user_tokens.get(user_uid)
+    if user_token_set is not None:
+        user_token_set.discard(token)
+        if not user_token_set:
+            del _user_tokens[user_uid]
+
+
+def _rand_bytes(n: int) -> bytes:
+    """
+    从预取的CSPRNG缓冲区中取出 `n` 个随机字节，缓冲区不足时自动重新填充。
+    (Takes `n` random bytes from the prefetched CSPRNG buffer, refilling it when exhausted.)
+
+    参数 (Args):
+        n (int): 需要的字节数。(Number of bytes required.)
+
+    返回 (Returns):
+        bytes: 长度为 `n` 的随机字节串。(Random byte string of length `n`.)
+    """
+    global _rand_buf, _rand_pos
+    with _rand_lock:
+        if _rand_pos + n > len(_rand_buf):
+            _rand_buf = bytearray(os.urandom(max(_RAND_BUFFER_SIZE, n)))
+            _rand_pos = 0
+        chunk = bytes(_rand_buf[_rand_pos : _rand_pos + n])
+        _rand_pos += n
+        return chunk
+
+
+def configure_token_store(store: Optional[ITokenStore]) -> None:
+    """
+    设置外部Token存储。传入 None 则恢复使用进程内存存储。应在应用启动时、签发任何Token之前调用。
+    (Sets the external token store. Passing None restores the in-process storage.
+    Should be called at application startup, before any token is issued.)
+
+    参数 (Args):
+        store (Optional[ITokenStore]): 已连接的Token存储实例，或 None。
+                                       (A connected token store instance, or None.)
+    """
+    global _token_store
+    _token_store = store
+    _validate_cache.clear()  # 缓存结果属于先前的后端 (Cached results belong to the previous backend)
+    _security_module_logger.info(
+        "Token存储后端已设置为 (Token store backend set to): %s",
+        type(store).__name__ if store is not None else "memory",
+    )
+
+
+async def close_token_store() -> None:
+    """
+    断开并移除外部Token存储（如果已配置）。应在应用关闭时调用。
+    (Disconnects and removes the external token store, if configured. Should be called on shutdown.)
+    """
+    global _token_store
+    if _token_store is not None:
+        await _token_store.disconnect()
+        _token_store = None
+
+
+def _tags_from_values(tag_values: Sequence[str]) -> List[UserTag]:
+    """
+    将存储的标签字符串值安全地转换回UserTag枚举成员，忽略无法识别的值。
+    (Safely converts stored tag string values back to UserTag enum members, skipping unknown values.)
+    """
+    return [
+        _TAG_MAP[tag_str]
+        for tag_str in tag_values
+        if tag_str in _TAG_MAP  # 确保是有效的枚举值 (Ensure it's a valid enum value)
+    ]
+
+
 async def create_access_token(user_uid: str, user_tags: List[UserTag]) -> str:
     """
     为指定用户生成一个新的访问Token，并将其存储在内存的活动Token列表中。
-    Token是使用 `secrets.token_hex` 生成的伪随机十六进制字符串。
+    Token是取自操作系统CSPRNG (经 `_rand_bytes` 缓冲) 的随机字节的十六进制表示。
 
     (Generates a new access token for the specified user and stores it in the in-memory
-    active token list. The token is a pseudo-random hexadecimal string generated using `secrets.token_hex`.)
+    active token list. The token is the hex form of random bytes from the OS CSPRNG,
+    buffered through `_rand_bytes`.)
 
     参数 (Args):
         user_uid (str): 用户的唯一标识符。(User's unique identifier.)
@@ -124,34 +471,63 @@ async def create_access_token(user_uid: str, user_tags: List[UserTag]) -> str:
                                      (List of tags the user possesses (UserTag enum members).)
     返回 (Returns):
         str: 生成的访问Token字符串。(The generated access token string.)
+    异常 (Raises):
+        HTTPException (403): 如果用户账户被封禁，则拒绝签发Token。
+                             被封禁用户的现有Token应通过 `invalidate_all_tokens_for_user` 吊销。
+                             (If the user account is banned, no token is issued. Existing tokens of a
+                              banned user should be revoked via `invalidate_all_tokens_for_user`.)
     """
-    async with _token_lock:  # 确保对 _active_tokens 的操作是原子性的 (Ensure atomic operation on _active_tokens)
-        token_bytes_length = (
-            settings.token_length_bytes
-        )  # 从配置获取Token长度 (Get token length from config)
-        token = secrets.token_hex(
-            token_bytes_length
-        )  # 生成安全的十六进制Token (Generate secure hex token)
-
-        expires_delta = timedelta(
-            hours=settings.token_expiry_hours
-        )  # Token有效期 (Token validity period)
-        expires_at_timestamp = (
-            time.time() + expires_delta.total_seconds()
-        )  # 计算过期时间戳 (Calculate expiration timestamp)
-
-        _active_tokens[token] = {
-            "user_uid": user_uid,
-            "tags": [
-                tag.value for tag in user_tags
-            ],  # 存储标签的字符串值 (Store string values of tags)
-            "expires_at": expires_at_timestamp,
-        }
+    if _BANNED in user_tags:  # 封禁检查在签发时进行一次，而非每次请求
+        _security_module_logger.warning(
+            "拒绝为被封禁用户 '%s' 签发Token。(Refused to issue token for banned user '%s'.)",
+            user_uid,
+            user_uid,
+        )
+        raise _EXC_BANNED.with_traceback(None)
+
+    token_bytes_length = (
+        settings.token_length_bytes
+    )  # 从配置获取Token长度 (Get token length from config)
+    token = _rand_bytes(
+        token_bytes_length
+    ).hex()  # 生成安全的十六进制Token (Generate secure hex token)
+
+    expires_at_timestamp = (
+        time.time() + _TOKEN_TTL_SECONDS
+    )  # 计算过期时间戳 (Calculate expiration timestamp)
+    expires_at_iso = datetime.fromtimestamp(
+        expires_at_timestamp, tz=timezone.utc
+    ).isoformat()  # 与日志共用 (Shared with the log line below)
+    if (
+        _token_store is not None
+    ):  # 委托给外部Token存储 (Delegate to the external token store)
+        tag_values = [
+            tag.value for tag in user_tags
+        ]  # 外部存储保存标签的字符串值 (External stores keep string values of tags)
+        await _token_store.add(token, user_uid, tag_values, expires_at_timestamp)
+    else:
+        # 内存存储使用单调时钟判断过期 (The in-memory store judges expiry on the monotonic clock)
+        expires_at_ns = time.monotonic_ns() + _TOKEN_TTL_NS
+        async with _token_lock:  # 确保对 _active_tokens 的操作是原子性的 (Ensure atomic operation on _active_tokens)
+            _active_tokens[token] = _TokenEntry(
+                user_uid, frozenset(user_tags), expires_at_ns, expires_at_iso
+            )
+            heap_item = (expires_at_ns, token)
+            heapq.heappush(_expiry_heap, heap_item)
+            if _heap_rebuild_journal is not None:
+                _heap_rebuild_journal.append(heap_item)
+            _user_tokens.setdefault(user_uid, set()).add(token)
+
+    if _security_module_logger.isEnabledFor(logging.INFO):
         _security_module_logger.info(
-            f"为用户 '{user_uid}' 生成新Token (部分) (Generated new token (partial) for user '{user_uid}'): {token[:8]}..., "
-            f"有效期至 (Expires at): {datetime.fromtimestamp(expires_at_timestamp, tz=timezone.utc).isoformat()}"
+            "为用户 '%s' 生成新Token (部分) (Generated new token (partial) for user '%s'): %s..., "
+            "有效期至 (Expires at): %s",
+            user_uid,
+            user_uid,
+            token[:8],
+            expires_at_iso,
         )
-        return token
+    return token
 
 
 async def validate_token_and_get_user_info(token: str) -> Optional[Dict[str, Any]]:
@@ -163,49 +539,74 @@ async def validate_token_and_get_user_info(token: str) -> Optional[Dict[str, Any
         token (str): 客户端提供的访问Token。(Access token provided by the client.)
 
     返回 (Returns):
-        Optional[Dict[str, Any]]: 如果Token有效，则返回包含 "user_uid" (str) 和 "tags" (List[UserTag]) 的字典。
-                                   如果Token无效或过期，则返回 None，并在内部清理该过期Token。
-                                   (If the token is valid, returns a dictionary containing "user_uid" (str)
-                                    and "tags" (List[UserTag]). If the token is invalid or expired,
-                                    returns None and internally cleans up the expired token.)
+        Optional[Dict[str, Any]]: 如果Token有效，则返回包含 "user_uid" (str) 和 "tags" (FrozenSet[UserTag])
+                                   的字典。如果Token无效或过期，则返回 None，并在内部清理该过期Token。
+                                   (If the token is valid, returns a dictionary containing "user_uid" (str) and
+                                    "tags" (FrozenSet[UserTag]). If the token is invalid or expired, returns None
+                                    and internally cleans up the expired token.)
     """
-    async with _token_lock:
-        token_data = _active_tokens.get(token)
+    if (
+        _token_store is not None
+    ):  # 外部存储自行淘汰过期Token (External store evicts expired tokens itself)
         current_time = time.time()
-
-        if token_data and token_data["expires_at"] > current_time:  # Token有效且未过期
-            try:
-                # 将存储的标签字符串值安全地转换回UserTag枚举成员
-                # (Safely convert stored tag string values back to UserTag enum members)
-                tags_as_enum = [
-                    UserTag(tag_str)
-                    for tag_str in token_data.get("tags", [])
-                    if tag_str
-                    in UserTag._value2member_map_  # 确保是有效的枚举值 (Ensure it's a valid enum value)
-                ]
-            except ValueError as e_tag:
-                _security_module_logger.error(
-                    f"Token '{token[:8]}...' 中的标签列表包含无效值 (Token '{token[:8]}...' tag list contains invalid value): "
-                    f"{token_data.get('tags')}, 错误 (Error): {e_tag}. Token将被视为无效 (Token will be treated as invalid)."
-                )
-                _active_tokens.pop(
-                    token, None
-                )  # 移除有问题的Token (Remove problematic token)
-                return None
-
-            return {"user_uid": token_data["user_uid"], "tags": tags_as_enum}
-
-        if token_data and token_data["expires_at"] <= current_time:  # Token存在但已过期
-            _security_module_logger.info(
-                f"Token (部分) (Token (partial)) {token[:8]}... 已过期并被移除 (expired and removed)."
-            )
-            _active_tokens.pop(token, None)  # 从活动列表中移除
-        elif not token_data:  # Token不存在
+        bucket = int(current_time) // _VALIDATE_CACHE_BUCKET_SECONDS
+        cached = _validate_cache.get(token)
+        if cached is not None:
+            cached_bucket, cached_info, cached_expires_at = cached
+            if cached_bucket == bucket and cached_expires_at > current_time:
+                _validate_cache.move_to_end(token)
+                return dict(
+                    cached_info
+                )  # 返回副本，调用方可安全修改 (Copy, so callers may modify it)
+            del _validate_cache[token]
+
+        stored_data = await _token_store.get(token)
+        if stored_data is None:
+            return None
+        user_info = {
+            "user_uid": stored_data["user_uid"],
+            "tags": frozenset(_tags_from_values(stored_data.get("tags", []))),
+        }
+        # 只缓存有效结果，其他worker新签发的Token无需等待缓存过期
+        # (Only valid results are cached, so tokens newly issued by other workers are seen at once)
+        _validate_cache[token] = (bucket, user_info, stored_data["expires_at"])
+        if len(_validate_cache) > _VALIDATE_CACHE_MAX_SIZE:
+            _validate_cache.popitem(
+                last=False
+            )  # 淘汰最久未使用的条目 (Evict least recently used)
+        return dict(user_info)
+
+    # 热路径：每个受保护的请求都会调用此函数。常见情况（Token存在且未过期）只需一次字典查找
+    # 和一次时间比较；缺失/过期等少见情况放在各自的分支中处理。
+    # (Hot path: called for every protected request. The common case (token present and unexpired)
+    #  costs one dict lookup and one time comparison; rare cases are handled in their own branches.)
+    # 此处不获取 `_token_lock`：查找与删除之间没有 await，在单个事件循环中不会被其他协程打断。
+    # (`_token_lock` is not taken here: there is no await between the lookup and the delete,
+    #  so no other coroutine on the event loop can interleave.)
+    token_entry = _active_tokens.get(token)
+    if token_entry is None:  # Token不存在
+        if _security_module_logger.isEnabledFor(logging.DEBUG):
             _security_module_logger.debug(
-                f"尝试验证的Token (部分) (Attempted to validate token (partial)) {token[:8]}... 不存在于活动列表 (not found in active list)."
+                "尝试验证的Token (部分) (Attempted to validate token (partial)) %s... 不存在于活动列表 (not found in active list).",
+                token[:8],
             )
         return None
 
+    if token_entry.expires_at_ns > time.monotonic_ns():  # Token有效且未过期
+        # 标签集合在创建Token时已构建，直接返回，无需逐请求转换
+        # (The tag set was built at token creation and is returned as-is, with no per-request conversion)
+        return {"user_uid": token_entry.user_uid, "tags": token_entry.tags}
+
+    # Token存在但已过期 (Token exists but has expired)
+    if _security_module_logger.isEnabledFor(logging.INFO):
+        _security_module_logger.info(
+            "Token (部分) (Token (partial)) %s... 已过期并被移除 (expired and removed).",
+            token[:8],
+        )
+    del _active_tokens[token]  # 刚查到该键，可直接删除 (Key was just looked up)
+    _discard_user_token(token_entry.user_uid, token)
+    return None
+
 
 async def invalidate_token(token: str) -> None:
     """
@@ -217,43 +618,173 @@ async def invalidate_token(token: str) -> None:
     参数 (Args):
         token (str): 需要失效的Token。(Token to be invalidated.)
     """
+    if _token_store is not None:
+        _validate_cache.pop(token, None)
+        if await _token_store.remove(token):
+            if _security_module_logger.isEnabledFor(logging.INFO):
+                _security_module_logger.info(
+                    "Token (部分) (Token (partial)) %s... 已被主动失效 (actively invalidated).",
+                    token[:8],
+                )
+        return
+
     async with _token_lock:
-        if token in _active_tokens:
-            _active_tokens.pop(token, None)
+        removed = _active_tokens.pop(token, None)  # 一次查找完成判断与移除
+        if removed is not None:
+            _discard_user_token(removed.user_uid, token)
+    if removed is not None:
+        if _security_module_logger.isEnabledFor(logging.INFO):
             _security_module_logger.info(
-                f"Token (部分) (Token (partial)) {token[:8]}... 已被主动失效 (actively invalidated)."
+                "Token (部分) (Token (partial)) %s... 已被主动失效 (actively invalidated).",
+                token[:8],
             )
 
 
+def _log_cleaned_tokens(cleaned_tokens: List[str]) -> None:
+    """
+    逐条记录被清理的过期Token，须在释放 `_token_lock` 之后调用。
+    (Logs each cleaned expired token; must be called after `_token_lock` is released.)
+    """
+    if cleaned_tokens and _security_module_logger.isEnabledFor(logging.INFO):
+        log_info = _security_module_logger.info
+        for token_key in cleaned_tokens:
+            log_info(
+                "后台任务：清理过期Token (部分) (Background task: Cleaned expired token (partial)): %s...",
+                token_key[:8],
+            )
+
+
+async def _rebuild_expiry_heap_in_batches(current_time: int) -> int:
+    """
+    按 `_active_tokens` 的快照分批清理已过期Token并重建 `_expiry_heap`，用于大批过期和压缩陈旧堆条目。
+    新堆在锁外由快照构建，每批只在删除过期Token时短暂持锁，最后在锁内一次换入；
+    期间新建的Token经 `_heap_rebuild_journal` 补入新堆，期间被吊销的Token只会留下可惰性丢弃的陈旧条目。
+    (Evicts expired tokens from a snapshot of `_active_tokens` in batches and rebuilds `_expiry_heap`,
+    for mass expiry and for compacting stale heap entries. The new heap is built from the snapshot
+    outside the lock, each batch holds the lock only to delete its expired tokens, and the heap is
+    swapped in under the lock at the end. Tokens created meanwhile are added via
+    `_heap_rebuild_journal`; tokens revoked meanwhile only leave stale entries that are dropped lazily.)
+
+    返回 (Returns):
+        int: 清理的过期Token数量 (Number of expired tokens evicted)
+    """
+    global _heap_rebuild_journal
+    snapshot = list(_active_tokens.items())
+    new_heap: List[Tuple[int, str]] = []
+    journal: List[Tuple[int, str]] = []
+    _heap_rebuild_journal = journal
+    expired_count = 0
+    try:
+        for batch_start in range(0, len(snapshot), _CLEANUP_CHUNK_SIZE):
+            expired_batch: List[Tuple[str, _TokenEntry]] = []
+            for token_key, token_entry in snapshot[
+                batch_start : batch_start + _CLEANUP_CHUNK_SIZE
+            ]:
+                if token_entry.expires_at_ns > current_time:
+                    new_heap.append((token_entry.expires_at_ns, token_key))
+                else:
+                    expired_batch.append((token_key, token_entry))
+            cleaned_tokens: List[str] = []
+            if expired_batch:
+                async with _token_lock:
+                    for token_key, token_entry in expired_batch:
+                        # 快照之后已被吊销或替换的Token不再处理 (Skip tokens revoked or replaced since the snapshot)
+                        if _active_tokens.get(token_key) is token_entry:
+                            del _active_tokens[token_key]
+                            _discard_user_token(token_entry.user_uid, token_key)
+                            cleaned_tokens.append(token_key)
+            expired_count += len(cleaned_tokens)
+            _log_cleaned_tokens(cleaned_tokens)
+            # 每批之后让出事件循环 (Yield to the event loop after each batch)
+            await asyncio.sleep(0)
+        async with _token_lock:
+            new_heap.extend(journal)
+            heapq.heapify(new_heap)
+            _expiry_heap[:] = new_heap
+    finally:
+        _heap_rebuild_journal = None
+    return expired_count
+
+
 async def cleanup_expired_tokens_periodically():  # 函数名已修正，原为 cleanup_expired_tokens_periodically
     """
     定期清理内存中所有已过期的Token。
-    此函数应由一个后台任务周期性调用。
+    此函数应由一个后台任务周期性调用。借助 `_expiry_heap`，每次清理的开销
+    只与实际过期的Token数量相关，而非活动Token总数。
     (Periodically cleans up all expired tokens from memory.
-    This function should be called periodically by a background task.)
+    This function should be called periodically by a background task. Thanks to `_expiry_heap`,
+    each sweep costs O(k log N) for k expired tokens rather than a full O(N) scan.)
+    配置了外部Token存储时为空操作，过期由存储后端处理。
+    (No-op when an external token store is configured; the backend handles expiry.)
     """
-    async with _token_lock:
-        current_time = time.time()
-        tokens_to_check = list(
-            _active_tokens.keys()
-        )  # 创建副本进行迭代 (Create a copy for iteration)
-        expired_count = 0
-        for token_key in tokens_to_check:
-            token_data = _active_tokens.get(token_key)
-            if token_data and token_data["expires_at"] <= current_time:
-                _active_tokens.pop(token_key, None)
-                _security_module_logger.info(
-                    f"后台任务：清理过期Token (部分) (Background task: Cleaned expired token (partial)): {token_key[:8]}..."
-                )
-                expired_count += 1
-        if expired_count > 0:
-            _security_module_logger.info(
-                f"后台任务：共清理了 {expired_count} 个过期Token。(Background task: Cleaned a total of {expired_count} expired tokens.)"
-            )
-        if expired_count > 0:
-            _security_module_logger.info(
-                f"后台任务：共清理了 {expired_count} 个过期Token。(Background task: Cleaned a total of {expired_count} expired tokens.)"
-            )
+    if _token_store is not None:
+        return
+
+    current_time = time.monotonic_ns()
+    expired_count = 0
+    popped = 0
+    bulk_threshold = max(_BULK_EVICT_MIN_COUNT, len(_expiry_heap) // 2)
+    # 逐条弹出循环中使用的全局对象与方法预先绑定为局部变量，省去每次迭代的全局/属性查找。
+    # (Globals and methods used by the per-entry loop are bound to locals up front, saving a global or
+    #  attribute lookup per iteration.)
+    expiry_heap = _expiry_heap
+    heappop = heapq.heappop
+    get_entry = _active_tokens.get
+    while True:
+        # 锁内只收集被清理的Token，日志在释放锁之后输出
+        # (Only collect cleaned tokens under the lock; they are logged after it is released)
+        cleaned_tokens: List[str] = []
+        sweep_done = False
+        rebuild_heap = False
+        async with _token_lock:
+            chunk_end = popped + _CLEANUP_CHUNK_SIZE
+            # 只弹出堆顶已到期的条目 (Only pop entries whose expiry has passed)
+            while (
+                expiry_heap and expiry_heap[0][0] <= current_time and popped < chunk_end
+            ):
+                if popped >= bulk_threshold:
+                    # 大批Token同时过期（例如空闲时段之后）：释放锁后按快照分批重建，避免逐个弹出
+                    # (Many tokens expired at once (e.g. after an idle period): rebuild from a
+                    #  snapshot in batches once the lock is released, instead of popping one by one)
+                    rebuild_heap = True
+                    break
+                _, token_key = heappop(expiry_heap)
+                popped += 1
+                token_entry = get_entry(token_key)
+                if (
+                    token_entry is not None
+                    and token_entry.expires_at_ns <= current_time
+                ):
+                    del _active_tokens[token_key]
+                    _discard_user_token(token_entry.user_uid, token_key)
+                    expired_count += 1
+                    cleaned_tokens.append(token_key)
+            if not (_expiry_heap and _expiry_heap[0][0] <= current_time):
+                # 被提前失效的Token会在堆中留下陈旧条目，直到其原定过期时间才被弹出。
+                # 登出频繁时陈旧条目可能远多于活动Token，此时按活动Token重建堆以限制其大小。
+                # (Tokens invalidated early leave stale heap entries until their original expiry. With
+                #  frequent logouts these can far outnumber active tokens, so the heap is rebuilt from
+                #  live entries.)
+                if len(_expiry_heap) > 2 * len(_active_tokens) + _BULK_EVICT_MIN_COUNT:
+                    rebuild_heap = True
+                sweep_done = True
+        _log_cleaned_tokens(cleaned_tokens)
+        if rebuild_heap:
+            expired_count += await _rebuild_expiry_heap_in_batches(current_time)
+            break
+        if sweep_done:
+            break
+        # 每处理一批后释放锁并让出事件循环，避免大批过期时长时间阻塞其他请求
+        # (Release the lock and yield to the event loop after each batch so a large expiry wave
+        #  does not stall other requests)
+        await asyncio.sleep(0)
+
+    if expired_count > 0:
+        _security_module_logger.info(
+            "后台任务：共清理了 %d 个过期Token。(Background task: Cleaned a total of %d expired tokens.)",
+            expired_count,
+            expired_count,
+        )
 
 
 async def get_all_active_token_info() -> List[Dict[str, Any]]:
@@ -266,32 +797,52 @@ async def get_all_active_token_info() -> List[Dict[str, Any]]:
                               (Each dictionary contains token_prefix, user_uid, tags, and expires_at (ISO format string).)
     """
     active_token_details = []
-    async with _token_lock:
-        if not _active_tokens:
-            return []
-
+    # 快照时即按各自的时钟过滤掉已过期的Token（外部存储为墙上时间戳，内存存储为单调时钟纳秒），
+    # 统一为 (token, user_uid, tags, expires_at_iso) 元组，之后的序列化循环无需再做过期判断。
+    # (Expired tokens are filtered out while taking the snapshot, each backend on its own clock
+    #  (wall-clock timestamps for external stores, monotonic ns in memory), and normalized to
+    #  (token, user_uid, tags, expires_at_iso) tuples, so the serialization loop needs no expiry check.)
+    if _token_store is not None:
         current_time = time.time()
-        # Iterate over a copy of items in case of modification (though less likely here than in cleanup)
-        for token_str, token_data in list(_active_tokens.items()):
-            # Double check expiry, though cleanup should handle most, this function might be called between cleanups
-            if token_data["expires_at"] <= current_time:
-                # Token is expired, might as well remove it if found here, though cleanup is primary
-                # _active_tokens.pop(token_str, None) # Avoid modifying during unprotected iteration if not list(_active_tokens.items())
-                # For safety, let cleanup_expired_tokens_periodically handle actual removal
-                continue
-
-            active_token_details.append(
-                {
-                    "token_prefix": token_str[:8] + "...",
-                    "user_uid": token_data["user_uid"],
-                    "tags": token_data[
-                        "tags"
-                    ],  # Tags are already stored as list of strings
-                    "expires_at": datetime.fromtimestamp(
-                        token_data["expires_at"], tz=timezone.utc
-                    ).isoformat(),
-                }
+        token_items = [
+            (
+                token_str,
+                data["user_uid"],
+                _tags_from_values(data["tags"]),
+                datetime.fromtimestamp(data["expires_at"], tz=timezone.utc).isoformat(),
             )
+            for token_str, data in await _token_store.list_all()
+            if data["expires_at"] > current_time
+        ]
+    else:
+        current_time = time.monotonic_ns()
+        # 快照过程中没有 await，无需持锁；之后的格式化基于快照进行，可安全地分批让出事件循环
+        # (No await while taking the snapshot, so no lock is needed; formatting then works on the
+        #  snapshot and can safely yield to the event loop between batches)
+        token_items = [
+            (token_str, entry.user_uid, entry.tags, entry.expires_at_iso)
+            for token_str, entry in _active_tokens.items()
+            if entry.expires_at_ns > current_time
+        ]
+    if not token_items:
+        return []
+
+    append_detail = (
+        active_token_details.append
+    )  # 循环外绑定 (Bound once outside the loop)
+    for index, (token_str, user_uid, tags, expires_at_iso) in enumerate(token_items, 1):
+        if index % _CLEANUP_CHUNK_SIZE == 0:
+            await asyncio.sleep(0)  # 让出事件循环 (Yield to the event loop)
+        append_detail(
+            {
+                "token_prefix": token_str[:8] + "...",
+                "user_uid": user_uid,
+                "tags": sorted(
+                    tag.value for tag in tags
+                ),  # 仅在序列化时转换为字符串 (Projected to strings only for serialization)
+                "expires_at": expires_at_iso,
+            }
+        )
     return active_token_details
 
 
@@ -309,34 +860,54 @@ async def invalidate_all_tokens_for_user(user_uid: str) -> int:
              (The number of tokens that were successfully invalidated.)
     """
     invalidated_count = 0
-    tokens_to_remove = []
-    async with _token_lock:
-        # First, identify tokens to remove to avoid modifying dict while iterating
-        for token_str, token_data in _active_tokens.items():
-            if token_data["user_uid"] == user_uid:
-                tokens_to_remove.append(token_str)
-
-        # Now, remove the identified tokens
-        for token_str in tokens_to_remove:
-            if (
-                token_str in _active_tokens
-            ):  # Check if still exists (might be removed by another process/task if not careful)
-                _active_tokens.pop(token_str)
-                invalidated_count += 1
+    if _token_store is not None:
+        for cached_token in [
+            cached_token
+            for cached_token, (_, cached_info, _) in _validate_cache.items()
+            if cached_info["user_uid"] == user_uid
+        ]:
+            del _validate_cache[cached_token]
+        invalidated_count = await _token_store.remove_all_for_user(user_uid)
+    else:
+        async with _token_lock:
+            # 通过反向索引直接取出该用户的Token，无需扫描 `_active_tokens`
+            # (Take the user's tokens from the reverse index instead of scanning `_active_tokens`)
+            # 反向索引与 `_active_tokens` 总是同步更新，索引中的Token必然仍在活动列表中，
+            # 因此直接逐个移除，无需再检查是否存在
+            # (The reverse index is always updated together with `_active_tokens`, so every indexed
+            #  token is still active and is removed directly without an existence check)
+            invalidated_tokens = _user_tokens.pop(user_uid, ())
+            pop_token = _active_tokens.pop
+            for token_str in invalidated_tokens:
+                pop_token(token_str, None)
+        # 日志在释放锁之后输出 (Logged after the lock is released)
+        invalidated_count = len(invalidated_tokens)
+        if invalidated_tokens and _security_module_logger.isEnabledFor(logging.INFO):
+            for token_str in invalidated_tokens:
                 _security_module_logger.info(
-                    f"已为用户 '{user_uid}' 失效Token (部分): {token_str[:8]}..."
-                    f"(Invalidated token (partial) for user '{user_uid}': {token_str[:8]}...)"
+                    "已为用户 '%s' 失效Token (部分): %s..."
+                    "(Invalidated token (partial) for user '%s': %s...)",
+                    user_uid,
+                    token_str[:8],
+                    user_uid,
+                    token_str[:8],
                 )
 
     if invalidated_count > 0:
         _security_module_logger.info(
-            f"共为用户 '{user_uid}' 失效了 {invalidated_count} 个Token。"
-            f"(Invalidated a total of {invalidated_count} tokens for user '{user_uid}'.)"
+            "共为用户 '%s' 失效了 %d 个Token。"
+            "(Invalidated a total of %d tokens for user '%s'.)",
+            user_uid,
+            invalidated_count,
+            invalidated_count,
+            user_uid,
         )
     else:
         _security_module_logger.info(
-            f"未找到用户 '{user_uid}' 的活动Token进行失效操作。"
-            f"(No active tokens found for user '{user_uid}' to invalidate.)"
+            "未找到用户 '%s' 的活动Token进行失效操作。"
+            "(No active tokens found for user '%s' to invalidate.)",
+            user_uid,
+            user_uid,
         )
 
     return invalidated_count
@@ -348,50 +919,96 @@ async def invalidate_all_tokens_for_user(user_uid: str) -> int:
 
 
 async def get_current_user_info_from_token(
-    token: str = Query(..., description="用户访问Token (User access token)"),
+    header_token: Annotated[Optional[str], Security(auth_token_header)] = None,
+    token: Annotated[
+        Optional[str],
+        Query(
+            description="用户访问Token，兼容旧客户端的后备方式 (User access token, fallback for older clients)"
+        ),
+    ] = None,
 ) -> Dict[str, Any]:
     """
-    FastAPI 依赖项：从查询参数中获取Token，验证其有效性，并返回用户信息（包括UID和标签）。
-    如果Token无效、过期或用户被封禁，则会抛出相应的HTTPException。
-
-    (FastAPI Dependency: Gets the token from query parameters, validates its effectiveness,
+    FastAPI 依赖项：从 `X-Auth-Token` 请求头（或兼容模式下的查询参数）获取Token，
+    验证其有效性，并返回用户信息（包括UID和标签）。
+    如果Token无效或过期，则会抛出HTTPException。
+    被封禁用户不会获得Token（见 `create_access_token`），封禁时其现有Token也会被吊销，
+    因此这里无需逐请求检查封禁标签。
+
+    (FastAPI Dependency: Gets the token from the `X-Auth-Token` header (or the query parameter in
+    compatibility mode), validates its effectiveness,
     and returns user information (including UID and tags).
-    Throws corresponding HTTPException if the token is invalid, expired, or the user is banned.)
+    Throws HTTPException if the token is invalid or expired. Banned users are never issued tokens
+    (see `create_access_token`) and their existing tokens are revoked on ban, so no per-request
+    banned-tag check is needed here.)
 
     参数 (Args):
-        token (str): 通过查询参数传递的用户访问Token。(User access token passed via query parameter.)
+        header_token (Optional[str]): 通过请求头传递的用户访问Token。(User access token passed via header.)
+        token (Optional[str]): 通过查询参数传递的用户访问Token。(User access token passed via query parameter.)
 
     返回 (Returns):
         Dict[str, Any]: 包含用户UID (`user_uid`) 和用户标签 (`tags`) 的字典。
                         (Dictionary containing user UID (`user_uid`) and user tags (`tags`).)
     异常 (Raises):
-        HTTPException (401): 如果Token无效或过期。(If token is invalid or expired.)
-        HTTPException (403): 如果用户账户被封禁。(If user account is banned.)
+        HTTPException (401): 如果Token缺失、无效或过期。(If token is missing, invalid or expired.)
     """
+    token = _resolve_request_token(header_token, token)
     user_info = await validate_token_and_get_user_info(token)
     if not user_info:
-        _security_module_logger.warning(
-            f"依赖项检查：无效或过期的Token尝试访问受保护资源 (部分Token: {token[:8]}...)"
-            f"(Dependency check: Invalid or expired token tried to access protected resource (Partial Token: {token[:8]}...))"
-        )
-        raise HTTPException(
-            status_code=http_status.HTTP_401_UNAUTHORIZED,
-            detail="无效或已过期的Token",  # 完全中文 (Fully Chinese)
-            headers={
-                "WWW-Authenticate": "Bearer scheme='QueryToken'"
-            },  # 提示客户端使用QueryToken方案
-        )
+        _reject_invalid_token(token)
+    return user_info
+
+
+async def get_request_token(
+    header_token: Annotated[Optional[str], Security(auth_token_header)] = None,
+    token: Annotated[
+        Optional[str],
+        Query(
+            description="用户访问Token，兼容旧客户端的后备方式 (User access token, fallback for older clients)"
+        ),
+    ] = None,
+) -> str:
+    """
+    FastAPI 依赖项：按与认证依赖项相同的规则 (见 `_resolve_request_token`) 取出本次请求的原始Token，
+    但不做验证。供需要Token本身的接口使用，例如刷新Token。
+    (FastAPI dependency: extracts this request's raw token under the same rules as the auth
+    dependencies (see `_resolve_request_token`) without validating it. For endpoints that need the
+    token itself, such as token refresh.)
+
+    异常 (Raises):
+        HTTPException (401): 如果请求未提供可接受的Token。(If the request carries no acceptable token.)
+    """
+    return _resolve_request_token(header_token, token)
+
+
+def _resolve_request_token(
+    header_token: Optional[str], query_token: Optional[str]
+) -> str:
+    """
+    选出本次请求使用的Token：优先使用请求头，查询参数仅在 `settings.allow_query_token` 开启时接受。
+    两者都没有时按无效Token处理 (401)。
+    (Picks the token for this request: the header wins, and the query parameter is only accepted while
+    `settings.allow_query_token` is enabled. A request with neither is rejected as an invalid token (401).)
+    """
+    if header_token:
+        return header_token
+    if query_token and settings.allow_query_token:
+        return query_token
+    raise _EXC_INVALID_TOKEN.with_traceback(None)
+
 
-    if UserTag.BANNED in user_info.get("tags", []):  # 检查用户是否被封禁
+def _reject_invalid_token(token: str) -> None:
+    """
+    记录无效/过期Token的访问尝试并抛出共享的401异常。
+    (Logs an access attempt with an invalid/expired token and raises the shared 401 exception.)
+    """
+    if _security_module_logger.isEnabledFor(logging.WARNING):
         _security_module_logger.warning(
-            f"用户 '{user_info['user_uid']}' (Token: {token[:8]}...) 因被封禁而访问被拒。"
-            f"(User '{user_info['user_uid']}' (Token: {token[:8]}...) access denied due to being banned.)"
-        )
-        raise HTTPException(
-            status_code=http_status.HTTP_403_FORBIDDEN,
-            detail="用户账户已被封禁",  # 完全中文 (Fully Chinese)
+            "依赖项检查：无效或过期的Token尝试访问受保护资源 (部分Token: %s...)"
+            "(Dependency check: Invalid or expired token tried to access protected resource (Partial Token: %s...))",
+            token[:8],
+            token[:8],
         )
-    return user_info
+    raise _EXC_INVALID_TOKEN.with_traceback(None)
 
 
 async def get_current_active_user_uid(
@@ -415,39 +1032,6 @@ async def get_current_active_user_uid(
     return user_info["user_uid"]
 
 
-# 旧的HTTP Basic认证逻辑 (Old HTTP Basic auth logic - to be removed if not used)
-# async def _authenticate_admin_user_http_basic(credentials: HTTPBasicCredentials = Depends(HTTPBasic())):
-#     """
-#     内部辅助函数：验证HTTP Basic认证凭据是否为预设的管理员用户名和密码。
-#     (Internal helper function: Validates if HTTP Basic auth credentials match preset admin username/password.)
-#     """
-#     correct_username = secrets.compare_digest(credentials.username, settings.admin_username)
-#     correct_password = secrets.compare_digest(credentials.password, settings.admin_password)
-#     if not (correct_username and correct_password):
-#         _security_module_logger.warning(
-#             f"管理员HTTP Basic认证失败，用户名: '{credentials.username}'"
-#             f"(Admin HTTP Basic auth failed for username: '{credentials.username}')"
-#         )
-#         raise HTTPException(
-#             status_code=http_status.HTTP_401_UNAUTHORIZED,
-#             detail="管理员凭据错误 (Incorrect admin credentials)",
-#             headers={"WWW-Authenticate": "Basic"},
-#         )
-#     # 注意：此基础认证不直接返回用户模型或标签，仅用于访问控制。
-#     # (Note: This basic auth doesn't directly return a user model or tags, only for access control.)
-#     _security_module_logger.info(f"管理员 '{credentials.username}' 通过HTTP Basic认证成功。")
-#     return credentials.username
-
-# async def get_current_admin_user(admin_username: str = Depends(_authenticate_admin_user_http_basic)):
-#     """
-#     FastAPI依赖项：确保当前用户通过HTTP Basic认证为管理员。
-#     (FastAPI Dependency: Ensures the current user is authenticated as admin via HTTP Basic.)
-#     """
-#     # 此函数主要用于依赖注入，实际的用户名已在 _authenticate_admin_user_http_basic 中验证。
-#     # (This function is mainly for dependency injection; actual username is validated in _authenticate_admin_user_http_basic.)
-#     return admin_username
-
-
 class RequireTags:
     """
     FastAPI依赖项类，用于检查当前认证用户是否拥有所有指定的必需标签。
@@ -456,8 +1040,21 @@ class RequireTags:
     (FastAPI dependency class used to check if the currently authenticated user possesses
     all specified required tags. This class can be instantiated and used to protect specific
     API endpoints, ensuring that only users with particular permissions (tags) can access them.)
+
+    权限判定结果只取决于用户的标签集合 (`user_info["tags"]`)，与具体Token无关，因此每个实例
+    按标签集合缓存判定结果 (LRU，容量有限)，重复请求无需再次进行子集检查。
+    (The decision depends only on the user's tag set (`user_info["tags"]`), not on the specific token,
+    so each instance caches decisions per tag set (bounded LRU) and repeat requests skip the subset check.)
+    预定义的 `require_*` 实例都只要求单个标签，此时直接做一次成员检查，不经过缓存；
+    必需标签为空时直接放行。
+    (The predefined `require_*` instances each need a single tag, which is checked with one membership
+    test without touching the cache; an empty requirement passes immediately.)
     """
 
+    _DECISION_CACHE_MAX_SIZE = (
+        1024  # 每个实例缓存的判定结果上限 (Max cached decisions per instance)
+    )
+
     def __init__(self, required_tags: Set[UserTag]):
         """
         初始化权限检查器。(Initializes the permission checker.)
@@ -468,40 +1065,99 @@ class RequireTags:
                                          (A set containing required `UserTag` enum members.
                                           The user must possess all tags in this set to pass the check.)
         """
-        self.required_tags = required_tags
+        self.required_tags: FrozenSet[UserTag] = frozenset(required_tags)
+        # 仅要求单个标签时的特化路径 (Specialized path when only one tag is required)
+        self._single_tag: Optional[UserTag] = (
+            next(iter(self.required_tags)) if len(self.required_tags) == 1 else None
+        )
+        # 权限判定缓存: {用户标签集合: 是否通过} (Decision cache: {user tag set: passed})
+        self._decision_cache: "OrderedDict[FrozenSet[UserTag], bool]" = OrderedDict()
 
     async def __call__(
-        self, user_info: Dict[str, Any] = Depends(get_current_user_info_from_token)
+        self,
+        header_token: Annotated[Optional[str], Security(auth_token_header)] = None,
+        token: Annotated[
+            Optional[str],
+            Query(
+                description="用户访问Token，兼容旧客户端的后备方式 (User access token, fallback for older clients)"
+            ),
+        ] = None,
     ) -> Dict[str, Any]:
         """
-        作为FastAPI依赖项被调用时执行的权限检查逻辑。
+        作为FastAPI依赖项被调用：在同一个依赖项内完成Token验证与标签检查，
+        不再经由 `get_current_user_info_from_token` 子依赖，每个受保护请求少一次依赖解析。
+
+        (Called as a FastAPI dependency: validates the token and checks tags within a single
+        dependency instead of going through the `get_current_user_info_from_token` sub-dependency,
+        saving one dependency resolution per protected request.)
+
+        参数 (Args):
+            header_token (Optional[str]): 通过请求头传递的用户访问Token。(User access token passed via header.)
+            token (Optional[str]): 通过查询参数传递的用户访问Token。(User access token passed via query parameter.)
+        返回 (Returns):
+            Dict[str, Any]: 权限检查通过时返回用户信息。(User information if the permission check passes.)
+        异常 (Raises):
+            HTTPException (401): 如果Token缺失、无效或过期。(If token is missing, invalid or expired.)
+            HTTPException (403): 如果用户不具备所有必需的标签。(If the user does not possess all required tags.)
+        """
+        token = _resolve_request_token(header_token, token)
+        user_info = await validate_token_and_get_user_info(token)
+        if not user_info:
+            _reject_invalid_token(token)
+        return self.check(user_info)
+
+    def check(self, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        对已验证的用户信息执行标签检查。
         如果用户缺少任何必需的标签，则抛出HTTP 403 (Forbidden) 错误。
 
-        (Permission checking logic executed when called as a FastAPI dependency.
+        (Runs the tag check against already validated user information.
         Throws an HTTP 403 (Forbidden) error if the user lacks any required tags.)
 
         参数 (Args):
-            user_info (Dict[str, Any]): 由 `get_current_user_info_from_token` 依赖项注入的用户信息。
-                                         (User information injected by `get_current_user_info_from_token`.)
+            user_info (Dict[str, Any]): Token验证得到的用户信息。
+                                         (User information obtained from token validation.)
         返回 (Returns):
             Dict[str, Any]: 如果权限检查通过，则返回原始的 `user_info` 字典。
                             (If permission check passes, returns the original `user_info` dictionary.)
         异常 (Raises):
             HTTPException (403): 如果用户不具备所有必需的标签。(If the user does not possess all required tags.)
         """
-        user_tags_set = set(user_info.get("tags", []))
-        if not self.required_tags.issubset(
-            user_tags_set
-        ):  # 检查用户是否拥有所有必需标签
-            missing_tags = self.required_tags - user_tags_set
-            _security_module_logger.warning(
-                f"用户 '{user_info['user_uid']}' 缺少必需标签 (User '{user_info['user_uid']}' missing required tags) "
-                f"{[tag.value for tag in missing_tags]}，尝试访问受限资源 (attempting to access restricted resource)."
-            )
-            raise HTTPException(
-                status_code=http_status.HTTP_403_FORBIDDEN,
-                detail="权限不足 (Insufficient permissions)",
-            )
+        if not self.required_tags:  # 无必需标签，任何已认证用户均可通过
+            return user_info
+
+        user_tags = user_info.get("tags", ())
+        if self._single_tag is not None:
+            # 单标签：直接对已存储的标签容器做一次成员检查，不构造任何集合
+            # (Single tag: one membership test on the stored tag container, no set is built)
+            allowed = self._single_tag in user_tags
+        else:
+            if not isinstance(
+                user_tags, frozenset
+            ):  # 非 Token 验证产生的用户信息 (user_info not produced by token validation)
+                user_tags = frozenset(user_tags)
+            allowed = self._decision_cache.get(user_tags)
+            if (
+                allowed is None
+            ):  # 缓存未命中，执行子集检查 (Cache miss, run the subset check)
+                allowed = self.required_tags <= user_tags
+                self._decision_cache[user_tags] = allowed
+                if len(self._decision_cache) > self._DECISION_CACHE_MAX_SIZE:
+                    self._decision_cache.popitem(last=False)  # 淘汰最久未使用的条目
+            else:
+                self._decision_cache.move_to_end(user_tags)
+
+        if not allowed:  # 用户未拥有所有必需标签
+            if _security_module_logger.isEnabledFor(logging.WARNING):
+                missing_tags = self.required_tags.difference(user_tags)
+                _security_module_logger.warning(
+                    "用户 '%s' 缺少必需标签 (User '%s' missing required tags) "
+                    "%s，尝试访问受限资源 (attempting to access restricted resource).",
+                    user_info["user_uid"],
+                    user_info["user_uid"],
+                    [tag.value for tag in missing_tags],
+                )
+            raise _EXC_FORBIDDEN.with_traceback(None)
         return user_info
 
 
@@ -530,21 +1186,28 @@ require_manager = RequireTags(
 __all__ = [
     "verify_password",
     "get_password_hash",
+    "averify_password",
+    "aget_password_hash",
     "create_access_token",
     "validate_token_and_get_user_info",
     "invalidate_token",
     "cleanup_expired_tokens_periodically",  # 函数名已修正
     "get_all_active_token_info",  # New function
     "invalidate_all_tokens_for_user",  # New function
+    "configure_token_store",
+    "close_token_store",
     "get_current_user_info_from_token",
+    "AUTH_TOKEN_HEADER",
+    "auth_token_header",
+    "get_request_token",
     "get_current_active_user_uid",
-    # "get_current_admin_user", # 已移除 (Removed)
     "RequireTags",
     "require_admin",
     "require_user",
     "require_grader",
     "require_examiner",
     "require_manager",
+    "tune_bcrypt_rounds",
     "pwd_context",  # 公开 pwd_context 允许其他部分直接使用哈希功能
     # (Exposing pwd_context allows other parts to use hashing functions directly)
 ]
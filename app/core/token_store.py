@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+外部Token存储实现模块 (External Token Store Implementation Module)。
+
+此模块提供 `ITokenStore` 接口基于 Redis 的实现。Token数据以JSON字符串存储，
+并通过 `SET ... EX` 设置与Token有效期一致的TTL，由 Redis 自行淘汰过期Token，
+应用端无需周期性清理。每个用户另有一个Set记录其Token，用于批量吊销。
+启用方式：在配置中将 `token_storage_type` 设为 "redis"，并复用 `REDIS_*` 连接参数。
+
+(This module provides a Redis-based implementation of the `ITokenStore` interface. Token data is
+stored as JSON strings with a TTL matching the token lifetime (`SET ... EX`), so Redis evicts
+expired tokens itself and no application-side cleanup is needed. A per-user Set records each
+user's tokens for bulk revocation. Enable it by setting `token_storage_type` to "redis";
+the `REDIS_*` connection settings are reused.)
+"""
+
+import json  # 用于JSON序列化和反序列化 (For JSON serialization and deserialization)
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aioredis  # type: ignore # aioredis 可能没有完整的类型存根 (aioredis might not have complete type stubs)
+
+from .interfaces import ITokenStore
+
+_token_store_logger = logging.getLogger(__name__)  # 获取本模块的日志记录器实例
+
+# Redis键名前缀 (Redis key prefixes)
+# 单个Token数据的键名前缀 (Key prefix for a single token's data)
+TOKEN_KEY_PREFIX = "token"
+USER_TOKENS_KEY_PREFIX = (
+    "user_tokens"  # 用户Token集合的键名前缀 (Key prefix for a user's token set)
+)
+
+# 在一次往返中原子地读取Token所属用户、删除Token键并将其移出用户集合的 Lua 脚本。
+# 用户集合的键名只能在读取Token数据后得知，因此在脚本内拼接 (不支持 Redis Cluster 的跨槽键)。
+# 无法解码的Token数据同样会被删除。返回被删除的Token键数量。
+# (Lua script that atomically reads the token's owner, deletes the token key and removes it from the
+#  user's set in a single round trip. The user set's key is only known after reading the token data,
+#  so it is built inside the script (cross-slot keys are not supported on Redis Cluster).
+#  Undecodable token data is deleted as well. Returns the number of token keys deleted.)
+_REMOVE_TOKEN_SCRIPT = """
+local payload = redis.call('GET', KEYS[1])
+if not payload then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+local ok, token_data = pcall(cjson.decode, payload)
+if ok and type(token_data) == 'table' and token_data['user_uid'] then
+    redis.call('SREM', ARGV[1] .. ':' .. tostring(token_data['user_uid']), ARGV[2])
+end
+return 1
+"""
+
+
+class RedisTokenStore(ITokenStore):
+    """
+    使用 Redis 保存访问Token的 `ITokenStore` 实现。
+    (An `ITokenStore` implementation that keeps access tokens in Redis.)
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,  # 例如 (e.g.): "redis://localhost:6379/0"
+        host: str = "localhost",  # Redis 服务器主机名 (Redis server hostname)
+        port: int = 6379,  # Redis 服务器端口 (Redis server port)
+        db: int = 0,  # Redis 数据库编号 (Redis database number)
+        password: Optional[
+            str
+        ] = None,  # Redis 连接密码 (可选) (Redis connection password (optional))
+    ):
+        """
+        初始化 RedisTokenStore。参数含义与 `RedisStorageRepository` 相同。
+        (Initializes the RedisTokenStore. Arguments mirror `RedisStorageRepository`.)
+        """
+        if redis_url:
+            self.redis_url = redis_url
+        else:  # 根据单独参数构建连接URL (Construct connection URL from individual parameters)
+            auth_part = f":{password}@" if password else ""
+            self.redis_url = f"redis://{auth_part}{host}:{port}/{db}"
+
+        self.redis: Optional[aioredis.Redis] = (
+            None  # aioredis连接实例 (aioredis connection instance)
+        )
+        # 连接建立时注册的删除脚本 (Removal script registered once connected)
+        self._remove_script: Optional[Any] = None
+
+    def _get_token_key(self, token: str) -> str:
+        """生成Token数据的键名。例如 (e.g.): "token:ab12..." """
+        return f"{TOKEN_KEY_PREFIX}:{token}"
+
+    def _get_user_tokens_key(self, user_uid: str) -> str:
+        """生成用户Token集合的键名。例如 (e.g.): "user_tokens:alice" """
+        return f"{USER_TOKENS_KEY_PREFIX}:{user_uid}"
+
+    async def connect(self) -> None:
+        """建立与Redis服务器的连接。(Establishes a connection to the Redis server.)"""
+        if self.redis:
+            return
+        try:
+            self.redis = aioredis.from_url(
+                self.redis_url, encoding="utf-8", decode_responses=True
+            )
+            await self.redis.ping()  # 测试连接 (Test connection)
+            # 按 SHA 调用 (EVALSHA)，脚本缓存缺失时自动回退为加载 (Invoked via EVALSHA, loading on a cache miss)
+            self._remove_script = self.redis.register_script(_REMOVE_TOKEN_SCRIPT)
+            _token_store_logger.info(
+                "Redis Token存储连接已建立。 (Redis token store connection established.)"
+            )
+        except Exception as e:
+            self.redis = None
+            self._remove_script = None
+            _token_store_logger.error(
+                "建立 Redis Token存储连接失败 (Failed to connect Redis token store): %s",
+                e,
+                exc_info=True,
+            )
+            raise
+
+    async def disconnect(self) -> None:
+        """关闭与Redis服务器的连接。(Closes the connection to the Redis server.)"""
+        if self.redis:
+            await self.redis.close()
+            self.redis = None
+            self._remove_script = None
+            _token_store_logger.info(
+                "Redis Token存储连接已关闭。 (Redis token store connection closed.)"
+            )
+
+    async def add(
+        self, token: str, user_uid: str, tags: List[str], expires_at: float
+    ) -> None:
+        """以与Token有效期一致的TTL保存Token。(Stores the token with a TTL matching its lifetime.)"""
+        if not self.redis:
+            await self.connect()
+        assert self.redis is not None, (
+            "Redis连接未初始化 (Redis connection not initialized)"
+        )
+
+        ttl_seconds = max(1, math.ceil(expires_at - time.time()))
+        payload = json.dumps(
+            {"user_uid": user_uid, "tags": tags, "expires_at": expires_at}
+        )
+        user_tokens_key = self._get_user_tokens_key(user_uid)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            await pipe.set(self._get_token_key(token), payload, ex=ttl_seconds)
+            await pipe.sadd(user_tokens_key, token)
+            # 用户集合的TTL随最新签发的Token延长，集合中的过期成员在吊销时自然被忽略
+            # (The user set's TTL follows the newest token; stale members are ignored on revocation)
+            await pipe.expire(user_tokens_key, ttl_seconds)
+            await pipe.execute()
+
+    async def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """获取Token数据，不存在或已被Redis淘汰时返回 None。(Returns token data, or None if absent/evicted.)"""
+        if not self.redis:
+            await self.connect()
+        assert self.redis is not None, (
+            "Redis连接未初始化 (Redis connection not initialized)"
+        )
+
+        json_string = await self.redis.get(self._get_token_key(token))
+        if not json_string:
+            return None
+        try:
+            return json.loads(json_string)
+        except json.JSONDecodeError:
+            _token_store_logger.error(
+                "解码Token数据失败，Token将被视为无效。 (Failed to decode token data; treating token as invalid.)"
+            )
+            return None
+
+    async def remove(self, token: str) -> bool:
+        """删除单个Token及其在用户集合中的引用。(Deletes a token and its reference in the user set.)"""
+        if not self.redis:
+            await self.connect()
+        assert self.redis is not None, (
+            "Redis连接未初始化 (Redis connection not initialized)"
+        )
+
+        assert self._remove_script is not None, (
+            "Redis删除脚本未注册 (Redis removal script not registered)"
+        )
+        # 单次往返的原子删除，不会与并发的 `remove_all_for_user` 交错
+        # (Atomic removal in one round trip that cannot interleave with a concurrent `remove_all_for_user`)
+        deleted = await self._remove_script(
+            keys=[self._get_token_key(token)],
+            args=[USER_TOKENS_KEY_PREFIX, token],
+        )
+        return deleted == 1
+
+    async def remove_all_for_user(self, user_uid: str) -> int:
+        """删除指定用户的所有Token。(Deletes all tokens of the given user.)"""
+        if not self.redis:
+            await self.connect()
+        assert self.redis is not None, (
+            "Redis连接未初始化 (Redis connection not initialized)"
+        )
+
+        user_tokens_key = self._get_user_tokens_key(user_uid)
+        tokens = await self.redis.smembers(user_tokens_key)
+        if not tokens:
+            return 0
+        token_keys = [self._get_token_key(token) for token in tokens]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            await pipe.delete(*token_keys)
+            await pipe.delete(user_tokens_key)
+            results = await pipe.execute()
+        # 实际删除的Token键数量 (Number of token keys actually deleted)
+        return results[0]
+
+    async def list_all(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """通过 SCAN 列出所有Token，仅用于管理接口。(Lists all tokens via SCAN; admin use only.)"""
+        if not self.redis:
+            await self.connect()
+        assert self.redis is not None, (
+            "Redis连接未初始化 (Redis connection not initialized)"
+        )
+
+        prefix_len = len(TOKEN_KEY_PREFIX) + 1
+        keys = [
+            key async for key in self.redis.scan_iter(match=f"{TOKEN_KEY_PREFIX}:*")
+        ]
+        if not keys:
+            return []
+        json_strings = await self.redis.mget(*keys)  # 批量获取 (Batch get)
+        results: List[Tuple[str, Dict[str, Any]]] = []
+        for key, json_string in zip(keys, json_strings, strict=True):
+            if not json_string:  # 在SCAN与MGET之间过期 (Expired between SCAN and MGET)
+                continue
+            try:
+                results.append((key[prefix_len:], json.loads(json_string)))
+            except json.JSONDecodeError:
+                _token_store_logger.warning(
+                    "跳过无法解码的Token数据，键 (Skipping undecodable token data, key): %s...",
+                    key[: prefix_len + 8],
+                )
+        return results
+
+
+__all__ = [
+    "RedisTokenStore",
+    "TOKEN_KEY_PREFIX",
+    "USER_TOKENS_KEY_PREFIX",
+]
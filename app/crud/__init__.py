@@ -9,23 +9,20 @@ app.crud 包初始化文件。
 - 初始化的 CRUD 操作实例 (如 `user_crud_instance`)。
 - CRUD 操作类的定义 (如 `UserCRUD`)，主要用于类型提示和内部逻辑。
 - 数据存储库的实现类 (如 `JsonStorageRepository`)，主要用于类型提示和可能的直接使用场景。
+  这些类按需延迟导入，启动时只加载所配置的存储后端及其驱动依赖。
 - `initialize_crud_instances` 函数，用于在应用启动时初始化所有 CRUD 实例和数据存储库。
 """
 
+import importlib
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 
-from app.core.config import settings
+from app.core.config import Settings, settings
 from app.core.interfaces import IDataStorageRepository
 
-from .json_repository import JsonStorageRepository
-from .mysql_repository import MySQLStorageRepository
 from .paper import PaperCRUD
-from .postgres_repository import PostgresStorageRepository
 from .qb import QuestionBankCRUD
-from .redis_repository import RedisStorageRepository
 from .settings import SettingsCRUD
-from .sqlite_repository import SQLiteStorageRepository
 from .user import UserCRUD
 
 # 全局实例将由 initialize_crud_instances 函数设置
@@ -37,6 +34,131 @@ settings_crud_instance: Optional[SettingsCRUD] = None
 repository_instance: Optional[IDataStorageRepository] = None
 
 
+# region 存储后端分发表 (Storage backend dispatch table)
+
+
+def _json_repository_kwargs(app_settings: Settings) -> Dict[str, Any]:
+    file_paths_config = {
+        "user": Path(app_settings.database_files.users),
+        "paper": Path(app_settings.database_files.papers),
+        # TODO: 未来根据需要添加其他实体类型及其文件路径配置
+        # (TODO: Add other entity types and their file paths as needed in the future)
+        # "settings_app": Path("app_settings.json"), # 应用设置的JSON文件名示例
+        # "question_bank_meta": Path(settings.question_library_index_file), # 题库元数据文件名示例
+    }
+    return {
+        "file_paths_config": file_paths_config,
+        "base_data_dir": app_settings.data_dir,
+        "flush_interval": app_settings.json_flush_interval_seconds,
+        "durable_entity_types": app_settings.json_durable_entity_types,
+        "lazy_load": app_settings.json_lazy_load,
+    }
+
+
+def _postgres_repository_kwargs(app_settings: Settings) -> Dict[str, Any]:
+    return {
+        "dsn": app_settings.POSTGRES_DSN,
+        "host": app_settings.POSTGRES_HOST,
+        "port": app_settings.POSTGRES_PORT,
+        "user": app_settings.POSTGRES_USER,
+        "password": app_settings.POSTGRES_PASSWORD,
+        "database": app_settings.POSTGRES_DB,
+    }
+
+
+def _mysql_repository_kwargs(app_settings: Settings) -> Dict[str, Any]:
+    if not all(
+        [
+            app_settings.MYSQL_HOST,
+            app_settings.MYSQL_USER,
+            app_settings.MYSQL_PASSWORD,
+            app_settings.MYSQL_DB,
+        ]
+    ):
+        raise ValueError("配置中缺少必要的MySQL连接参数。")
+    return {
+        "host": app_settings.MYSQL_HOST,
+        "port": (
+            app_settings.MYSQL_PORT if app_settings.MYSQL_PORT is not None else 3306
+        ),
+        "user": app_settings.MYSQL_USER,
+        "password": app_settings.MYSQL_PASSWORD,
+        "db": app_settings.MYSQL_DB,
+        "pool_minsize": app_settings.MYSQL_POOL_MINSIZE,
+        "pool_maxsize": app_settings.MYSQL_POOL_MAXSIZE,
+        "pool_recycle": app_settings.MYSQL_POOL_RECYCLE_SECONDS,
+        "connect_timeout": app_settings.MYSQL_CONNECT_TIMEOUT_SECONDS,
+    }
+
+
+def _redis_repository_kwargs(app_settings: Settings) -> Dict[str, Any]:
+    return {
+        "redis_url": app_settings.REDIS_URL,
+        "host": app_settings.REDIS_HOST,
+        "port": app_settings.REDIS_PORT,
+        "db": app_settings.REDIS_DB,
+        "password": app_settings.REDIS_PASSWORD,
+    }
+
+
+def _sqlite_repository_kwargs(app_settings: Settings) -> Dict[str, Any]:
+    return {"db_file_path": Path(app_settings.SQLITE_DB_PATH)}
+
+
+# {存储类型: (模块路径, 类名, 构造参数函数)}，只有被选中的后端模块（及其驱动依赖）会被导入
+# ({storage type: (module path, class name, constructor kwargs builder)}; only the selected
+#  backend module (and its driver dependency) is imported)
+_STORAGE_BACKENDS: Dict[str, Tuple[str, str, Callable[[Settings], Dict[str, Any]]]] = {
+    "json": (
+        "app.crud.json_repository",
+        "JsonStorageRepository",
+        _json_repository_kwargs,
+    ),
+    "jsonl": (
+        "app.crud.json_repository",
+        "JsonlStorageRepository",
+        _json_repository_kwargs,
+    ),
+    "postgres": (
+        "app.crud.postgres_repository",
+        "PostgresStorageRepository",
+        _postgres_repository_kwargs,
+    ),
+    "mysql": (
+        "app.crud.mysql_repository",
+        "MySQLStorageRepository",
+        _mysql_repository_kwargs,
+    ),
+    "redis": (
+        "app.crud.redis_repository",
+        "RedisStorageRepository",
+        _redis_repository_kwargs,
+    ),
+    "sqlite": (
+        "app.crud.sqlite_repository",
+        "SQLiteStorageRepository",
+        _sqlite_repository_kwargs,
+    ),
+}
+
+# 存储库类名到模块路径的映射，供 `from app.crud import XxxStorageRepository` 延迟导入使用
+# (Repository class name to module path, used to lazily serve `from app.crud import XxxStorageRepository`)
+_REPOSITORY_MODULES: Dict[str, str] = {
+    class_name: module_path for module_path, class_name, _ in _STORAGE_BACKENDS.values()
+}
+
+
+def __getattr__(name: str) -> Any:
+    """按需导入存储库类 (Imports repository classes on first access, PEP 562)."""
+    module_path = _REPOSITORY_MODULES.get(name)
+    if module_path is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_path), name)
+
+
+# endregion
+
+
 async def initialize_crud_instances():
     """
     异步初始化所有 CRUD 实例和底层数据存储库。
@@ -52,59 +174,19 @@ async def initialize_crud_instances():
         settings_crud_instance, \
         repository_instance
 
-    if settings.data_storage_type == "json":
-        file_paths_config = {
-            "user": Path(settings.database_files.users),
-            "paper": Path(settings.database_files.papers),
-            # TODO: 未来根据需要添加其他实体类型及其文件路径配置
-            # (TODO: Add other entity types and their file paths as needed in the future)
-            # "settings_app": Path("app_settings.json"), # 应用设置的JSON文件名示例
-            # "question_bank_meta": Path(settings.question_library_index_file), # 题库元数据文件名示例
-        }
-        current_repository = JsonStorageRepository(
-            file_paths_config=file_paths_config, base_data_dir=settings.data_dir
-        )
-    elif settings.data_storage_type == "postgres":
-        current_repository = PostgresStorageRepository(
-            dsn=settings.POSTGRES_DSN,
-            host=settings.POSTGRES_HOST,
-            port=settings.POSTGRES_PORT,
-            user=settings.POSTGRES_USER,
-            password=settings.POSTGRES_PASSWORD,
-            database=settings.POSTGRES_DB,
-        )
-    elif settings.data_storage_type == "mysql":
-        if not all(
-            [
-                settings.MYSQL_HOST,
-                settings.MYSQL_USER,
-                settings.MYSQL_PASSWORD,
-                settings.MYSQL_DB,
-            ]
-        ):
-            raise ValueError("配置中缺少必要的MySQL连接参数。")
-        current_repository = MySQLStorageRepository(
-            host=settings.MYSQL_HOST,
-            port=(settings.MYSQL_PORT if settings.MYSQL_PORT is not None else 3306),
-            user=settings.MYSQL_USER,
-            password=settings.MYSQL_PASSWORD,
-            db=settings.MYSQL_DB,
-        )
-    elif settings.data_storage_type == "redis":
-        current_repository = RedisStorageRepository(
-            redis_url=settings.REDIS_URL,
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            password=settings.REDIS_PASSWORD,
-        )
-    elif settings.data_storage_type == "sqlite":
-        db_path = Path(settings.SQLITE_DB_PATH)
-        current_repository = SQLiteStorageRepository(db_file_path=db_path)
-    else:
+    backend = _STORAGE_BACKENDS.get(settings.data_storage_type)
+    if backend is None:
         raise ValueError(f"不支持的数据存储类型: {settings.data_storage_type}")
+    module_path, class_name, build_kwargs = backend
+    repository_class = getattr(importlib.import_module(module_path), class_name)
+    current_repository = repository_class(**build_kwargs(settings))
 
     await current_repository.connect()
+    # 支持并发建表的存储库 (如 MySQL) 先一次性初始化全部表，随后各 CRUD 的初始化直接返回
+    # (Repositories that can create tables concurrently (e.g. MySQL) initialize all tables up front;
+    #  the per-CRUD initialization below then returns immediately)
+    if hasattr(current_repository, "init_all_storage"):
+        await current_repository.init_all_storage()
     repository_instance = current_repository
 
     if repository_instance is None:
@@ -153,6 +235,7 @@ __all__ = [
     # 存储库类定义 (主要用于类型提示和特定场景)
     # (Repository Class definitions (for type hinting, specific scenarios))
     "JsonStorageRepository",
+    "JsonlStorageRepository",
     "PostgresStorageRepository",
     "MySQLStorageRepository",
     "RedisStorageRepository",
@@ -9,19 +9,218 @@ JSON文件存储库实现模块。
 
 import asyncio
 import copy
+import functools
 import json
 import logging
+import operator
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from app.core.interfaces import IDataStorageRepository
 
+try:  # orjson 为可选依赖，可显著加快序列化 (orjson is optional and speeds up serialization)
+    import orjson
+except ImportError:  # pragma: no cover - 取决于运行环境 (depends on the environment)
+    orjson = None
+
 _json_repo_logger = logging.getLogger(__name__)
 
 # 常见的ID字段名列表，用于自动索引
 # (List of common ID field names for automatic indexing)
 COMMON_ID_FIELDS = ["id", "uid", "paper_id"]
 
+# 启动时并行读取数据文件的最大线程数 (Maximum threads used to read data files in parallel at startup)
+_STARTUP_READ_WORKERS = 8
+
+# JSON 标量类型均不可变，克隆时可直接复用 (JSON scalar types are immutable and can be reused when cloning)
+_IMMUTABLE_SCALARS = (str, int, float, bool, type(None))
+
+
+def _fast_clone(obj: Any) -> Any:
+    """
+    针对JSON形态数据 (dict/list/标量) 的快速深拷贝，替代通用的 `copy.deepcopy`。
+    不需要 memo 表和拷贝协议分派；遇到其他可变类型时回退到 `copy.deepcopy`。
+    dict/list 先用 C 实现的浅拷贝一次分配好目标大小，再只替换其中的可变子对象，避免逐项插入时的扩容。
+    (Fast deep copy for JSON-shaped data (dict/list/scalars), replacing the generic
+     `copy.deepcopy`. Skips the memo table and copy-protocol dispatch; falls back to
+     `copy.deepcopy` for any other mutable type. Dicts and lists are first shallow-copied in C,
+     which allocates the final size once, and only their mutable children are replaced,
+     avoiding resizes from item-by-item insertion.)
+    """
+    if isinstance(obj, dict):
+        cloned_dict = obj.copy()
+        for key, value in obj.items():
+            if not isinstance(value, _IMMUTABLE_SCALARS):
+                cloned_dict[key] = _fast_clone(value)
+        return cloned_dict
+    if isinstance(obj, list):
+        cloned_list = obj.copy()
+        for index, value in enumerate(obj):
+            if not isinstance(value, _IMMUTABLE_SCALARS):
+                cloned_list[index] = _fast_clone(value)
+        return cloned_list
+    if isinstance(obj, _IMMUTABLE_SCALARS):
+        return obj
+    if isinstance(obj, tuple):
+        return tuple(_fast_clone(value) for value in obj)
+    return copy.deepcopy(obj)
+
+
+def _id_str(value: Any) -> str:
+    """
+    将ID值规范为字符串；已是 `str` 的值 (最常见的情况) 直接返回，不再调用 `str()`。
+    (Normalizes an ID value to a string; values that already are `str` (the common case)
+     are returned as-is without calling `str()`.)
+    """
+    return value if value.__class__ is str else str(value)
+
+
+# 标准库回退路径复用同一个编码器，避免每次 `json.dumps(indent=...)` 都新建 JSONEncoder
+# (The stdlib fallback reuses one encoder instead of building a JSONEncoder per `json.dumps(indent=...)` call)
+_JSON_ENCODER = json.JSONEncoder(indent=4, ensure_ascii=False)
+
+
+def _dumps(data: Any) -> bytes:
+    """
+    将数据序列化为UTF-8编码的JSON字节串；安装了 orjson 时使用 orjson (两空格缩进)，否则使用标准库 json。
+    结果在内存中一次生成，由调用方以单次写入落盘，而不是让序列化器逐个片段写文件。
+    (Serializes data to UTF-8 encoded JSON bytes; uses orjson (two-space indent) when
+     installed, otherwise the standard library json. The result is built in memory and
+     written by the caller in a single write, instead of the serializer writing the file
+     fragment by fragment.)
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return _JSON_ENCODER.encode(data).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_match_predicate(
+    keys: Tuple[str, ...],
+) -> Callable[[Dict[str, Any], Tuple[Any, ...]], bool]:
+    """
+    为一组固定的条件字段编译匹配函数 `predicate(item, values)`，按字段组合缓存。
+    用 `operator.itemgetter` 一次取出所有字段再整体比较元组，缺失字段按 `None` 处理 (与 `item.get` 一致)。
+    (Compiles a `predicate(item, values)` for a fixed set of condition keys, cached per key
+     combination. `operator.itemgetter` fetches all fields at once and the tuples are compared
+     in one go; missing fields count as `None`, matching `item.get`.)
+    """
+    getter = operator.itemgetter(*keys)
+    single_key = len(keys) == 1
+
+    def predicate(item: Dict[str, Any], values: Tuple[Any, ...]) -> bool:
+        try:
+            fetched = getter(item)
+        except KeyError:
+            return tuple(item.get(key) for key in keys) == values
+        return (fetched == values[0]) if single_key else (fetched == values)
+
+    return predicate
+
+
+def _dumps_array_element(item: Any) -> bytes:
+    """
+    将单个实体序列化为JSON数组中的一个元素 (已按数组内层级缩进)，拼接结果与 `_dumps(列表)` 完全一致。
+    (Serializes one entity as an element of a JSON array, already indented for the array
+     level, so the joined result is identical to `_dumps(list)`.)
+    """
+    if orjson is not None:
+        encoded = orjson.dumps(
+            item, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        )
+        padding = b"  "
+    else:
+        encoded = _JSON_ENCODER.encode(item).encode("utf-8")
+        padding = b"    "
+    # JSON字符串中的换行已被转义，按字节换行拆分是安全的
+    # (Newlines inside JSON strings are escaped, so splitting on raw newlines is safe)
+    return padding + encoded.replace(b"\n", b"\n" + padding)
+
+
+def _dumps_line(record: Any) -> bytes:
+    """将单条记录序列化为紧凑的一行JSON (含换行符)，用于JSONL文件。(Serializes one record as a compact JSON line, newline included, for JSONL files.)"""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _loads(raw: bytes) -> Any:
+    """解析JSON字节串 (Parses JSON bytes)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _temp_path(file_path: Path) -> Path:
+    """`_atomic_write_bytes` 使用的临时文件路径 (Temporary file path used by `_atomic_write_bytes`)."""
+    return file_path.with_name(file_path.name + ".tmp")
+
+
+def _recover_temp_file(file_path: Path) -> None:
+    """
+    处理进程在原子写入中途退出后遗留的临时文件 (阻塞调用)。目标文件存在时它仍是完整的旧版本，
+    临时文件直接删除；目标文件不存在 (首次写入时崩溃) 时将临时文件提升为目标文件，
+    内容不完整时由加载逻辑按损坏文件处理。
+    (Handles a temporary file left behind when the process died during an atomic write;
+     blocking. If the target exists it is still the complete old version, so the temporary
+     file is removed; if not (a crash during the first write), the temporary file is promoted
+     to the target and the loader treats it as corrupt if it is incomplete.)
+    """
+    tmp_path = _temp_path(file_path)
+    if not tmp_path.exists():
+        return
+    try:
+        if file_path.exists():
+            tmp_path.unlink()
+            _json_repo_logger.warning(
+                f"已删除上次未完成写入遗留的临时文件 '{tmp_path}'。"
+            )
+        else:
+            os.replace(tmp_path, file_path)
+            _json_repo_logger.warning(
+                f"'{file_path}' 不存在，已将上次写入遗留的临时文件 '{tmp_path}' 提升为数据文件。"
+            )
+    except OSError as e:
+        _json_repo_logger.error(f"处理遗留的临时文件 '{tmp_path}' 失败: {e}")
+
+
+def _atomic_write_bytes(file_path: Path, data: bytes, durable: bool = False) -> None:
+    """
+    原子地替换文件内容: 先写入同目录下的临时文件，再用 `os.replace` 覆盖目标文件，
+    读者只会看到旧文件或完整的新文件。`durable` 为真时在替换前 fsync 临时文件。
+    (阻塞调用，供 `asyncio.to_thread` 使用。)
+    (Atomically replaces the file content: writes a temporary file in the same directory,
+     then moves it over the target with `os.replace`, so readers only ever see the old file
+     or the complete new one. When `durable` is true the temporary file is fsynced before
+     the replace. Blocking; meant for `asyncio.to_thread`.)
+    """
+    tmp_path = _temp_path(file_path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _append_bytes(file_path: Path, data: bytes, durable: bool = False) -> None:
+    """
+    将数据追加到文件末尾；`durable` 为真时 fsync。(阻塞调用，供 `asyncio.to_thread` 使用。)
+    (Appends data to the end of a file, fsyncing when `durable` is true. Blocking; meant
+     for `asyncio.to_thread`.)
+    """
+    with open(file_path, "ab") as f:
+        f.write(data)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+
 
 class JsonStorageRepository(IDataStorageRepository):
     """
@@ -30,19 +229,28 @@ class JsonStorageRepository(IDataStorageRepository):
     此实现包含对常见ID字段的内存索引，以加速 `get_by_id` 操作。
 
     性能提示 (Performance Notes):
-    - `get_by_id`: 如果查询的ID字段被索引 (见 `COMMON_ID_FIELDS`)，则查找速度非常快 (O(1))。
-                   否则，如果需要回退到线性扫描 (当前未实现回退)，则为 O(n)。
+    - `get_by_id`, `update`, `delete`: 通过ID索引定位实体 (O(1))；索引未命中即视为不存在，不做线性扫描。
+                   `delete` 还借助位置索引 (`_item_positions`) 直接定位列表中的行，并以交换删除 (O(1)) 移除它，
+                   因此删除后列表 (及 `get_all` 分页) 的顺序不作保证。
     - `create`, `delete`: 除了文件I/O，还包括对索引的更新，通常很快。
     - `update`: 如果ID不变且直接修改内存中的对象引用，索引不需要更新。
-    - `query`, `get_all`: 这些操作目前依赖于Python的列表迭代和字典比较，
-                         对于大型数据集，其性能可能不如数据库的查询引擎。
-    - `_persist_data_to_file`: **重要**: 此方法在每次创建、更新或删除操作后重写整个JSON文件。
+    - `query`: 对可哈希的条件值使用按需构建的二级索引 (`_secondary_indexes`)，只在候选集上比较其余条件。
+    - `get_all`: 直接对内存列表切片。
+    - `_persist_data_to_file`: **重要**: 此方法在每次创建、更新或删除操作后重写整个JSON文件
+                               (设置 `flush_interval` 后改由后台写入任务执行，窗口内的多次修改合并为一次重写)。
                                对于频繁写入或大型数据集，这可能成为严重的性能瓶颈，并增加I/O负载。
-                               考虑使用更高级的数据存储方案（如SQLite、NoSQL数据库）或更复杂的
-                               文件更新策略（例如，仅追加日志式的更改，定期压缩文件）以优化性能。
+                               此时可改用 `JsonlStorageRepository` (`data_storage_type="jsonl"`)，
+                               它每次修改只追加一行并定期压缩文件；或使用SQLite等数据库后端。
     """
 
-    def __init__(self, file_paths_config: Dict[str, Path], base_data_dir: Path):
+    def __init__(
+        self,
+        file_paths_config: Dict[str, Path],
+        base_data_dir: Path,
+        flush_interval: float = 0.0,
+        durable_entity_types: Optional[Iterable[str]] = None,
+        lazy_load: bool = False,
+    ):
         """
         初始化 JsonStorageRepository。
         (Initializes the JsonStorageRepository.)
@@ -54,8 +262,44 @@ class JsonStorageRepository(IDataStorageRepository):
                                                   JSON file paths (relative to `base_data_dir`).)
             base_data_dir (Path): 存储数据文件的基础目录。
                                   (The base directory for storing data files.)
+            flush_interval (float): 写入合并的延迟秒数。大于0时，修改只标记实体类型为脏并立即返回，
+                                    由后台写入任务在该时间窗口结束后统一重写；进程在窗口内崩溃会丢失
+                                    这段时间的修改。0 表示每次修改后在调用方中立即写入。
+                                    (Write-coalescing delay in seconds. When > 0, changes only mark
+                                     the entity type dirty and return at once; a background writer
+                                     rewrites the files when the window closes, so a crash within the
+                                     window loses those changes. 0 writes in the caller right after
+                                     every change.)
+            durable_entity_types (Optional[Iterable[str]]): 每次写入都需要 fsync 落盘的实体类型。
+                                    其他类型同样原子替换文件，但不等待 fsync。
+                                    (Entity types whose writes are fsynced to disk. Other types
+                                     are still replaced atomically but skip the fsync.)
+            lazy_load (bool): 为真时启动时不读取数据文件，而是在每个实体类型首次被访问时加载。
+                              (When true, data files are not read at startup but loaded the first
+                               time each entity type is accessed.)
         """
         self.base_data_dir = base_data_dir
+        self.flush_interval = flush_interval
+        self.durable_entity_types = frozenset(durable_entity_types or ())
+        self.lazy_load = lazy_load
+        # 已配置但尚未加载数据的实体类型 (仅 `lazy_load` 模式)
+        # (Configured entity types whose data is not loaded yet; `lazy_load` mode only)
+        self._unloaded_types: Set[str] = set()
+        # 后台写入任务及其待写入的实体类型 (仅 `flush_interval > 0` 时使用)
+        # (Background writer task and the entity types it still has to write; `flush_interval > 0` only)
+        self._writer_task: Optional[asyncio.Task] = None
+        self._dirty_types: Set[str] = set()
+        self._dirty_event: Optional[asyncio.Event] = None
+        # 写入任务正在等待唤醒或合并窗口 (而非写文件) 时置位，此时可安全取消
+        # (Set while the writer waits for a wake-up or the window rather than writing; it can be cancelled safely then)
+        self._writer_idle: Optional[asyncio.Event] = None
+        # 每个实体类型最近一次序列化快照的代号，用于跳过已过时的排队写入
+        # (Generation of each entity type's latest serialized snapshot, used to skip stale queued writes)
+        self._persist_generations: Dict[str, int] = {}
+        # 每个实体类型最近一次排队写入的完成结果，被跳过的写入等待它，确保返回时自己的修改已落盘
+        # (Completion of each entity type's latest queued write; skipped writes await it so their
+        #  own change is on disk before they return)
+        self._persist_results: Dict[str, asyncio.Future] = {}
         self.file_paths: Dict[str, Path] = {
             entity_type: self.base_data_dir / path_suffix
             for entity_type, path_suffix in file_paths_config.items()
@@ -64,6 +308,29 @@ class JsonStorageRepository(IDataStorageRepository):
         # 内存ID索引: {entity_type: {id_field_name: {entity_id_value: entity_object_reference}}}
         # (In-memory ID index: {entity_type: {id_field_name: {entity_id_value: entity_object_reference}}})
         self.id_indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # 位置索引: {entity_type: {id(item): list_index}}，用于 O(1) 定位列表中的行，
+        # 并让 `query` 无需扫描即可按列表顺序排列候选结果；按对象身份索引，没有主ID的行同样覆盖
+        # (Position index: {entity_type: {id(item): list_index}}, used to locate a row in the list
+        #  in O(1) and to let `query` order candidates by list order without scanning; keyed by
+        #  object identity, so rows without a primary ID are covered too)
+        self._item_positions: Dict[str, Dict[int, int]] = {}
+        # 每个实体类型的主ID字段 (由首条数据确定): {entity_type: id_field_name}
+        # (Primary ID field per entity type, decided by its first record: {entity_type: id_field_name})
+        self._primary_id_field: Dict[str, str] = {}
+        # 按需构建的二级索引: {entity_type: {field: {value: {id(item): item}}}}，供 `query` 使用
+        # (Lazily built secondary indexes used by `query`: {entity_type: {field: {value: {id(item): item}}}})
+        self._secondary_indexes: Dict[str, Dict[str, Dict[Any, Dict[int, Any]]]] = {}
+        # 各实体上次写入时的序列化结果: {entity_type: {id(item): (item, bytes)}}；
+        # 保留对象引用以确保 id() 不会被复用
+        # (Each entity's bytes from the last write: {entity_type: {id(item): (item, bytes)}};
+        #  the object reference is kept so id() cannot be reused)
+        self._serialized_cache: Dict[str, Dict[int, Any]] = {}
+        # 各实体类型上次写入的完整文件内容及其包含的实体数: {entity_type: (item_count, bytes)}。
+        # 只有追加 (`create`) 发生时仍然有效，`update`/`delete` 会使其失效
+        # (Each entity type's last written file content and its entity count:
+        #  {entity_type: (item_count, bytes)}. Stays valid while only appends (`create`)
+        #  happen; `update`/`delete` invalidate it)
+        self._snapshot_cache: Dict[str, Tuple[int, bytes]] = {}
 
         # 为每种预定义实体类型的文件操作创建一个异步锁
         # (Create an async lock for file operations for each predefined entity type)
@@ -75,6 +342,12 @@ class JsonStorageRepository(IDataStorageRepository):
         # (Note: If new entity types are dynamically added via the `create` method,
         #  ensure locks are also created for these new types (handled in `create` method).)
 
+        # 已确认存在的数据目录；每个目录只调用一次 mkdir，而不是每次写入都调用
+        # (Data directories known to exist; mkdir runs once per directory instead of on every write)
+        self._dirs_created: Set[Path] = set()
+        for file_path in self.file_paths.values():
+            self._ensure_parent_dir(file_path)
+
         self._load_all_data_on_startup()  # 初始化时加载所有数据并构建索引
         # (Load all data and build indexes on initialization)
 
@@ -94,6 +367,12 @@ class JsonStorageRepository(IDataStorageRepository):
         _json_repo_logger.debug(f"开始为实体类型 '{entity_type}' 构建ID索引。")
         # 清除该实体类型现有的所有ID字段索引 (Clear all existing ID field indexes for this entity type)
         self.id_indexes[entity_type] = {}
+        self._item_positions[entity_type] = {}
+        self._primary_id_field.pop(entity_type, None)
+        # 二级索引在下一次 `query` 时按需重建 (Secondary indexes are rebuilt lazily on the next `query`)
+        self._secondary_indexes[entity_type] = {}
+        self._serialized_cache.pop(entity_type, None)
+        self._snapshot_cache.pop(entity_type, None)
 
         if (
             entity_type not in self.in_memory_data
@@ -102,21 +381,24 @@ class JsonStorageRepository(IDataStorageRepository):
             _json_repo_logger.debug(f"实体类型 '{entity_type}' 无数据，跳过索引构建。")
             return
 
-        for item in self.in_memory_data[entity_type]:
+        self._detect_primary_id_field(entity_type, self.in_memory_data[entity_type][0])
+        positions = self._item_positions[entity_type]
+        type_indexes = self.id_indexes[entity_type]
+        for position, item in enumerate(self.in_memory_data[entity_type]):
+            positions[id(item)] = position
             for id_field_name in COMMON_ID_FIELDS:
                 if id_field_name in item:
-                    entity_id_value = str(
+                    entity_id_value = _id_str(
                         item[id_field_name]
                     )  # 确保ID值为字符串 (Ensure ID value is string)
 
-                    # 如果该ID字段的索引尚未初始化，则创建它
-                    # (If the index for this ID field hasn't been initialized, create it)
-                    if id_field_name not in self.id_indexes[entity_type]:
-                        self.id_indexes[entity_type][id_field_name] = {}
-
-                    # 添加到索引，值为对内存中实际对象的引用
-                    # (Add to index, value is a reference to the actual object in memory)
-                    self.id_indexes[entity_type][id_field_name][entity_id_value] = item
+                    # 添加到索引 (字段索引尚未初始化时先创建)，值为对内存中实际对象的引用
+                    # (Add to the index, creating the field's index first if needed; the value
+                    #  is a reference to the actual object in memory)
+                    id_map = type_indexes.get(id_field_name)
+                    if id_map is None:
+                        id_map = type_indexes[id_field_name] = {}
+                    id_map[entity_id_value] = item
 
         indexed_fields_count = {
             field: len(idx) for field, idx in self.id_indexes[entity_type].items()
@@ -125,39 +407,341 @@ class JsonStorageRepository(IDataStorageRepository):
             f"为实体类型 '{entity_type}' 构建ID索引完成。索引字段及条目数: {indexed_fields_count}"
         )
 
-    def _load_all_data_on_startup(self) -> None:
-        """在启动时从所有配置的JSON文件加载数据到内存中，并为每个实体类型构建ID索引。"""
-        for entity_type, file_path in self.file_paths.items():
-            if entity_type not in self.in_memory_data:
-                self.in_memory_data[entity_type] = []
+    def _detect_primary_id_field(
+        self, entity_type: str, item: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        按 `COMMON_ID_FIELDS` 的优先级从给定实体确定并缓存该实体类型的主ID字段。
+        (Determines and caches the entity type's primary ID field from the given entity,
+         by `COMMON_ID_FIELDS` precedence.)
+        """
+        for id_field_name in COMMON_ID_FIELDS:
+            if id_field_name in item:
+                self._primary_id_field[entity_type] = id_field_name
+                return id_field_name
+        return None
 
-            if file_path.exists() and file_path.is_file():
+    def _resolve_id(self, entity_type: str, item: Dict[str, Any]) -> Optional[str]:
+        """
+        解析实体的主ID (字符串形式)。优先读取缓存的主ID字段，仅当实体缺少该字段时
+        才按 `COMMON_ID_FIELDS` 的优先级逐个检查。
+        (Resolves an entity's primary ID (as a string). Reads the cached primary ID field
+         first and only walks `COMMON_ID_FIELDS` precedence when the entity lacks it.)
+        """
+        primary_field = self._primary_id_field.get(entity_type)
+        if primary_field is not None and primary_field in item:
+            return _id_str(item[primary_field])
+        for id_field_name in COMMON_ID_FIELDS:
+            if id_field_name in item:
+                return _id_str(item[id_field_name])
+        return None
+
+    def _find_item_ref(
+        self, entity_type: str, entity_id_str: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        通过ID索引查找内存中实体对象的引用 (非副本)。
+        索引在加载、`create` 和 `delete` 中与内存列表同步维护，未命中即表示实体不存在，不再线性扫描。
+        (Looks up the in-memory entity object reference (not a copy) via the ID indexes.
+         The indexes are kept in sync with the in-memory list by loading, `create` and
+         `delete`, so a miss means the entity does not exist; there is no linear scan.)
+        """
+        type_indexes = self.id_indexes.get(entity_type)
+        if type_indexes is None:
+            # 实体类型从未加载或创建过 (The entity type was never loaded or created)
+            return None
+
+        # 先查主ID字段的索引，通常一次字典查找即可命中
+        # (Check the primary ID field's index first; usually a single dict lookup hits)
+        primary_field = self._primary_id_field.get(entity_type)
+        if primary_field is not None:
+            primary_map = type_indexes.get(primary_field)
+            if primary_map is not None:
+                indexed_item = primary_map.get(entity_id_str)
+                if indexed_item is not None:
+                    return indexed_item
+
+        for id_field_name, id_map in type_indexes.items():
+            if id_field_name != primary_field and id_field_name in COMMON_ID_FIELDS:
+                indexed_item = id_map.get(entity_id_str)
+                if indexed_item is not None:
+                    return indexed_item
+        return None
+
+    def _find_position(self, entity_type: str, item: Dict[str, Any]) -> int:
+        """
+        返回实体对象在内存列表中的位置，未找到时返回 -1。
+        优先使用位置索引；若索引与列表不一致 (例如数据被直接修改)，则按对象身份扫描。
+        (Returns the position of the entity object in the in-memory list, or -1 if absent.
+         Uses the position index first; if it is out of sync with the list
+         (e.g. data modified directly), scans by object identity.)
+        """
+        items = self.in_memory_data.get(entity_type, [])
+        position = self._item_positions.get(entity_type, {}).get(id(item), -1)
+        if 0 <= position < len(items) and items[position] is item:
+            return position
+        for position, item_in_list in enumerate(items):
+            if item_in_list is item:
+                return position
+        return -1
+
+    def _get_item_positions(self, entity_type: str) -> Dict[int, int]:
+        """
+        返回实体类型的位置索引 {id(item): list_index}。条目数与列表长度不一致
+        (数据绕过仓库被直接修改) 时整体重建一次，而不是对每一行回退到线性扫描。
+        (Returns the entity type's position index {id(item): list_index}. When its size no
+         longer matches the list (data modified directly, bypassing the repository) it is
+         rebuilt once instead of falling back to a linear scan per row.)
+        """
+        items = self.in_memory_data.get(entity_type, [])
+        positions = self._item_positions.get(entity_type)
+        if positions is None or len(positions) != len(items):
+            positions = self._item_positions[entity_type] = {
+                id(item): position for position, item in enumerate(items)
+            }
+        return positions
+
+    def _get_secondary_index(
+        self, entity_type: str, field: str
+    ) -> Dict[Any, Dict[int, Any]]:
+        """
+        返回实体类型某字段的二级索引 {值: {id(item): item}}，首次使用时扫描一次构建。
+        缺失字段按 None 索引 (与 `item.get(field)` 一致)；不可哈希的值不入索引，
+        因为它们不可能等于可哈希的查询值。
+        (Returns the secondary index {value: {id(item): item}} of a field, building it with
+         one scan on first use. Missing fields are indexed under None (matching
+         `item.get(field)`); unhashable values are skipped since they can never equal a
+         hashable query value.)
+        """
+        type_indexes = self._secondary_indexes.setdefault(entity_type, {})
+        field_index = type_indexes.get(field)
+        if field_index is None:
+            field_index = {}
+            for item in self.in_memory_data.get(entity_type, []):
                 try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        if isinstance(data, list):
-                            self.in_memory_data[entity_type] = data
-                            _json_repo_logger.info(
-                                f"成功为实体类型 '{entity_type}' 从 '{file_path}' 加载了 {len(data)} 条记录。"
-                            )
-                        else:
-                            _json_repo_logger.warning(
-                                f"文件 '{file_path}' (实体类型 '{entity_type}') 的数据不是列表格式。将初始化为空列表。"
-                            )
-                            self.in_memory_data[entity_type] = []
-                except (json.JSONDecodeError, IOError) as e:
-                    _json_repo_logger.error(
-                        f"为实体类型 '{entity_type}' 从 '{file_path}' 加载数据失败: {e}。将初始化为空列表。"
-                    )
-                    self.in_memory_data[entity_type] = []
-            else:
+                    field_index.setdefault(item.get(field), {})[id(item)] = item
+                except TypeError:
+                    continue
+            type_indexes[field] = field_index
+        return field_index
+
+    def _secondary_index_add(
+        self,
+        entity_type: str,
+        item: Dict[str, Any],
+        fields: Optional[Iterable[str]] = None,
+    ) -> None:
+        """将实体加入已构建的二级索引 (Adds an entity to the secondary indexes already built)."""
+        type_indexes = self._secondary_indexes.get(entity_type)
+        if not type_indexes:
+            return
+        for field in type_indexes if fields is None else fields:
+            field_index = type_indexes.get(field)
+            if field_index is None:
+                continue
+            try:
+                field_index.setdefault(item.get(field), {})[id(item)] = item
+            except TypeError:
+                continue
+
+    def _secondary_index_remove(
+        self,
+        entity_type: str,
+        item: Dict[str, Any],
+        fields: Optional[Iterable[str]] = None,
+    ) -> None:
+        """将实体从已构建的二级索引中移除 (Removes an entity from the secondary indexes already built)."""
+        type_indexes = self._secondary_indexes.get(entity_type)
+        if not type_indexes:
+            return
+        for field in type_indexes if fields is None else fields:
+            field_index = type_indexes.get(field)
+            if field_index is None:
+                continue
+            try:
+                bucket = field_index.get(item.get(field))
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.pop(id(item), None)
+                if not bucket:
+                    del field_index[item.get(field)]
+
+    def _decode_entities(self, entity_type: str, raw: bytes) -> Any:
+        """将文件内容解析为实体列表；子类可改变文件格式 (Parses file content into the entity list; subclasses may change the file format)."""
+        return _loads(raw)
+
+    def _encode_entities(
+        self, items: List[Dict[str, Any]], entity_type: Optional[str] = None
+    ) -> bytes:
+        """
+        将实体列表序列化为完整的文件内容。给定 `entity_type` 时复用该类型上次写入时各实体的序列化结果，
+        只重新编码新增或经 `update` 修改过的实体；若上次写入后只发生过追加，则直接在上次的文件内容后拼接新实体。
+        (Serializes the entity list into the full file content. When `entity_type` is given,
+         each entity's bytes from the type's previous write are reused and only entities that
+         are new or were changed through `update` are encoded again; if only appends happened
+         since the previous write, the new entities are spliced onto the previous content.)
+        """
+        if entity_type is None:
+            return _dumps(items)
+        if not items:
+            self._serialized_cache[entity_type] = {}
+            self._snapshot_cache[entity_type] = (0, b"[]")
+            return b"[]"
+
+        snapshot = self._snapshot_cache.get(entity_type)
+        if snapshot is not None and snapshot[0] <= len(items):
+            return self._append_to_snapshot(entity_type, items, *snapshot)
+
+        previous_cache = self._serialized_cache.get(entity_type, {})
+        current_cache: Dict[int, Any] = {}
+        parts: List[bytes] = []
+        for item in items:
+            cached_entry = previous_cache.get(id(item))
+            if cached_entry is None or cached_entry[0] is not item:
+                cached_entry = (item, _dumps_array_element(item))
+            current_cache[id(item)] = cached_entry
+            parts.append(cached_entry[1])
+        # 只保留仍在列表中的实体，被删除实体的缓存随之丢弃
+        # (Only entities still in the list are kept, so deleted ones drop out of the cache)
+        self._serialized_cache[entity_type] = current_cache
+        encoded = b"[\n" + b",\n".join(parts) + b"\n]"
+        self._snapshot_cache[entity_type] = (len(items), encoded)
+        return encoded
+
+    def _append_to_snapshot(
+        self,
+        entity_type: str,
+        items: List[Dict[str, Any]],
+        snapshot_count: int,
+        snapshot: bytes,
+    ) -> bytes:
+        """
+        将 `items[snapshot_count:]` (上次写入后新增的实体) 拼接到上次写入的文件内容之后，
+        只编码新增实体，代价与新增数据量成正比而不是与实体总数成正比。
+        (Splices `items[snapshot_count:]`, the entities appended since the previous write, onto
+         the previously written content. Only the new entities are encoded, so the cost scales
+         with the appended data rather than with the total number of entities.)
+        """
+        if snapshot_count == len(items):
+            return snapshot
+        item_cache = self._serialized_cache.setdefault(entity_type, {})
+        new_parts: List[bytes] = []
+        for item in items[snapshot_count:]:
+            cached_entry = (item, _dumps_array_element(item))
+            item_cache[id(item)] = cached_entry
+            new_parts.append(cached_entry[1])
+        appended = b",\n".join(new_parts) + b"\n]"
+        if snapshot_count == 0:
+            encoded = b"[\n" + appended
+        else:
+            # 去掉上次内容末尾的 "\n]" 后接上新实体 (Drop the trailing "\n]" of the previous content and continue)
+            encoded = snapshot[:-2] + b",\n" + appended
+        self._snapshot_cache[entity_type] = (len(items), encoded)
+        return encoded
+
+    def _read_entity_file(self, entity_type: str) -> Optional[bytes]:
+        """
+        读取实体类型的数据文件；文件不存在或读取失败时返回 None。(阻塞调用。)
+        (Reads an entity type's data file; returns None when it is missing or unreadable. Blocking.)
+        """
+        file_path = self.file_paths[entity_type]
+        _recover_temp_file(file_path)
+        if not (file_path.exists() and file_path.is_file()):
+            _json_repo_logger.info(
+                f"实体类型 '{entity_type}' 的文件在 '{file_path}' 未找到。将初始化为空列表。"
+            )
+            return None
+        try:
+            return file_path.read_bytes()
+        except IOError as e:
+            _json_repo_logger.error(
+                f"为实体类型 '{entity_type}' 从 '{file_path}' 加载数据失败: {e}。将初始化为空列表。"
+            )
+            return None
+
+    def _install_entity_data(self, entity_type: str, raw: Optional[bytes]) -> None:
+        """
+        解析文件内容并装入内存，然后构建ID索引；`raw` 为 None 时初始化为空列表。
+        (Parses file content into memory and builds the ID indexes; initializes an empty
+         list when `raw` is None.)
+        """
+        file_path = self.file_paths[entity_type]
+        data: Any = []
+        if raw is not None:
+            try:
+                data = self._decode_entities(entity_type, raw)
+            except ValueError as e:
+                # 包括 JSONDecodeError，以及标准库回退路径对非UTF-8内容抛出的 UnicodeDecodeError
+                # (orjson 对两者都抛出 JSONDecodeError)
+                # (Covers JSONDecodeError and the UnicodeDecodeError the stdlib fallback raises for
+                #  non-UTF-8 content; orjson raises JSONDecodeError for both)
+                _json_repo_logger.error(
+                    f"为实体类型 '{entity_type}' 从 '{file_path}' 加载数据失败: {e}。将初始化为空列表。"
+                )
+                data = []
+            if isinstance(data, list):
                 _json_repo_logger.info(
-                    f"实体类型 '{entity_type}' 的文件在 '{file_path}' 未找到。将初始化为空列表。"
+                    f"成功为实体类型 '{entity_type}' 从 '{file_path}' 加载了 {len(data)} 条记录。"
+                )
+            else:
+                _json_repo_logger.warning(
+                    f"文件 '{file_path}' (实体类型 '{entity_type}') 的数据不是列表格式。将初始化为空列表。"
                 )
-                self.in_memory_data[entity_type] = []
+                data = []
 
-            # 为加载的数据构建索引 (Build indexes for the loaded data)
-            self._build_id_indexes(entity_type)
+        self.in_memory_data[entity_type] = data
+        # 为加载的数据构建索引 (Build indexes for the loaded data)
+        self._build_id_indexes(entity_type)
+
+    def _ensure_parent_dir(self, file_path: Path) -> None:
+        """确保文件的父目录存在，同一目录只创建一次 (Makes sure the file's parent directory exists, creating each directory once)."""
+        parent_dir = file_path.parent
+        if parent_dir not in self._dirs_created:
+            parent_dir.mkdir(parents=True, exist_ok=True)
+            self._dirs_created.add(parent_dir)
+
+    def _load_all_data_on_startup(self) -> None:
+        """
+        在启动时从所有配置的JSON文件加载数据到内存中，并为每个实体类型构建ID索引。
+        启用 `lazy_load` 时只登记实体类型，数据在首次访问时由 `_ensure_loaded` 加载。
+        (Loads all configured JSON files into memory at startup and builds the ID indexes.
+         With `lazy_load` enabled only the entity types are registered; their data is
+         loaded by `_ensure_loaded` on first access.)
+        """
+        if self.lazy_load:
+            self._unloaded_types.update(self.file_paths)
+            return
+
+        entity_types = list(self.file_paths)
+        if not entity_types:
+            return
+        # 各文件在线程池中并行读取，解析和建索引仍按顺序进行 (解析持有GIL，并行无益)
+        # (Files are read in parallel in a thread pool; parsing and indexing stay sequential,
+        #  since parsing holds the GIL and would not benefit)
+        with ThreadPoolExecutor(
+            max_workers=min(len(entity_types), _STARTUP_READ_WORKERS)
+        ) as executor:
+            raw_contents = list(executor.map(self._read_entity_file, entity_types))
+        for entity_type, raw in zip(entity_types, raw_contents, strict=True):
+            self._install_entity_data(entity_type, raw)
+
+    async def _ensure_loaded(self, entity_type: str) -> None:
+        """
+        确保实体类型的数据已加载 (仅在 `lazy_load` 模式下有实际工作)。文件读取在工作线程中进行，
+        解析和建索引在事件循环上完成；实体锁保证同一文件只加载一次。
+        (Makes sure an entity type's data is loaded (only does work in `lazy_load` mode). The
+         file is read in a worker thread while parsing and indexing happen on the event loop;
+         the entity lock makes sure each file is loaded once.)
+        """
+        if entity_type not in self._unloaded_types:
+            return
+        async with self.file_locks[entity_type]:
+            if entity_type not in self._unloaded_types:
+                return
+            raw = await asyncio.to_thread(self._read_entity_file, entity_type)
+            self._install_entity_data(entity_type, raw)
+            self._unloaded_types.discard(entity_type)
 
     async def _persist_data_to_file(self, entity_type: str) -> bool:
         """
@@ -167,16 +751,20 @@ class JsonStorageRepository(IDataStorageRepository):
         性能警告 (Performance Warning):
             此方法会重写实体类型的整个JSON文件。对于频繁写入或大型数据集，
             这可能成为一个显著的性能瓶颈，并可能导致大量的磁盘I/O。
-            在生产环境中，应考虑更健壮的数据存储解决方案或优化写入策略。
+            写入频繁时可改用只追加变更的 `JsonlStorageRepository`，或启用 `flush_interval` 合并写入。
             (This method rewrites the entire JSON file for the entity type. For frequent writes
              or large datasets, this can become a significant performance bottleneck and may
-             lead to substantial disk I/O. In production environments, consider more robust
-             data storage solutions or optimized writing strategies.)
+             lead to substantial disk I/O. For write-heavy workloads use the append-only
+             `JsonlStorageRepository` or enable `flush_interval` to coalesce writes.)
         """
         if entity_type not in self.file_paths:
             _json_repo_logger.error(f"尝试持久化未知的实体类型 '{entity_type}'。")
             return False
 
+        if entity_type in self._unloaded_types:
+            # 尚未加载即未被修改，不能用空列表覆盖文件 (Not loaded means not modified; never overwrite the file with an empty list)
+            return True
+
         file_path = self.file_paths[entity_type]
         lock = self.file_locks.get(entity_type)
         if not lock:
@@ -185,115 +773,311 @@ class JsonStorageRepository(IDataStorageRepository):
             )
             return False
 
-        async with lock:
-            try:
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                data_to_write = copy.deepcopy(self.in_memory_data.get(entity_type, []))
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(data_to_write, f, indent=4, ensure_ascii=False)
-                _json_repo_logger.debug(
-                    f"成功持久化实体类型 '{entity_type}' 的数据到 '{file_path}'。"
-                )
-                return True
-            except Exception as e:
-                _json_repo_logger.error(
-                    f"持久化实体类型 '{entity_type}' 的数据到 '{file_path}' 失败: {e}",
-                    exc_info=True,
-                )
-                return False
+        # 无需深拷贝快照，也无需持锁序列化: 序列化在事件循环上一次完成、期间不会让出，
+        # 且 create/update/delete 在等待持久化之前已完成内存修改。
+        # 序列化结果是不可变字节串，锁只用于让磁盘写入按快照顺序进行。
+        # (Neither a deepcopy snapshot nor the lock is needed for serialization: it runs on
+        #  the event loop in one go without yielding, and create/update/delete finish their
+        #  in-memory mutation before awaiting persistence. The serialized bytes are immutable;
+        #  the lock only keeps disk writes in snapshot order.)
+        try:
+            serialized_data = self._encode_entities(
+                self.in_memory_data.get(entity_type, []), entity_type
+            )
+        except Exception as e:
+            _json_repo_logger.error(
+                f"序列化实体类型 '{entity_type}' 的数据失败: {e}", exc_info=True
+            )
+            return False
+        generation = self._persist_generations.get(entity_type, 0) + 1
+        self._persist_generations[entity_type] = generation
+        result = asyncio.get_running_loop().create_future()
+        self._persist_results[entity_type] = result
+
+        superseding: Optional[asyncio.Future] = None
+        persisted = False
+        try:
+            async with lock:
+                if self._persist_generations[entity_type] != generation:
+                    # 排队期间已有更新的快照，由它负责写入；在锁外等待它完成，而不是立即返回成功
+                    # (A newer snapshot queued meanwhile will be written instead; wait for it outside
+                    #  the lock rather than reporting success right away)
+                    if _json_repo_logger.isEnabledFor(logging.DEBUG):
+                        _json_repo_logger.debug(
+                            f"实体类型 '{entity_type}' 已有更新的快照等待写入，跳过本次写入。"
+                        )
+                    superseding = self._persist_results[entity_type]
+                else:
+                    persisted = await self._write_snapshot(
+                        entity_type, file_path, serialized_data
+                    )
+            if superseding is not None:
+                persisted = await asyncio.shield(superseding)
+            return persisted
+        finally:
+            if not result.done():
+                result.set_result(persisted)
+
+    async def _write_snapshot(
+        self, entity_type: str, file_path: Path, serialized_data: bytes
+    ) -> bool:
+        """在持有文件锁时将序列化快照原子地写入文件，成功时返回 True (Atomically writes a serialized snapshot while the file lock is held; returns True on success)."""
+        try:
+            self._ensure_parent_dir(file_path)
+            await asyncio.to_thread(
+                _atomic_write_bytes,
+                file_path,
+                serialized_data,
+                entity_type in self.durable_entity_types,
+            )
+        except Exception as e:
+            # 目录可能在运行期间被删除，下次写入时重新创建 (The directory may have been removed; recreate it on the next write)
+            self._dirs_created.discard(file_path.parent)
+            _json_repo_logger.error(
+                f"持久化实体类型 '{entity_type}' 的数据到 '{file_path}' 失败: {e}",
+                exc_info=True,
+            )
+            return False
+        if _json_repo_logger.isEnabledFor(logging.DEBUG):
+            _json_repo_logger.debug(
+                f"成功持久化实体类型 '{entity_type}' 的数据到 '{file_path}'。"
+            )
+        return True
+
+    async def _record_change(
+        self, entity_type: str, entity: Dict[str, Any], change: str
+    ) -> None:
+        """
+        在内存修改完成后记录一次实体变更 (`change` 为 "create"、"update" 或 "delete")。
+        默认实现标记整个实体类型待重写；子类可改为增量写入。
+        (Records one entity change after the in-memory mutation (`change` is "create",
+         "update" or "delete"). The default marks the whole entity type for rewriting;
+         subclasses may write incrementally instead.)
+        """
+        await self._mark_dirty(entity_type)
+
+    async def _record_created_batch(
+        self, entity_type: str, entities: List[Dict[str, Any]]
+    ) -> None:
+        """
+        记录 `create_many` 新建的一批实体。默认实现与单个变更相同，标记整个实体类型待重写一次。
+        (Records a batch of entities created by `create_many`. The default, like a single
+         change, marks the whole entity type for one rewrite.)
+        """
+        await self._mark_dirty(entity_type)
+
+    async def _mark_dirty(self, entity_type: str) -> None:
+        """
+        标记实体类型的数据已修改。未启用写入合并时立即持久化；否则只把实体类型加入脏集合并唤醒
+        后台写入任务，不在调用方中等待文件I/O。
+        (Marks an entity type's data as modified. Persists immediately when write coalescing
+         is disabled; otherwise only adds the entity type to the dirty set and wakes the
+         background writer, without waiting for file I/O in the caller.)
+        """
+        if self.flush_interval <= 0:
+            await self._persist_data_to_file(entity_type)
+            return
+
+        self._start_writer()
+        self._dirty_types.add(entity_type)
+        self._dirty_event.set()
+
+    def _start_writer(self) -> None:
+        """在当前事件循环中启动后台写入任务 (如尚未运行) (Starts the background writer in the running loop unless it is running)."""
+        if self._writer_task is not None and not self._writer_task.done():
+            return
+        self._dirty_event = asyncio.Event()
+        self._writer_idle = asyncio.Event()
+        if self._dirty_types:
+            self._dirty_event.set()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def _writer_loop(self) -> None:
+        """
+        后台写入任务: 被唤醒后等待 `flush_interval` 秒以合并后续修改，再逐个写出脏集合中的实体类型。
+        写入期间发生的修改会重新加入脏集合，由下一轮写出。
+        (Background writer: once woken it waits `flush_interval` seconds to coalesce further
+         changes, then writes out the dirty entity types one by one. Changes made during a
+         write re-enter the dirty set and are written in the next round.)
+        """
+        try:
+            while True:
+                self._writer_idle.set()
+                await self._dirty_event.wait()
+                await asyncio.sleep(self.flush_interval)
+                self._writer_idle.clear()
+                self._dirty_event.clear()
+                await self._flush_dirty_types()
+        finally:
+            self._writer_idle.set()
+
+    async def _stop_writer(self) -> None:
+        """
+        停止后台写入任务。任务正在写文件时等待这一轮写完再取消，不会中断进行中的写入；
+        剩余的脏实体类型由调用方写出。
+        (Stops the background writer. If it is writing, the current round is allowed to finish
+         before cancelling, so no write is interrupted; the caller writes the remaining dirty types.)
+        """
+        writer_task, self._writer_task = self._writer_task, None
+        if writer_task is None:
+            return
+        while not writer_task.done() and not self._writer_idle.is_set():
+            await self._writer_idle.wait()
+        writer_task.cancel()
+        try:
+            await writer_task
+        except asyncio.CancelledError:
+            pass
 
     async def connect(self) -> None:
-        """建立与数据存储的连接。对于JSON文件存储，此操作为空操作。"""
-        _json_repo_logger.info("JsonStorageRepository: 'connect' 被调用 (空操作)。")
-        pass
+        """建立与数据存储的连接。对于JSON文件存储，仅在启用写入合并时启动后台写入任务。"""
+        _json_repo_logger.info("JsonStorageRepository: 'connect' 被调用。")
+        if self.flush_interval > 0:
+            self._start_writer()
 
     async def disconnect(self) -> None:
-        """关闭与数据存储的连接。对于JSON文件存储，此操作为空操作。"""
-        _json_repo_logger.info("JsonStorageRepository: 'disconnect' 被调用 (空操作)。")
-        pass
+        """关闭与数据存储的连接。对于JSON文件存储，写出尚未落盘的修改并停止后台写入任务。"""
+        _json_repo_logger.info("JsonStorageRepository: 'disconnect' 被调用。")
+        await self._stop_writer()
+        # 写入任务未曾启动时 (例如在其他事件循环中标记的修改) 也不遗漏脏数据
+        # (Do not lose dirty data even if the writer never ran, e.g. changes marked in another loop)
+        await self._flush_dirty_types()
+
+    async def _flush_dirty_types(self) -> None:
+        """
+        写出脏集合中的所有实体类型，直到集合为空。不同实体类型使用各自的锁，因此并发写入。
+        (Writes every entity type in the dirty set until it is empty. Entity types have
+         separate locks, so they are written concurrently.)
+        """
+        while self._dirty_types:
+            dirty_types = list(self._dirty_types)
+            self._dirty_types.clear()
+            await asyncio.gather(
+                *(
+                    self._persist_data_to_file(entity_type)
+                    for entity_type in dirty_types
+                )
+            )
 
     async def get_by_id(
-        self, entity_type: str, entity_id: str
+        self, entity_type: str, entity_id: str, clone: bool = True
     ) -> Optional[Dict[str, Any]]:
         """
         根据ID从内存中检索单个实体，优先使用ID索引。
-        (Retrieves a single entity from memory by ID, prioritizing ID indexes.)
+        `clone=False` 时直接返回内存中的对象，调用方不得修改它。
+        (Retrieves a single entity from memory by ID, prioritizing ID indexes.
+         With `clone=False` the in-memory object itself is returned; callers must not mutate it.)
         """
-        if entity_type not in self.id_indexes:
-            _json_repo_logger.warning(
-                f"尝试通过ID获取实体，但实体类型 '{entity_type}' 的索引不存在。可能需要先加载数据或该类型无数据。"
+        await self._ensure_loaded(entity_type)
+        entity_id_str = _id_str(entity_id)
+        indexed_item = self._find_item_ref(entity_type, entity_id_str)
+        if indexed_item is not None:
+            return _fast_clone(indexed_item) if clone else indexed_item
+
+        # 未命中在缓存检查/404 判断中很常见，关闭 DEBUG 时不格式化日志消息
+        # (Misses are common in cache checks and 404 handling; skip formatting the message when DEBUG is off)
+        if _json_repo_logger.isEnabledFor(logging.DEBUG):
+            _json_repo_logger.debug(
+                f"实体 '{entity_type}/{entity_id_str}' 在ID索引中未找到。考虑它是否使用非标准ID字段或确实不存在。"
             )
-            if entity_type in self.in_memory_data:
-                _json_repo_logger.debug(
-                    f"实体类型 '{entity_type}' 索引缺失，尝试线性扫描..."
-                )
-                for item in self.in_memory_data[entity_type]:
-                    for id_field_name in COMMON_ID_FIELDS:
-                        if id_field_name in item and str(item[id_field_name]) == str(
-                            entity_id
-                        ):
-                            return copy.deepcopy(item)
-            return None
-
-        entity_id_str = str(entity_id)
-
-        for id_field_name, id_map in self.id_indexes[entity_type].items():
-            if id_field_name in COMMON_ID_FIELDS:
-                indexed_item = id_map.get(entity_id_str)
-                if indexed_item is not None:
-                    _json_repo_logger.debug(
-                        f"实体 '{entity_type}/{entity_id_str}' 通过索引字段 '{id_field_name}' 找到。"
-                    )
-                    return copy.deepcopy(indexed_item)
-
-        _json_repo_logger.debug(
-            f"实体 '{entity_type}/{entity_id_str}' 在ID索引中未找到。考虑它是否使用非标准ID字段或确实不存在。"
-        )
         return None
 
     async def get_all(
-        self, entity_type: str, skip: int = 0, limit: int = 100
+        self, entity_type: str, skip: int = 0, limit: int = 100, clone: bool = True
     ) -> List[Dict[str, Any]]:
         """
         检索指定类型的所有实体（内存中的副本），支持分页。
-        性能提示：此操作直接对内存列表进行切片，对于非常大的列表，深拷贝成本可能较高。
+        性能提示：此操作直接对内存列表进行切片，并对切片做快速深拷贝 (`_fast_clone`)；
+        只读取结果 (例如直接序列化为响应) 的调用方可传入 `clone=False` 跳过拷贝，此时不得修改返回的实体。
         (Retrieves all entities of a specified type (in-memory copies), supports pagination.
-         Performance note: This operation slices the in-memory list directly; deepcopy cost might be high for very large lists.)
+         Performance note: This operation slices the in-memory list directly and clones the slice with `_fast_clone`;
+         callers that only read the result (e.g. serialize it into a response) may pass `clone=False`
+         to skip the copy, in which case the returned entities must not be mutated.)
         """
+        await self._ensure_loaded(entity_type)
         if entity_type not in self.in_memory_data:
             _json_repo_logger.warning(
                 f"尝试获取所有实体，但实体类型 '{entity_type}' 不在内存数据中。"
             )
             return []
 
-        all_items = self.in_memory_data[entity_type]
-        return copy.deepcopy(all_items[skip : skip + limit])
+        page = self.in_memory_data[entity_type][skip : skip + limit]
+        return _fast_clone(page) if clone else page
 
     async def create(
         self, entity_type: str, entity_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """在内存中创建新实体，更新ID索引，并异步持久化到文件。"""
-        if entity_type not in self.in_memory_data:
-            self.in_memory_data[entity_type] = []
-            self.id_indexes[entity_type] = {}
-            if entity_type not in self.file_paths:
-                self.file_paths[entity_type] = (
-                    self.base_data_dir / f"{entity_type}_db.json"
-                )
-                self.file_locks[entity_type] = asyncio.Lock()
-                _json_repo_logger.info(
-                    f"实体类型 '{entity_type}' 为新类型，已使用默认路径 '{self.file_paths[entity_type]}' 进行初始化。"
-                )
-
-        new_entity_id_val_str: Optional[str] = None
+        await self._ensure_loaded(entity_type)
+        self._ensure_entity_type(entity_type)
+        self._check_duplicate_id(entity_type, entity_data)
+        new_entity = self._insert_entity(entity_type, entity_data)
+
+        await self._record_change(entity_type, new_entity, "create")
+        # 返回副本: 内存中的实体只能经由本存储库修改，序列化缓存依赖这一点
+        # (Return a copy: stored entities are only mutated through this repository, which the
+        #  serialization cache relies on)
+        return _fast_clone(new_entity)
+
+    async def create_many(
+        self, entity_type: str, entities_data: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        批量创建实体: 先校验整批数据 (与已有实体及批内彼此的ID都不能重复)，任一重复则整批不写入；
+        全部装入内存后只记录一次变更 (一次文件写入或一次JSONL追加)，而不是每个实体一次。
+        (Creates entities in bulk. The whole batch is validated first (IDs must not clash with
+         existing entities or with each other) and nothing is stored if any is a duplicate.
+         After all entities are in memory the change is recorded once (one file write or one
+         JSONL append) instead of once per entity.)
+        """
+        await self._ensure_loaded(entity_type)
+        self._ensure_entity_type(entity_type)
+        batch_ids: Set[Any] = set()
+        for entity_data in entities_data:
+            self._check_duplicate_id(entity_type, entity_data, batch_ids)
+
+        new_entities = [
+            self._insert_entity(entity_type, entity_data)
+            for entity_data in entities_data
+        ]
+        if new_entities:
+            await self._record_created_batch(entity_type, new_entities)
+        return _fast_clone(new_entities)
+
+    def _ensure_entity_type(self, entity_type: str) -> None:
+        """为首次出现的实体类型初始化内存结构，必要时使用默认文件路径 (Initializes in-memory structures for a new entity type, with a default file path if needed)."""
+        if entity_type in self.in_memory_data:
+            return
+        self.in_memory_data[entity_type] = []
+        self.id_indexes[entity_type] = {}
+        self._item_positions[entity_type] = {}
+        if entity_type not in self.file_paths:
+            self.file_paths[entity_type] = self.base_data_dir / f"{entity_type}_db.json"
+            self.file_locks[entity_type] = asyncio.Lock()
+            _json_repo_logger.info(
+                f"实体类型 '{entity_type}' 为新类型，已使用默认路径 '{self.file_paths[entity_type]}' 进行初始化。"
+            )
 
+    def _check_duplicate_id(
+        self,
+        entity_type: str,
+        entity_data: Dict[str, Any],
+        batch_ids: Optional[Set[Any]] = None,
+    ) -> None:
+        """
+        检查实体的ID (按 `COMMON_ID_FIELDS` 顺序第一个存在的ID字段) 是否已存在，重复时抛出 ValueError。
+        给定 `batch_ids` 时还检查同一批次内的重复，并把该ID加入其中。
+        (Raises ValueError if the entity's ID, i.e. the first ID field present in
+         `COMMON_ID_FIELDS` order, already exists. With `batch_ids` duplicates within the same
+         batch are checked too and the ID is added to it.)
+        """
         for id_field_name in COMMON_ID_FIELDS:
             if id_field_name in entity_data:
-                new_entity_id_val_str = str(entity_data[id_field_name])
-                if (
-                    self.id_indexes[entity_type]
-                    .get(id_field_name, {})
-                    .get(new_entity_id_val_str)
+                new_entity_id_val_str = _id_str(entity_data[id_field_name])
+                id_map = self.id_indexes[entity_type].get(id_field_name)
+                batch_key = (id_field_name, new_entity_id_val_str)
+                if (id_map is not None and new_entity_id_val_str in id_map) or (
+                    batch_ids is not None and batch_key in batch_ids
                 ):
                     _json_repo_logger.error(
                         f"尝试使用已存在的ID创建重复实体: 类型='{entity_type}', 字段='{id_field_name}', ID='{new_entity_id_val_str}'"
@@ -301,21 +1085,30 @@ class JsonStorageRepository(IDataStorageRepository):
                     raise ValueError(
                         f"实体类型 '{entity_type}' 中，字段 '{id_field_name}' 的 ID 为 '{new_entity_id_val_str}' 的实体已存在。"
                     )
+                if batch_ids is not None:
+                    batch_ids.add(batch_key)
                 break
 
-        new_entity = copy.deepcopy(entity_data)
+    def _insert_entity(
+        self, entity_type: str, entity_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """将实体的副本追加到内存列表并登记到各索引，返回内存中的对象 (Appends a copy of the entity to the in-memory list, registers it in the indexes and returns the stored object)."""
+        type_indexes = self.id_indexes[entity_type]
+        new_entity = _fast_clone(entity_data)
         self.in_memory_data[entity_type].append(new_entity)
+        self._secondary_index_add(entity_type, new_entity)
+        if entity_type not in self._primary_id_field:
+            self._detect_primary_id_field(entity_type, new_entity)
+        self._item_positions.setdefault(entity_type, {})[id(new_entity)] = (
+            len(self.in_memory_data[entity_type]) - 1
+        )
 
         for id_field_name in COMMON_ID_FIELDS:
             if id_field_name in new_entity:
-                entity_id_value = str(new_entity[id_field_name])
-                if id_field_name not in self.id_indexes[entity_type]:
-                    self.id_indexes[entity_type][id_field_name] = {}
-                self.id_indexes[entity_type][id_field_name][entity_id_value] = (
-                    new_entity
-                )
-
-        await self._persist_data_to_file(entity_type)
+                id_map = type_indexes.get(id_field_name)
+                if id_map is None:
+                    id_map = type_indexes[id_field_name] = {}
+                id_map[_id_str(new_entity[id_field_name])] = new_entity
         return new_entity
 
     async def update(
@@ -328,53 +1121,35 @@ class JsonStorageRepository(IDataStorageRepository):
          Assumes ID fields themselves are not modified. If ID fields are mutable,
          more complex index update logic (remove old index, add new index) would be required.)
         """
-        entity_to_update = await self.get_by_id(entity_type, entity_id)  # type: ignore
-
-        if entity_to_update:
-            actual_item_reference = None
+        await self._ensure_loaded(entity_type)
+        entity_id_str = _id_str(entity_id)
+        actual_item_reference = self._find_item_ref(entity_type, entity_id_str)
 
-            entity_id_str = str(entity_id)
-            found_via_index = False
-            for id_field_name, id_map in self.id_indexes.get(entity_type, {}).items():
-                if id_field_name in COMMON_ID_FIELDS:
-                    indexed_item_ref = id_map.get(entity_id_str)
-                    if indexed_item_ref is not None:
-                        actual_item_reference = indexed_item_ref
-                        found_via_index = True
-                        break
-
-            if not found_via_index:
-                _json_repo_logger.warning(
-                    f"更新 '{entity_type}/{entity_id_str}': 索引未命中，尝试线性扫描获取引用（罕见）。"
-                )
-                for _i, item_in_list in enumerate(  # B007: Renamed i to _i
-                    self.in_memory_data.get(entity_type, [])
-                ):
-                    for id_field in COMMON_ID_FIELDS:
-                        if (
-                            id_field in item_in_list
-                            and str(item_in_list[id_field]) == entity_id_str
-                        ):
-                            actual_item_reference = item_in_list
-                            break
-                    if actual_item_reference:
-                        break
-
-            if actual_item_reference:
-                for id_field_name in COMMON_ID_FIELDS:
-                    if id_field_name in update_data and str(
-                        update_data[id_field_name]
-                    ) != str(actual_item_reference.get(id_field_name)):
-                        _json_repo_logger.error(
-                            f"禁止通过 update 方法修改ID字段 '{id_field_name}' (ID field '{id_field_name}' modification via update method is prohibited)."
-                        )
-                        raise ValueError(
-                            f"不允许通过此 update 方法修改ID字段 '{id_field_name}'。"
-                        )
+        if actual_item_reference is not None:
+            for id_field_name in COMMON_ID_FIELDS:
+                if id_field_name in update_data and _id_str(
+                    update_data[id_field_name]
+                ) != _id_str(actual_item_reference.get(id_field_name)):
+                    _json_repo_logger.error(
+                        f"禁止通过 update 方法修改ID字段 '{id_field_name}' (ID field '{id_field_name}' modification via update method is prohibited)."
+                    )
+                    raise ValueError(
+                        f"不允许通过此 update 方法修改ID字段 '{id_field_name}'。"
+                    )
 
-                actual_item_reference.update(update_data)
-                await self._persist_data_to_file(entity_type)
-                return copy.deepcopy(actual_item_reference)
+            self._secondary_index_remove(
+                entity_type, actual_item_reference, update_data.keys()
+            )
+            actual_item_reference.update(update_data)
+            self._serialized_cache.get(entity_type, {}).pop(
+                id(actual_item_reference), None
+            )
+            self._snapshot_cache.pop(entity_type, None)
+            self._secondary_index_add(
+                entity_type, actual_item_reference, update_data.keys()
+            )
+            await self._record_change(entity_type, actual_item_reference, "update")
+            return _fast_clone(actual_item_reference)
 
         _json_repo_logger.warning(
             f"尝试更新实体，但在实体类型 '{entity_type}' 中未找到ID为 '{entity_id}' 的实体。"
@@ -383,65 +1158,46 @@ class JsonStorageRepository(IDataStorageRepository):
 
     async def delete(self, entity_type: str, entity_id: str) -> bool:
         """根据ID从内存中删除实体，从ID索引中移除，并异步持久化更改。"""
+        await self._ensure_loaded(entity_type)
         if entity_type not in self.in_memory_data:
             _json_repo_logger.warning(
                 f"尝试删除实体，但实体类型 '{entity_type}' 不存在于内存中。"
             )
             return False
 
-        entity_id_str = str(entity_id)
-        item_to_delete = None
-        item_index_in_list = -1
+        entity_id_str = _id_str(entity_id)
+        item_to_delete = self._find_item_ref(entity_type, entity_id_str)
+        item_index_in_list = (
+            self._find_position(entity_type, item_to_delete)
+            if item_to_delete is not None
+            else -1
+        )
 
-        for id_field_name, id_map in self.id_indexes.get(entity_type, {}).items():
-            if id_field_name in COMMON_ID_FIELDS:
-                item_to_delete = id_map.get(entity_id_str)
-                if item_to_delete is not None:
-                    break
+        if item_index_in_list != -1:
+            items = self.in_memory_data[entity_type]
+            positions = self._item_positions.setdefault(entity_type, {})
+            positions.pop(id(item_to_delete), None)
+            # 交换删除: 用最后一行填补被删除的位置，列表操作为 O(1)；列表顺序不作保证
+            # (Swap-remove: move the last row into the freed slot so the list work is O(1);
+            #  list order is not guaranteed)
+            last_item = items.pop()
+            if item_index_in_list < len(items):
+                items[item_index_in_list] = last_item
+                positions[id(last_item)] = item_index_in_list
+            self._secondary_index_remove(entity_type, item_to_delete)
+            self._snapshot_cache.pop(entity_type, None)
 
-        item_deleted_from_list = False
-        if item_to_delete:
-            try:
-                self.in_memory_data[entity_type].remove(item_to_delete)
-                item_deleted_from_list = True
-            except ValueError:
-                _json_repo_logger.error(
-                    f"删除 '{entity_type}/{entity_id_str}': 索引找到但对象不在主数据列表中。索引可能已损坏。"
-                )
-                item_deleted_from_list = False
-
-        if not item_to_delete or not item_deleted_from_list:
-            _json_repo_logger.debug(
-                f"删除 '{entity_type}/{entity_id_str}': 索引未命中或列表移除失败，尝试线性扫描。"
-            )
-            for i, item_in_list in enumerate(self.in_memory_data.get(entity_type, [])):
-                for id_field in COMMON_ID_FIELDS:
-                    if (
-                        id_field in item_in_list
-                        and str(item_in_list[id_field]) == entity_id_str
-                    ):
-                        item_to_delete = item_in_list
-                        item_index_in_list = i
-                        break
-                if (
-                    item_to_delete and item_index_in_list != -1
-                ):  # Check if found in this scan pass
-                    break
-            if item_index_in_list != -1:  # If found via linear scan
-                self.in_memory_data[entity_type].pop(item_index_in_list)
-                item_deleted_from_list = True  # Now it's deleted from list
-
-        if item_to_delete and item_deleted_from_list:
             for id_field_name, id_map in self.id_indexes.get(entity_type, {}).items():
                 if id_field_name in item_to_delete:
-                    id_val_of_deleted = str(item_to_delete[id_field_name])
-                    if id_val_of_deleted in id_map:
+                    id_val_of_deleted = _id_str(item_to_delete[id_field_name])
+                    if id_map.get(id_val_of_deleted) is item_to_delete:
                         del id_map[id_val_of_deleted]
 
-            await self._persist_data_to_file(entity_type)
-            _json_repo_logger.info(
-                f"成功删除并持久化实体 '{entity_type}/{entity_id_str}'。"
-            )
+            await self._record_change(entity_type, item_to_delete, "delete")
+            if _json_repo_logger.isEnabledFor(logging.INFO):
+                _json_repo_logger.info(
+                    f"成功删除并持久化实体 '{entity_type}/{entity_id_str}'。"
+                )
             return True
 
         _json_repo_logger.warning(
@@ -455,30 +1211,61 @@ class JsonStorageRepository(IDataStorageRepository):
         conditions: Dict[str, Any],
         skip: int = 0,
         limit: int = 100,
+        clone: bool = True,
     ) -> List[Dict[str, Any]]:
         """
-        根据一组条件从内存中查询实体。
-        性能提示：此查询为线性扫描，对于大型数据集可能较慢。
+        根据一组条件从内存中查询实体。`clone` 的含义与 `get_all` 相同。
+        可哈希的条件值通过按需构建的二级索引求交集得到候选集，其余条件只在候选集上逐项比较；
+        结果保持内存列表中的顺序。
         (Queries entities from memory based on a set of conditions.
-         Performance note: This query is a linear scan and may be slow for large datasets.)
+         Conditions with hashable values are resolved by intersecting lazily built secondary
+         indexes; the remaining conditions are only checked against that candidate set.
+         Results keep the order of the in-memory list. `clone` works as in `get_all`.)
         """
+        await self._ensure_loaded(entity_type)
         if entity_type not in self.in_memory_data:
             _json_repo_logger.warning(
                 f"尝试查询实体，但实体类型 '{entity_type}' 不在内存数据中。"
             )
             return []
 
-        results: List[Dict[str, Any]] = []
-        for item in self.in_memory_data[entity_type]:
-            match = True
-            for key, value in conditions.items():
-                if item.get(key) != value:
-                    match = False
-                    break
-            if match:
-                results.append(item)
+        indexed_buckets: List[Dict[int, Any]] = []
+        scan_conditions: List[Any] = []
+        for key, value in conditions.items():
+            try:
+                bucket = self._get_secondary_index(entity_type, key).get(value)
+            except TypeError:  # 不可哈希的条件值只能逐项比较 (Unhashable values are compared item by item)
+                scan_conditions.append((key, value))
+                continue
+            if not bucket:
+                return []
+            indexed_buckets.append(bucket)
+
+        if indexed_buckets:
+            indexed_buckets.sort(key=len)
+            smallest_bucket, other_buckets = indexed_buckets[0], indexed_buckets[1:]
+            candidates = [
+                item
+                for item_key, item in smallest_bucket.items()
+                if all(item_key in bucket for bucket in other_buckets)
+            ]
+            # 按位置索引恢复列表顺序，O(k log k) (Restore list order via the position index, O(k log k))
+            item_positions = self._get_item_positions(entity_type)
+            candidates.sort(key=lambda item: item_positions.get(id(item), -1))
+        else:
+            candidates = self.in_memory_data[entity_type]
+
+        if scan_conditions:
+            predicate = _compile_match_predicate(
+                tuple(key for key, _ in scan_conditions)
+            )
+            values = tuple(value for _, value in scan_conditions)
+            results = [item for item in candidates if predicate(item, values)]
+        else:
+            results = candidates
 
-        return copy.deepcopy(results[skip : skip + limit])
+        page = results[skip : skip + limit]
+        return _fast_clone(page) if clone else page
 
     async def _ensure_file_exists(
         self,
@@ -496,11 +1283,13 @@ class JsonStorageRepository(IDataStorageRepository):
 
         async with lock:
             if not file_path.exists():
-                file_path.parent.mkdir(parents=True, exist_ok=True)
+                self._ensure_parent_dir(file_path)
                 data_to_write = initial_data if initial_data is not None else []
                 try:
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        json.dump(data_to_write, f, indent=4, ensure_ascii=False)
+                    serialized_data = self._encode_entities(data_to_write)
+                    await asyncio.to_thread(
+                        _atomic_write_bytes, file_path, serialized_data
+                    )
                     _json_repo_logger.info(
                         f"已为实体类型 '{entity_type}' 在 '{file_path}' 初始化JSON文件。"
                     )
@@ -516,6 +1305,7 @@ class JsonStorageRepository(IDataStorageRepository):
         确保给定实体类型的存储已初始化。
         对于JSON存储库，这意味着对应的JSON文件已创建。
         """
+        await self._ensure_loaded(entity_type)
         if entity_type not in self.file_paths:
             default_path = self.base_data_dir / f"{entity_type}_default_db.json"
             self.file_paths[entity_type] = default_path
@@ -532,7 +1322,8 @@ class JsonStorageRepository(IDataStorageRepository):
         if not file_path.exists():
             await self._ensure_file_exists(entity_type, file_path, initial_data or [])
             if initial_data and not self.in_memory_data[entity_type]:
-                self.in_memory_data[entity_type] = copy.deepcopy(initial_data)
+                self.in_memory_data[entity_type] = _fast_clone(initial_data)
+                self._build_id_indexes(entity_type)
         elif initial_data and not self.in_memory_data[entity_type]:
             _json_repo_logger.debug(
                 f"实体类型 '{entity_type}' 的文件已存在，内存为空但提供了初始数据。依赖启动时加载。"
@@ -541,18 +1332,199 @@ class JsonStorageRepository(IDataStorageRepository):
 
     async def get_all_entity_types(self) -> List[str]:
         """返回此存储库当前在内存中管理的所有实体类型的列表。"""
-        return list(self.in_memory_data.keys())
+        return list(dict.fromkeys([*self.in_memory_data, *self._unloaded_types]))
 
     async def persist_all_data(self) -> None:
         """将所有实体类型的内存数据异步持久化到各自的JSON文件。"""
         _json_repo_logger.info("尝试持久化所有实体类型的数据...")
-        for entity_type in list(self.in_memory_data.keys()):
-            await self._persist_data_to_file(entity_type)
+        # 下面会立即写入全部实体类型，脏集合中等待后台写入的条目已无必要
+        # (Every entity type is written right below, so entries waiting for the background writer are redundant)
+        self._dirty_types.clear()
+        await asyncio.gather(
+            *(
+                self._persist_data_to_file(entity_type)
+                for entity_type in list(self.in_memory_data.keys())
+            )
+        )
         _json_repo_logger.info("所有数据持久化完成。")
 
 
-__all__ = ["JsonStorageRepository"]
+# region JSONL 存储库 (JSONL repository)
+
+# JSONL 文件中操作记录的标记键 (Marker key of operation records in JSONL files)
+_JSONL_OP_KEY = "__op__"
+# 过时行数至少达到此值且超过存活记录数时，整体重写 (压缩) 文件
+# (Compact (fully rewrite) the file once stale lines reach this count and exceed the live records)
+_JSONL_COMPACTION_MIN_STALE_LINES = 100
+
+
+class JsonlStorageRepository(JsonStorageRepository):
+    """
+    `JsonStorageRepository` 的JSONL变体: 文件每行一个实体，`create` 只追加一行而不重写整个文件。
+    `update` 追加实体的新版本 (加载时按主ID覆盖旧行)，`delete` 追加一条删除标记；
+    过时行过多时整体重写 (压缩) 文件。仍可读取旧的JSON数组文件，并在第一次修改时转换为JSONL。
+    适合写入频繁的部署；读多写少时 `JsonStorageRepository` 的单个JSON数组文件更便于人工查看。
+    (JSONL variant of `JsonStorageRepository`: one entity per line, so `create` appends a
+     single line instead of rewriting the whole file. `update` appends the entity's new
+     version (replacing the older line by primary ID on load) and `delete` appends a delete
+     marker; the file is fully rewritten (compacted) once stale lines pile up. Legacy JSON
+     array files are still readable and are converted to JSONL on the first change. Suited to
+     write-heavy deployments; for read-mostly data the single JSON array file of
+     `JsonStorageRepository` is easier to inspect by hand.)
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        # 在父类加载数据之前初始化，加载过程会填充它们
+        # (Initialized before the parent loads data, since loading fills them in)
+        # 每个实体类型文件中的过时行数 (Stale lines in each entity type's file)
+        self._stale_line_counts: Dict[str, int] = {}
+        # 仍是旧JSON数组格式、需要先整体重写才能追加的实体类型
+        # (Entity types still in the legacy JSON array format, which must be rewritten before appending)
+        self._legacy_format_types: Set[str] = set()
+        super().__init__(*args, **kwargs)
+
+    def _decode_entities(self, entity_type: str, raw: bytes) -> Any:
+        """按顺序重放JSONL记录；兼容旧的JSON数组文件。(Replays JSONL records in order; accepts legacy JSON array files.)"""
+        self._stale_line_counts[entity_type] = 0
+        if raw.lstrip()[:1] == b"[":
+            self._legacy_format_types.add(entity_type)
+            return _loads(raw)
+
+        items: List[Optional[Dict[str, Any]]] = []
+        positions: Dict[str, int] = {}
+        line_count = 0
+        for line_number, line in enumerate(raw.splitlines(), 1):
+            if not line.strip():
+                continue
+            line_count += 1
+            try:
+                record = _loads(line)
+            except ValueError as e:
+                # 例如崩溃时写了一半的最后一行 (e.g. a half-written last line after a crash)
+                _json_repo_logger.warning(
+                    f"实体类型 '{entity_type}' 的JSONL文件第 {line_number} 行无法解析，已跳过: {e}"
+                )
+                continue
+            if not isinstance(record, dict):
+                continue
+
+            if record.get(_JSONL_OP_KEY) == "delete":
+                position = positions.pop(_id_str(record.get("id")), None)
+                if position is not None:
+                    items[position] = None
+                continue
+
+            if entity_type not in self._primary_id_field:
+                self._detect_primary_id_field(entity_type, record)
+            record_id = self._resolve_id(entity_type, record)
+            position = positions.get(record_id) if record_id is not None else None
+            if position is None:
+                if record_id is not None:
+                    positions[record_id] = len(items)
+                items.append(record)
+            else:
+                items[position] = record
+
+        live_items = [item for item in items if item is not None]
+        self._stale_line_counts[entity_type] = line_count - len(live_items)
+        return live_items
+
+    def _encode_entities(
+        self, items: List[Dict[str, Any]], entity_type: Optional[str] = None
+    ) -> bytes:
+        return b"".join(_dumps_line(item) for item in items)
+
+    async def _write_snapshot(
+        self, entity_type: str, file_path: Path, serialized_data: bytes
+    ) -> bool:
+        """
+        整体重写成功后才清零过时行计数并标记为JSONL格式；被更新快照取代而跳过的写入不会经过这里。
+        (Resets the stale line count and marks the file as JSONL only after a successful full
+         rewrite; writes skipped in favour of a newer snapshot never get here.)
+        """
+        written = await super()._write_snapshot(entity_type, file_path, serialized_data)
+        if written:
+            self._stale_line_counts[entity_type] = 0
+            self._legacy_format_types.discard(entity_type)
+        return written
+
+    async def _record_change(
+        self, entity_type: str, entity: Dict[str, Any], change: str
+    ) -> None:
+        """将变更追加为一行；必要时转换旧格式或压缩文件。(Appends the change as one line, converting legacy files or compacting when needed.)"""
+        if entity_type in self._legacy_format_types:
+            await self._persist_data_to_file(entity_type)
+            return
+
+        if change == "delete":
+            record: Dict[str, Any] = {
+                _JSONL_OP_KEY: "delete",
+                "id": self._resolve_id(entity_type, entity),
+            }
+            new_stale_lines = 2  # 删除标记和被删除实体的旧行 (The marker and the deleted entity's line)
+        else:
+            record = entity
+            new_stale_lines = 1 if change == "update" else 0
+
+        if not await self._append_lines(entity_type, [record]):
+            return
+
+        stale_lines = self._stale_line_counts.get(entity_type, 0) + new_stale_lines
+        self._stale_line_counts[entity_type] = stale_lines
+        if stale_lines >= _JSONL_COMPACTION_MIN_STALE_LINES and stale_lines > len(
+            self.in_memory_data.get(entity_type, [])
+        ):
+            _json_repo_logger.info(
+                f"实体类型 '{entity_type}' 的JSONL文件有 {stale_lines} 条过时记录，开始压缩。"
+            )
+            await self._persist_data_to_file(entity_type)
+
+    async def _record_created_batch(
+        self, entity_type: str, entities: List[Dict[str, Any]]
+    ) -> None:
+        """将整批新建实体作为多行一次追加 (Appends a whole batch of created entities as lines in one write)."""
+        if entity_type in self._legacy_format_types:
+            await self._persist_data_to_file(entity_type)
+            return
+        await self._append_lines(entity_type, entities)
+
+    async def _append_lines(
+        self, entity_type: str, records: List[Dict[str, Any]]
+    ) -> bool:
+        """将记录序列化为JSONL行并一次追加到实体类型的文件，成功时返回 True (Appends records as JSONL lines in one write; returns True on success)."""
+        file_path = self.file_paths.get(entity_type)
+        lock = self.file_locks.get(entity_type)
+        if file_path is None or lock is None:
+            _json_repo_logger.warning(
+                f"实体类型 '{entity_type}' 的文件路径或锁未找到，无法追加变更。"
+            )
+            return False
+
+        try:
+            lines = b"".join(_dumps_line(record) for record in records)
+            async with lock:
+                self._ensure_parent_dir(file_path)
+                await asyncio.to_thread(
+                    _append_bytes,
+                    file_path,
+                    lines,
+                    entity_type in self.durable_entity_types,
+                )
+        except Exception as e:
+            self._dirs_created.discard(file_path.parent)
+            _json_repo_logger.error(
+                f"向 '{file_path}' 追加实体类型 '{entity_type}' 的变更失败: {e}",
+                exc_info=True,
+            )
+            return False
+        return True
+
+
+# endregion
+
+
+__all__ = ["JsonStorageRepository", "JsonlStorageRepository"]
 
 if __name__ == "__main__":
     # 此模块不应作为主脚本执行
-    print(f"此模块 ({__name__}) 定义了JSON存储库，不应直接执行。")
+    print(f"此模块 ({__name__}) 定义了JSON/JSONL存储库，不应直接执行。")
@@ -11,11 +11,15 @@ for asynchronous database operations.)
 """
 
 import asyncio
+import contextvars
+import functools
 import json  # 用于序列化/反序列化JSON字段 (For serializing/deserializing JSON fields)
 import logging
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
 import aiomysql  # type: ignore # aiomysql 可能没有完整的类型存根 (aiomysql might not have complete type stubs)
+from pymysql.constants import CLIENT, ER
 from pymysql.err import (
     IntegrityError,
     OperationalError,
@@ -25,8 +29,34 @@ from app.core.interfaces import (
     IDataStorageRepository,
 )  # 导入抽象基类 (Import abstract base class)
 
+try:  # orjson 为可选依赖，可显著加快JSON字段的序列化 (orjson is optional and speeds up JSON field serialization)
+    import orjson
+except ImportError:  # pragma: no cover - 取决于运行环境 (depends on the environment)
+    orjson = None
+
 _mysql_repo_logger = logging.getLogger(__name__)  # 获取本模块的日志记录器实例
 
+
+def _json_dumps(value: Any) -> str:
+    """
+    将值序列化为JSON字符串；安装了 orjson 时使用 orjson。
+    返回 str 而非 bytes：aiomysql 会把 bytes 作为二进制字符串发送，MySQL 的 JSON 列会拒绝它。
+    (Serializes a value to a JSON string, using orjson when installed. Returns str rather than
+     bytes: aiomysql sends bytes as a binary string, which MySQL JSON columns reject.)
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value)
+
+
+def _json_loads(raw: str) -> Any:
+    """解析JSON字符串；orjson.JSONDecodeError 是 json.JSONDecodeError 的子类。
+    (Parses a JSON string; orjson.JSONDecodeError subclasses json.JSONDecodeError.)"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
 # 表名常量 (Table name constants)
 USER_TABLE = "users"  # 用户表 (Users table)
 PAPER_TABLE = "papers"  # 试卷表 (Papers table)
@@ -39,6 +69,112 @@ QB_CONTENT_TABLE = "question_bank_contents"  # 题库内容表 (Question bank co
 # (Note: QB_CONTENT_ENTITY_TYPE_PREFIX is used for dynamically identifying question bank content entity types.
 #  Its actual value should be consistent with the definition in qb_crud.py or passed via configuration.)
 QB_CONTENT_ENTITY_TYPE_PREFIX = "qb_content_"
+# 实体类型 -> (表名, 主键列)；题库内容的各动态类型在 `_get_table_info` 中按前缀映射到 "question_bank_contents"
+# (Entity type -> (table name, primary key column); dynamic question bank content types are mapped
+#  to "question_bank_contents" by prefix in `_get_table_info`)
+TABLE_INFO: Dict[str, tuple[str, str]] = {
+    "user": (USER_TABLE, "uid"),
+    "paper": (PAPER_TABLE, "paper_id"),
+    "question_bank_metadata": (QB_METADATA_TABLE, "id"),
+    # 题库内容使用 difficulty_id 作为主要标识符，content_id 作为次要标识符
+    # (Question bank content uses difficulty_id as the primary identifier, content_id as secondary)
+    "question_bank_contents": (QB_CONTENT_TABLE, "difficulty_id"),
+}
+# 各表可被读取投影 (`fields` 参数) 选择的列，需与 init_storage_if_needed 中的表结构保持一致
+# (Columns of each table that read projections (the `fields` argument) may select; keep in sync
+#  with the table definitions in init_storage_if_needed)
+TABLE_COLUMNS: Dict[str, frozenset[str]] = {
+    USER_TABLE: frozenset(
+        {"uid", "nickname", "email", "qq", "tags", "hashed_password"}
+    ),
+    PAPER_TABLE: frozenset(
+        {
+            "paper_id",
+            "user_uid",
+            "creation_time_utc",
+            "creation_ip",
+            "difficulty",
+            "paper_questions",
+            "score",
+            "submitted_answers_card",
+            "submission_time_utc",
+            "submission_ip",
+            "pass_status",
+            "passcode",
+            "last_update_time_utc",
+            "last_update_ip",
+            "subjective_questions_count",
+            "graded_subjective_questions_count",
+            "pending_manual_grading_count",
+            "total_score",
+        }
+    ),
+    QB_METADATA_TABLE: frozenset(
+        {"id", "name", "description", "default_questions", "total_questions"}
+    ),
+    QB_CONTENT_TABLE: frozenset({"difficulty_id", "content_id", "questions"}),
+}
+# 以JSON字符串存储的字段，按归一化后的实体类型索引 (题库内容的各动态类型共用 "question_bank_contents")
+# (Fields stored as JSON strings, keyed by normalized entity type; all dynamic question bank
+#  content types share "question_bank_contents")
+JSON_FIELDS: Dict[str, tuple[str, ...]] = {
+    "user": ("tags",),
+    "paper": ("paper_questions", "submitted_answers_card"),
+    "question_bank_contents": ("questions",),
+}
+# query/get_all 结果达到此行数且含JSON字段时，在工作线程中反序列化，避免长时间占用事件循环
+# (Once a query/get_all result reaches this many rows and has JSON fields, it is deserialized
+#  in a worker thread so the event loop is not blocked for long)
+MYSQL_THREAD_DECODE_MIN_ROWS = 64
+# 常用查询字段对应的 STORED 生成列，TEXT 列本身无法被完整索引，query() 会改写为比较生成列
+# 结构: 实体类型 -> {源字段: (生成列名, 列类型)}
+# (STORED generated columns for commonly filtered fields. TEXT columns cannot be fully indexed,
+#  so query() rewrites equality on these fields to the generated column.
+#  Layout: entity type -> {source field: (generated column name, column type)})
+GENERATED_QUERY_COLUMNS: Dict[str, Dict[str, tuple[str, str]]] = {
+    "paper": {
+        "user_uid": ("user_uid_idx", "VARCHAR(255)"),
+        "pass_status": ("pass_status_idx", "VARCHAR(64)"),
+    },
+}
+# 各实体表的二级索引，复合索引的首列为区分度最高的列。结构: 实体类型 -> {索引名: 列名元组}
+# 题库内容表无需额外索引：复合主键 (difficulty_id, content_id) 的最左前缀已覆盖仅按 difficulty_id 的查找。
+# (Secondary indexes per entity table; composite indexes lead with the highest-cardinality column.
+#  Layout: entity type -> {index name: column tuple}. The question bank contents table needs none:
+#  the leftmost prefix of its (difficulty_id, content_id) primary key already serves difficulty_id-only lookups.)
+SECONDARY_INDEXES: Dict[str, Dict[str, tuple[str, ...]]] = {
+    "paper": {
+        "idx_user_time": ("user_uid_idx", "submission_time_utc"),
+        "idx_pass_status": ("pass_status_idx",),
+    },
+}
+
+
+@functools.lru_cache(maxsize=128)
+def _json_fields_for(entity_type: str) -> tuple[str, ...]:
+    """返回实体类型中以JSON字符串存储的字段。(Returns the fields of an entity type that are stored as JSON strings.)"""
+    if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
+        return JSON_FIELDS["question_bank_contents"]
+    return JSON_FIELDS.get(entity_type, ())
+
+
+class _PinnedConnection:
+    """
+    一个任务内固定使用的连接槽位：连接在首次数据库操作时才从连接池借出，退出上下文时归还。
+    (Connection slot pinned within one task: the connection is borrowed from the pool on the first
+     database operation and returned when the context exits.)
+    """
+
+    __slots__ = ("owner", "conn", "depth", "busy")
+
+    def __init__(self, owner: Optional["asyncio.Task[Any]"]):
+        self.owner = owner  # 进入上下文的任务 (Task that entered the context)
+        self.conn: Optional[Any] = None
+        self.depth = 1  # 嵌套进入的层数 (Nesting depth)
+        # 固定连接上正有语句、事务或未读完的结果集在进行，此时其他调用改用连接池的连接
+        # (A statement, transaction or unread result set is in flight on the pinned connection;
+        #  other calls use a pooled connection meanwhile)
+        self.busy = False
 
 
 class MySQLStorageRepository(IDataStorageRepository):
@@ -57,6 +193,10 @@ class MySQLStorageRepository(IDataStorageRepository):
         password: str,
         db: str,
         loop: Optional[asyncio.AbstractEventLoop] = None,
+        pool_minsize: int = 1,
+        pool_maxsize: int = 10,
+        pool_recycle: int = 3600,
+        connect_timeout: int = 10,
     ):
         """
         初始化 MySQLStorageRepository。
@@ -70,6 +210,12 @@ class MySQLStorageRepository(IDataStorageRepository):
             db (str): 要连接的数据库名称。(Name of the database to connect to.)
             loop (Optional[asyncio.AbstractEventLoop]): (可选) asyncio 事件循环。如果未提供，则使用默认循环。
                                                        ((Optional) asyncio event loop. Uses default loop if not provided.)
+            pool_minsize (int): 连接池保持的最少连接数。(Minimum number of connections kept in the pool.)
+            pool_maxsize (int): 连接池的最大连接数；所有 worker 的总和应低于服务器的 max_connections。
+                                (Maximum connections in the pool; the total across all workers should stay below the server's max_connections.)
+            pool_recycle (int): 连接使用超过此秒数后被回收重建，应小于服务器的 wait_timeout，-1 表示不回收。
+                                (Connections older than this many seconds are recycled; keep it below the server's wait_timeout, -1 disables recycling.)
+            connect_timeout (int): 建立单个连接的超时秒数。(Timeout in seconds for establishing a single connection.)
         """
         self.host = host
         self.port = port
@@ -77,9 +223,22 @@ class MySQLStorageRepository(IDataStorageRepository):
         self.password = password
         self.db = db
         self.loop = loop or asyncio.get_event_loop()  # 获取当前或指定的事件循环
+        self.pool_minsize = pool_minsize
+        self.pool_maxsize = pool_maxsize
+        self.pool_recycle = pool_recycle
+        self.connect_timeout = connect_timeout
         self.pool: Optional[aiomysql.Pool] = (
             None  # aiomysql 连接池实例 (aiomysql connection pool instance)
         )
+        # 当前任务通过 `async with repo:` 固定的连接 (Connection pinned by the current task via `async with repo:`)
+        self._pinned: contextvars.ContextVar[Optional[_PinnedConnection]] = (
+            contextvars.ContextVar(f"mysql_pinned_connection_{id(self)}", default=None)
+        )
+        # 本实例已检查/创建过的表 (按归一化实体类型)，重复调用 init_storage_if_needed 时跳过
+        # (Tables already checked/created by this instance, by normalized entity type; repeated init_storage_if_needed calls skip them)
+        self._initialized_storage: set[str] = set()
+        # 已生成的 SQL 语句缓存，键为 (操作, 实体类型, 列结构) (Cache of built SQL strings, keyed by (operation, entity type, column shape))
+        self._sql_cache: Dict[tuple, str] = {}
         _mysql_repo_logger.info(
             "MySQLStorageRepository 已初始化。 (MySQLStorageRepository initialized.)"
         )
@@ -99,7 +258,16 @@ class MySQLStorageRepository(IDataStorageRepository):
                 password=self.password,
                 db=self.db,
                 loop=self.loop,
-                autocommit=True,  # 简化事务管理，每个语句自动提交 (Simplify transaction management, auto-commit each statement)
+                minsize=self.pool_minsize,
+                maxsize=self.pool_maxsize,
+                pool_recycle=self.pool_recycle,
+                connect_timeout=self.connect_timeout,
+                # 单条语句自动提交；多语句流程通过 transaction() 显式开启事务
+                # (Single statements auto-commit; multi-statement flows open an explicit transaction via transaction())
+                autocommit=True,
+                # rowcount 返回匹配的行数而非实际改变的行数，写入相同值的 UPDATE 不会被误判为未找到
+                # (rowcount reports matched rather than changed rows, so an UPDATE writing identical values is not mistaken for a missing row)
+                client_flag=CLIENT.FOUND_ROWS,
             )
             _mysql_repo_logger.info(
                 "MySQL 连接池已成功建立。 (MySQL connection pool established successfully.)"
@@ -127,6 +295,95 @@ class MySQLStorageRepository(IDataStorageRepository):
                 "无活动的 MySQL 连接池可关闭。 (No active MySQL connection pool to close.)"
             )
 
+    async def __aenter__(self) -> "MySQLStorageRepository":
+        """
+        在当前任务内固定一个连接，包住一段连续的数据库操作 (一个工作单元)：其中的读写与 transaction
+        复用同一连接，而不是每次调用都从连接池借还。连接在首次使用时才借出，不访问数据库的代码不占用连接。
+        上下文存续期间连接一直被占用，因此只应包住数据库操作，不要包住密码哈希等耗时的非数据库等待。
+        只有进入上下文的任务本身复用该连接；其中 `asyncio.create_task` 派生的后台任务仍从连接池取连接。
+        (Pins one connection for the current task around a run of database calls (a unit of work):
+         reads, writes and transactions inside reuse it instead of borrowing from the pool on every
+         call. The connection is borrowed lazily on first use, so code that never touches the database
+         holds none. The connection stays taken for as long as the context is open, so wrap only
+         database work, not slow non-database awaits such as password hashing. Only the entering task
+         reuses it; background tasks spawned with `asyncio.create_task` still use the pool.)
+        """
+        current_task = asyncio.current_task()
+        slot = self._pinned.get()
+        if slot is not None and slot.owner is current_task:
+            slot.depth += 1
+        else:
+            self._pinned.set(_PinnedConnection(current_task))
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        """释放 `__aenter__` 固定的连接。(Releases the connection pinned by `__aenter__`.)"""
+        slot = self._pinned.get()
+        if slot is None or slot.owner is not asyncio.current_task():
+            return
+        slot.depth -= 1
+        if slot.depth:
+            return
+        self._pinned.set(None)
+        if slot.conn is not None and self.pool is not None:
+            if slot.busy:
+                # 仍有未读完的结果集 (如未迭代完的 iter_query)，连接状态不可复用，关闭后再归还
+                # (An unread result set is still pending (e.g. an unfinished iter_query); the
+                #  connection cannot be reused, so close it before handing it back)
+                slot.conn.close()
+            # 仍处于事务中的连接会被连接池关闭而不是复用 (A connection still in a transaction is closed by the pool rather than reused)
+            await self.pool.release(slot.conn)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Any]:
+        """
+        在一个显式事务中执行多条语句：正常退出时提交，出现异常时回滚并重新抛出。
+        将产出的连接作为 `conn` 参数传给 get_by_id/create/update/delete，即可让这些操作共享同一事务。
+        (Runs several statements in one explicit transaction: commits on normal exit, rolls back
+         and re-raises on an exception. Pass the yielded connection as the `conn` argument of
+         get_by_id/create/update/delete to have those operations share the transaction.)
+
+        用法 (Usage):
+            async with repo.transaction() as conn:
+                await repo.update("paper", paper_id, {...}, conn=conn)
+                await repo.create("paper", {...}, conn=conn)
+        """
+        async with self._connection() as conn:
+            await conn.begin()
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+    @asynccontextmanager
+    async def _connection(self, conn: Optional[Any] = None) -> AsyncIterator[Any]:
+        """辅助方法：若调用方传入了事务连接则直接复用；其次复用当前任务固定且空闲的连接 (见 `__aenter__`)；
+        否则从连接池借出一个自动提交的连接。固定连接在使用期间标记为忙碌，同一时间只承载一条语句或一个结果集。
+        (Helper: Reuses the caller's transactional connection if given; next, the connection pinned by
+         the current task (see `__aenter__`) when it is idle; otherwise borrows an autocommit connection
+         from the pool. The pinned connection is marked busy while in use, so it carries one statement or
+         result set at a time.)"""
+        if conn is not None:
+            yield conn
+            return
+        if not self.pool:
+            await self.connect()
+        assert self.pool is not None
+        slot = self._pinned.get()
+        if slot is not None and slot.owner is asyncio.current_task() and not slot.busy:
+            if slot.conn is None:
+                slot.conn = await self.pool.acquire()
+            slot.busy = True
+            try:
+                yield slot.conn
+            finally:
+                slot.busy = False
+            return
+        async with self.pool.acquire() as pooled_conn:
+            yield pooled_conn
+
     async def init_storage_if_needed(
         self,
         entity_type: str,
@@ -153,6 +410,13 @@ class MySQLStorageRepository(IDataStorageRepository):
         assert self.pool is not None, (
             "数据库连接池在init_storage_if_needed时必须可用。 (Database connection pool must be available in init_storage_if_needed.)"
         )
+        storage_key = (
+            "question_bank_contents"
+            if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
+            else entity_type
+        )
+        if storage_key in self._initialized_storage:
+            return
 
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cur:
@@ -237,26 +501,147 @@ class MySQLStorageRepository(IDataStorageRepository):
                     _mysql_repo_logger.warning(
                         f"实体类型 '{entity_type}' 的表结构定义未找到。 (Table structure definition not found for entity type '{entity_type}'.)"
                     )
+                    return
+                await self._ensure_generated_columns(cur, entity_type)
+                await self._ensure_indexes(cur, entity_type)
+        self._initialized_storage.add(storage_key)
+
+    async def init_all_storage(self) -> None:
+        """
+        在各自的连接池连接上并发检查/创建所有已知实体表 (`TABLE_INFO`)，让启动时的建表往返相互重叠。
+        之后各 CRUD 针对这些实体类型调用 init_storage_if_needed 时直接返回。
+        (Checks/creates every known entity table (`TABLE_INFO`) concurrently, each on its own pooled
+         connection, so the startup DDL round trips overlap. Later init_storage_if_needed calls from
+         the CRUD layers for these entity types return immediately.)
+        """
+        if not self.pool:
+            await self.connect()
+        await asyncio.gather(
+            *(self.init_storage_if_needed(entity_type) for entity_type in TABLE_INFO)
+        )
+
+    async def _ensure_generated_columns(self, cur: Any, entity_type: str) -> None:
+        """
+        辅助方法：为实体表补充 `GENERATED_QUERY_COLUMNS` 中缺失的生成列，兼容旧版本创建的表。
+        (Helper: Adds any generated columns from `GENERATED_QUERY_COLUMNS` missing from the
+         entity's table, so tables created by older versions are upgraded too.)
+        """
+        generated_columns = GENERATED_QUERY_COLUMNS.get(entity_type)
+        if not generated_columns:
+            return
+        table_name, _ = self._get_table_info(entity_type)
+        for source, (column, column_type) in generated_columns.items():
+            await cur.execute(
+                "SELECT COUNT(*) FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+                (table_name, column),
+            )
+            (exists,) = await cur.fetchone()
+            if exists:
+                continue
+            # 使用 STORED 而非 VIRTUAL：值在写入时计算一次，读取和索引维护时不再逐行求值
+            # (STORED rather than VIRTUAL: the value is computed once on write, not re-evaluated per row on reads)
+            await cur.execute(
+                f"ALTER TABLE {table_name} "
+                f"ADD COLUMN `{column}` {column_type} GENERATED ALWAYS AS (`{source}`) STORED"
+            )
+            _mysql_repo_logger.info(
+                f"已为表 '{table_name}' 添加生成列 '{column}'。 (Added generated column '{column}' to table '{table_name}'.)"
+            )
+
+    async def _ensure_indexes(self, cur: Any, entity_type: str) -> None:
+        """
+        辅助方法：创建 `SECONDARY_INDEXES` 中实体表尚不存在的索引 (通过 information_schema.STATISTICS 检查，可重复执行)。
+        (Helper: Creates the entity table's indexes from `SECONDARY_INDEXES` that do not exist yet,
+         checked via information_schema.STATISTICS so it is idempotent.)
+        """
+        indexes = SECONDARY_INDEXES.get(entity_type)
+        if not indexes:
+            return
+        table_name, _ = self._get_table_info(entity_type)
+        for index_name, columns in indexes.items():
+            await cur.execute(
+                "SELECT COUNT(*) FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                (table_name, index_name),
+            )
+            (exists,) = await cur.fetchone()
+            if exists:
+                continue
+            column_list = ", ".join(f"`{column}`" for column in columns)
+            await cur.execute(
+                f"CREATE INDEX `{index_name}` ON {table_name} ({column_list})"
+            )
+            _mysql_repo_logger.info(
+                f"已为表 '{table_name}' 创建索引 '{index_name}'。 (Created index '{index_name}' on table '{table_name}'.)"
+            )
+
+    def _cached_sql(self, key: tuple, build: Callable[[], str]) -> str:
+        """辅助方法：返回 `key` 对应的已缓存 SQL，首次未命中时调用 `build` 生成并缓存。
+        (Helper: Returns the cached SQL for `key`, building and caching it with `build` on the first miss.)"""
+        sql = self._sql_cache.get(key)
+        if sql is None:
+            sql = self._sql_cache[key] = build()
+        return sql
+
+    def _select_list(
+        self, entity_type: str, fields: Optional[List[str]] = None
+    ) -> tuple[str, ...]:
+        """
+        辅助方法：将读取投影 `fields` 校验并转换为列名元组；未指定时返回 ("*",)。
+        题库内容的 "id" 映射为 difficulty_id，且始终选取 difficulty_id 以构造返回结构。
+        (Helper: Validates the read projection `fields` and converts it to a tuple of column names;
+         returns ("*",) when not given. For question bank content, "id" maps to difficulty_id, and
+         difficulty_id is always selected to build the returned structure.)
+
+        抛出 (Raises):
+            ValueError: 若字段不是该实体表的列。(If a field is not a column of the entity's table.)
+        """
+        if not fields:
+            return ("*",)
+        table_name, id_column = self._get_table_info(entity_type)
+        if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
+            fields = [id_column] + [
+                id_column if field == "id" else field for field in fields
+            ]
+        allowed_columns = TABLE_COLUMNS[table_name]
+        unknown_fields = [field for field in fields if field not in allowed_columns]
+        if unknown_fields:
+            raise ValueError(
+                f"表 '{table_name}' 不包含字段 (Table '{table_name}' has no such fields): {unknown_fields}"
+            )
+        return tuple(dict.fromkeys(fields))  # 去重并保持顺序 (Dedupe, keeping order)
+
+    @staticmethod
+    def _columns_sql(columns: tuple[str, ...]) -> str:
+        """辅助方法：将 `_select_list` 的结果格式化为 SELECT 列表。(Helper: Formats a `_select_list` result as a SELECT list.)"""
+        if columns == ("*",):
+            return "*"
+        return ", ".join(f"`{column}`" for column in columns)
+
+    @staticmethod
+    def _qb_content_view(record: Dict[str, Any]) -> Dict[str, Any]:
+        """辅助方法：将题库内容表的行转换为对外的 {"id", "questions"} 结构；未选取 questions 时省略该键。
+        (Helper: Converts a question bank contents row into the public {"id", "questions"} shape; the key is omitted when questions was not selected.)"""
+        view: Dict[str, Any] = {"id": record["difficulty_id"]}
+        if "questions" in record:
+            view["questions"] = record["questions"]
+        return view
 
-    def _get_table_info(self, entity_type: str) -> tuple[str, str]:
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _get_table_info(entity_type: str) -> tuple[str, str]:
         """
-        辅助方法：根据实体类型获取对应的表名和主键列名。
-        (Helper method: Gets the corresponding table name and primary key column name based on entity type.)
+        辅助方法：根据实体类型获取对应的表名和主键列名 (查表并缓存结果)。
+        (Helper method: Gets the corresponding table name and primary key column name based on entity type, via a cached table lookup.)
         对于具有复合主键的表（如question_bank_contents），返回主要的ID列。
         (For tables with composite primary keys (e.g., question_bank_contents), returns the main ID column.)
         """
-        if entity_type == "user":
-            return USER_TABLE, "uid"
-        elif entity_type == "paper":
-            return PAPER_TABLE, "paper_id"
-        elif entity_type == "question_bank_metadata":
-            return QB_METADATA_TABLE, "id"
-        elif entity_type == "question_bank_contents" or entity_type.startswith(
-            QB_CONTENT_ENTITY_TYPE_PREFIX
-        ):
-            # 题库内容使用 difficulty_id 作为主要标识符，content_id 作为次要标识符
-            # (Question bank content uses difficulty_id as the primary identifier, content_id as secondary)
-            return QB_CONTENT_TABLE, "difficulty_id"
+        table_info = TABLE_INFO.get(entity_type)
+        if table_info is not None:
+            return table_info
+        if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
+            return TABLE_INFO["question_bank_contents"]
         else:
             _mysql_repo_logger.error(
                 f"未知的实体类型，无法映射到表名 (Unknown entity type, cannot map to table name): {entity_type}"
@@ -266,32 +651,29 @@ class MySQLStorageRepository(IDataStorageRepository):
             )
 
     def _deserialize_json_fields(
-        self, entity_type: str, record: Dict[str, Any]
+        self,
+        entity_type: str,
+        record: Dict[str, Any],
+        json_fields: Optional[tuple[str, ...]] = None,
     ) -> Dict[str, Any]:
-        """辅助方法：反序列化记录中可能的JSON字符串字段。(Helper: Deserialize potential JSON string fields in a record.)"""
+        """辅助方法：就地反序列化记录中可能的JSON字符串字段。逐行调用时可传入预先取得的 `json_fields`。
+        (Helper: Deserializes potential JSON string fields of a record in place. Per-row callers may pass `json_fields` looked up once up front.)"""
         if not record:
             return record
 
-        json_fields_map = {
-            "user": ["tags"],
-            "paper": ["paper_questions", "submitted_answers_card"],
-            "question_bank_contents": ["questions"],
-            # QB_CONTENT_ENTITY_TYPE_PREFIX: ["questions"], # 如果动态匹配也用这个
-        }
-        # Normalize entity_type for qb_content
-        normalized_entity_type = (
-            "question_bank_contents"
-            if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
-            else entity_type
-        )
-
-        fields_to_deserialize = json_fields_map.get(normalized_entity_type, [])
+        # 生成列仅供索引查询使用，不属于实体数据 (Generated columns only serve indexed queries and are not entity data)
+        for column, _ in GENERATED_QUERY_COLUMNS.get(entity_type, {}).values():
+            record.pop(column, None)
 
-        for key in fields_to_deserialize:
+        if json_fields is None:
+            json_fields = _json_fields_for(entity_type)
+        for key in json_fields:
             value = record.get(key)
-            if isinstance(value, str):
+            # 驱动已解析的对象、NULL 及未被投影选取的字段都无需处理
+            # (Objects already parsed by the driver, NULLs and fields not selected by a projection need no work)
+            if type(value) is str:
                 try:
-                    record[key] = json.loads(value)
+                    record[key] = _json_loads(value)
                 except json.JSONDecodeError:
                     _mysql_repo_logger.warning(
                         f"反序列化字段 '{key}' 失败，值为非JSON字符串: '{value[:50]}...' (Failed to deserialize field '{key}', value is not a JSON string: '{value[:50]}...')"
@@ -304,47 +686,48 @@ class MySQLStorageRepository(IDataStorageRepository):
     ) -> Dict[str, Any]:
         """辅助方法：序列化实体数据中需要存储为JSON字符串的字段。(Helper: Serialize fields in entity data that need to be stored as JSON strings.)"""
         data_copy = entity_data.copy()  # 操作副本 (Operate on a copy)
-        json_fields_map = {
-            "user": ["tags"],
-            "paper": ["paper_questions", "submitted_answers_card"],
-            "question_bank_contents": ["questions"],
-            # QB_CONTENT_ENTITY_TYPE_PREFIX: ["questions"],
-        }
-        normalized_entity_type = (
-            "question_bank_contents"
-            if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
-            else entity_type
-        )
-        fields_to_serialize = json_fields_map.get(normalized_entity_type, [])
-
-        for key in fields_to_serialize:
+        for key in _json_fields_for(entity_type):
             if key in data_copy and isinstance(data_copy[key], (dict, list)):
-                data_copy[key] = json.dumps(data_copy[key])
+                data_copy[key] = _json_dumps(data_copy[key])
         return data_copy
 
     async def get_by_id(
-        self, entity_type: str, entity_id: str
+        self,
+        entity_type: str,
+        entity_id: str,
+        conn: Optional[Any] = None,
+        fields: Optional[List[str]] = None,
     ) -> Optional[Dict[str, Any]]:
-        """通过ID从MySQL数据库中检索单个实体。(Retrieves a single entity by ID from the MySQL database.)"""
-        if not self.pool:
-            await self.connect()
-        assert self.pool is not None
-
+        """通过ID从MySQL数据库中检索单个实体。可传入 `transaction()` 产出的 `conn` 以读取同一事务内未提交的修改；
+        `fields` 指定只读取的列 (默认读取全部列)。
+        (Retrieves a single entity by ID from the MySQL database. Pass a `conn` from `transaction()` to see
+         uncommitted changes made in that transaction; `fields` limits the columns read (all columns by default).)"""
         table_name, id_column = self._get_table_info(entity_type)
+        columns = self._select_list(entity_type, fields)
 
         # 特殊处理题库内容实体类型 (Special handling for question bank content entity type)
         # 假设 entity_id 对于 qb_content 对应 difficulty_id，并使用默认 content_id
         # (Assume entity_id for qb_content corresponds to difficulty_id, using default content_id)
         if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
             actual_difficulty_id = entity_id  # 此时 entity_id 是 difficulty_id
-            sql = f"SELECT * FROM {table_name} WHERE difficulty_id = %s AND content_id = %s"
+            sql = self._cached_sql(
+                ("get_by_id", QB_CONTENT_ENTITY_TYPE_PREFIX, columns),
+                lambda: (
+                    f"SELECT {self._columns_sql(columns)} FROM {table_name} WHERE difficulty_id = %s AND content_id = %s"
+                ),
+            )
             sql_params = (actual_difficulty_id, "default")
         else:
-            sql = f"SELECT * FROM {table_name} WHERE {id_column} = %s"
+            sql = self._cached_sql(
+                ("get_by_id", entity_type, columns),
+                lambda: (
+                    f"SELECT {self._columns_sql(columns)} FROM {table_name} WHERE {id_column} = %s"
+                ),
+            )
             sql_params = (entity_id,)
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
+        async with self._connection(conn) as active_conn:
+            async with active_conn.cursor(aiomysql.DictCursor) as cur:
                 try:
                     await cur.execute(sql, sql_params)
                     record = await cur.fetchone()
@@ -352,10 +735,7 @@ class MySQLStorageRepository(IDataStorageRepository):
                         record = self._deserialize_json_fields(entity_type, record)
                         # 为题库内容适配返回结构 (Adapt return structure for qb_content)
                         if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
-                            return {
-                                "id": record["difficulty_id"],
-                                "questions": record.get("questions", []),
-                            }
+                            return self._qb_content_view(record)
                     return record
                 except OperationalError as e:
                     _mysql_repo_logger.error(
@@ -365,19 +745,18 @@ class MySQLStorageRepository(IDataStorageRepository):
                     return None
 
     async def get_all(
-        self, entity_type: str, skip: int = 0, limit: int = 100
+        self,
+        entity_type: str,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
-        """从MySQL数据库检索指定类型的所有实体，支持分页。(Retrieves all entities of a specified type from MySQL, with pagination.)"""
-        if not self.pool:
-            await self.connect()
-        assert self.pool is not None
-        table_name, id_column = self._get_table_info(entity_type)
-        order_by_clause = (
-            f"ORDER BY {id_column}"
-            if id_column and not entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
-            else ""
-        )  # qb_content 可能没有单一主键排序
+        """从MySQL数据库检索指定类型的所有实体，支持分页；`fields` 指定只读取的列。
+        (Retrieves all entities of a specified type from MySQL, with pagination; `fields` limits the columns read.)
 
+        注意：MySQL 需要读取并丢弃 OFFSET 之前的所有行，页码越深越慢；顺序翻页请使用 `get_page`。
+        (Note: MySQL reads and discards every row before the OFFSET, so deep pages get slower; use `get_page` for sequential paging.)
+        """
         # 题库内容通常按 difficulty_id 获取，不适合通用 get_all，除非有特定需求
         # (Question bank content usually fetched by difficulty_id, not suitable for generic get_all unless specific need)
         if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
@@ -386,33 +765,119 @@ class MySQLStorageRepository(IDataStorageRepository):
             )
             return []
 
-        sql = f"SELECT * FROM {table_name} {order_by_clause} LIMIT %s OFFSET %s"
+        try:
+            rows = [
+                row
+                async for row in self._fetch_rows(
+                    entity_type, {}, skip, limit, fields=fields
+                )
+            ]
+            return await self._decode_records(entity_type, rows)
+        except OperationalError as e:
+            _mysql_repo_logger.error(
+                f"执行 get_all (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
+                exc_info=True,
+            )
+            return []
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
+    async def get_page(
+        self,
+        entity_type: str,
+        after_id: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        按主键的键集分页 (keyset pagination) 检索实体：返回主键大于 `after_id` 的前 `limit` 个实体，
+        `after_id` 为 None 时返回第一页。每页只需一次主键索引定位，代价与页码深度无关。
+        下一页的 `after_id` 为本页最后一个实体的主键；返回少于 `limit` 个实体即表示已到末页。
+        (Retrieves entities with keyset pagination on the primary key: returns the first `limit` entities
+         whose key is greater than `after_id`, or the first page when `after_id` is None. Each page is one
+         primary-key index seek, so the cost does not depend on how deep the page is. The next page's
+         `after_id` is the key of this page's last entity; fewer than `limit` entities means the last page.)
+        """
+        if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
+            _mysql_repo_logger.warning(
+                f"get_page 不支持实体类型 '{entity_type}'，请使用 get_by_id (difficulty_id)。将返回空列表。 (get_page not supported for entity type '{entity_type}', use get_by_id (difficulty_id). Returning empty list.)"
+            )
+            return []
+        table_name, id_column = self._get_table_info(entity_type)
+        columns = self._select_list(entity_type, fields)
+        if fields and id_column not in columns:
+            # 调用方需要主键来请求下一页 (Callers need the key to request the next page)
+            columns = (id_column,) + columns
+        has_cursor = after_id is not None
+
+        def build() -> str:
+            where_sql = f"WHERE `{id_column}` > %s " if has_cursor else ""
+            return f"SELECT {self._columns_sql(columns)} FROM {table_name} {where_sql}ORDER BY `{id_column}` LIMIT %s"
+
+        sql = self._cached_sql(("get_page", entity_type, has_cursor, columns), build)
+        sql_params = (after_id, limit) if has_cursor else (limit,)
+        try:
+            rows = [row async for row in self._stream_rows(sql, sql_params)]
+            return await self._decode_records(entity_type, rows)
+        except OperationalError as e:
+            _mysql_repo_logger.error(
+                f"执行 get_page (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
+                exc_info=True,
+            )
+            return []
+
+    async def create(
+        self, entity_type: str, entity_data: Dict[str, Any], conn: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """在MySQL数据库中创建一个新实体。可传入 `transaction()` 产出的 `conn` 以加入该事务。
+        (Creates a new entity in the MySQL database. Pass a `conn` from `transaction()` to join that transaction.)"""
+        table_name, _ = self._get_table_info(entity_type)  # id_column 在此不直接使用
+
+        data_to_insert = self._prepare_insert_row(entity_type, entity_data)
+        sql = self._insert_sql(table_name, tuple(data_to_insert))
+
+        async with self._connection(conn) as active_conn:
+            async with active_conn.cursor(aiomysql.DictCursor) as cur:
                 try:
-                    await cur.execute(sql, (limit, skip))
-                    records = await cur.fetchall()
-                    return [
-                        self._deserialize_json_fields(entity_type, record)
-                        for record in records
-                    ]
+                    await cur.execute(sql, tuple(data_to_insert.values()))
+                    if cur.rowcount == 1:  # 确保有一行被插入
+                        # 对于非自增主键，MySQL的lastrowid可能不适用，返回原始数据
+                        # (For non-auto-increment PKs, MySQL lastrowid may not apply, return original data)
+                        # 返回原始 entity_data (未序列化JSON的) 以保持接口一致性
+                        return entity_data
+                    else:
+                        raise OperationalError(
+                            "创建操作影响了0行记录。 (Create operation affected 0 rows.)"
+                        )
+                except IntegrityError as e:  # 主键冲突等
+                    _mysql_repo_logger.error(
+                        f"创建实体 (类型 (Type): {entity_type}) 时发生完整性错误 (IntegrityError): {e}",
+                        exc_info=True,
+                    )
+                    raise ValueError(
+                        f"实体创建因完整性约束（如重复ID）失败 (Entity creation failed due to integrity constraint (e.g., duplicate ID)): {entity_type}。"
+                    ) from e
                 except OperationalError as e:
                     _mysql_repo_logger.error(
-                        f"执行 get_all (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
+                        f"执行 create (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
                         exc_info=True,
                     )
-                    return []
+                    raise
 
-    async def create(
+    def _insert_sql(self, table_name: str, columns: tuple) -> str:
+        """辅助方法：返回按给定列顺序插入单行的 (已缓存) INSERT 语句。
+        (Helper: Returns the (cached) single-row INSERT statement for the given column order.)"""
+
+        def build() -> str:
+            cols = ", ".join(f"`{k}`" for k in columns)  # 列名使用反引号避免关键字冲突
+            placeholders = ", ".join(["%s"] * len(columns))
+            return f"INSERT INTO {table_name} ({cols}) VALUES ({placeholders})"
+
+        return self._cached_sql(("insert", table_name, columns), build)
+
+    def _prepare_insert_row(
         self, entity_type: str, entity_data: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """在MySQL数据库中创建一个新实体。(Creates a new entity in the MySQL database.)"""
-        if not self.pool:
-            await self.connect()
-        assert self.pool is not None
-        table_name, _ = self._get_table_info(entity_type)  # id_column 在此不直接使用
-
+        """辅助方法：将实体数据转换为待插入的列值字典 (序列化JSON字段并适配题库内容的主键列)。
+        (Helper: Converts entity data into the column values to insert, serializing JSON fields and adapting qb_content key columns.)"""
         # 序列化需要转为JSON字符串的字段
         data_to_insert = self._serialize_json_fields(entity_type, entity_data)
 
@@ -427,75 +892,176 @@ class MySQLStorageRepository(IDataStorageRepository):
             data_to_insert["content_id"] = data_to_insert.get(
                 "content_id", "default"
             )  # 默认 content_id
+        return data_to_insert
 
-        cols = ", ".join(
-            f"`{k}`" for k in data_to_insert.keys()
-        )  # 列名使用反引号避免关键字冲突
-        placeholders = ", ".join(["%s"] * len(data_to_insert))
-        sql = f"INSERT INTO {table_name} ({cols}) VALUES ({placeholders})"
+    async def upsert(
+        self, entity_type: str, entity_data: Dict[str, Any], conn: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """
+        创建实体，若主键已存在则以 `entity_data` 覆盖该行的其他列，一次往返完成“创建或更新”。
+        (Creates the entity, or overwrites the other columns of the existing row when the primary key
+         already exists, doing "create or update" in one round trip.)
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
+        使用 `VALUES(col)` 而非 MySQL 8.0.19 的行别名语法，以兼容 MariaDB。
+        (Uses `VALUES(col)` rather than MySQL 8.0.19's row-alias syntax so MariaDB is supported too.)
+        """
+        table_name, id_column = self._get_table_info(entity_type)
+        key_columns = (
+            (id_column, "content_id")
+            if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
+            else (id_column,)
+        )
+        data_to_upsert = self._prepare_insert_row(entity_type, entity_data)
+        columns = tuple(data_to_upsert)
+
+        def build() -> str:
+            # 只有主键列时写回主键自身，使重复插入成为空操作
+            # (Key-only rows write the key back to itself, making the duplicate a no-op)
+            update_columns = [col for col in columns if col not in key_columns] or [
+                key_columns[0]
+            ]
+            update_clause = ", ".join(
+                f"`{col}` = VALUES(`{col}`)" for col in update_columns
+            )
+            return f"{self._insert_sql(table_name, columns)} ON DUPLICATE KEY UPDATE {update_clause}"
+
+        sql = self._cached_sql(("upsert", table_name, columns), build)
+        async with self._connection(conn) as active_conn:
+            async with active_conn.cursor() as cur:
                 try:
-                    await cur.execute(sql, tuple(data_to_insert.values()))
-                    if cur.rowcount == 1:  # 确保有一行被插入
-                        # 对于非自增主键，MySQL的lastrowid可能不适用，返回原始数据
-                        # (For non-auto-increment PKs, MySQL lastrowid may not apply, return original data)
-                        # 返回原始 entity_data (未序列化JSON的) 以保持接口一致性
-                        return entity_data
-                    else:
-                        raise OperationalError(
-                            "创建操作影响了0行记录。 (Create operation affected 0 rows.)"
+                    await cur.execute(sql, tuple(data_to_upsert.values()))
+                except IntegrityError as e:  # 其他唯一约束冲突等
+                    _mysql_repo_logger.error(
+                        f"upsert 实体 (类型 (Type): {entity_type}) 时发生完整性错误 (IntegrityError): {e}",
+                        exc_info=True,
+                    )
+                    raise ValueError(
+                        f"实体 upsert 因完整性约束失败 (Entity upsert failed due to integrity constraint): {entity_type}。"
+                    ) from e
+                except OperationalError as e:
+                    _mysql_repo_logger.error(
+                        f"执行 upsert (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
+                        exc_info=True,
+                    )
+                    raise
+        # 与 create 一致，返回原始实体数据 (As in create, return the original entity data)
+        return entity_data
+
+    async def create_many(
+        self, entity_type: str, entities_data: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        在一个事务中批量创建实体：列集合相同的行交给 `executemany`，由 aiomysql 改写为
+        多行 `INSERT ... VALUES (...), (...)`；任一行失败 (如重复ID) 则整批回滚。
+        (Creates entities in bulk within one transaction: rows with the same column set go through
+         `executemany`, which aiomysql rewrites into multi-row `INSERT ... VALUES (...), (...)`
+         statements; if any row fails (e.g. a duplicate ID) the whole batch is rolled back.)
+
+        aiomysql 只在客户端按 `Cursor.max_stmt_length` (默认 1,024,000 字节) 拆分语句，并不读取服务器的
+        max_allowed_packet。服务器上限低于该值，或单行本身 (如很大的 JSON 列) 就超过上限时，
+        服务器会以错误 1153 拒绝，此时整批回滚并记录明确的日志后重新抛出。
+        (aiomysql splits statements only on the client side, at `Cursor.max_stmt_length` (1,024,000
+         bytes by default), and never reads the server's max_allowed_packet. When the server limit is
+         lower than that, or a single row (e.g. a large JSON column) exceeds it on its own, the server
+         rejects it with error 1153; the batch is then rolled back, logged explicitly and re-raised.)
+        """
+        if not entities_data:
+            return []
+        table_name, _ = self._get_table_info(entity_type)
+
+        # 按列集合分组，缺失的列保留数据库默认值而不是写入 NULL
+        # (Group rows by column set so missing columns keep their database defaults instead of NULL)
+        rows_by_columns: Dict[tuple, List[Dict[str, Any]]] = {}
+        for entity_data in entities_data:
+            row = self._prepare_insert_row(entity_type, entity_data)
+            rows_by_columns.setdefault(tuple(row.keys()), []).append(row)
+
+        async with self.transaction() as conn:
+            async with conn.cursor() as cur:
+                try:
+                    for columns, rows in rows_by_columns.items():
+                        await cur.executemany(
+                            self._insert_sql(table_name, columns),
+                            [tuple(row.values()) for row in rows],
                         )
-                except IntegrityError as e:  # 主键冲突等
+                except IntegrityError as e:  # 主键冲突等，由 transaction() 回滚
                     _mysql_repo_logger.error(
-                        f"创建实体 (类型 (Type): {entity_type}) 时发生完整性错误 (IntegrityError): {e}",
+                        f"批量创建实体 (类型 (Type): {entity_type}) 时发生完整性错误，已回滚 (IntegrityError, rolled back): {e}",
                         exc_info=True,
                     )
                     raise ValueError(
-                        f"实体创建因完整性约束（如重复ID）失败 (Entity creation failed due to integrity constraint (e.g., duplicate ID)): {entity_type}。"
+                        f"批量创建因完整性约束（如重复ID）失败 (Bulk creation failed due to integrity constraint (e.g., duplicate ID)): {entity_type}。"
                     ) from e
                 except OperationalError as e:
+                    if e.args and e.args[0] == ER.NET_PACKET_TOO_LARGE:
+                        _mysql_repo_logger.error(
+                            f"批量创建实体 (类型 (Type): {entity_type}) 的语句超过服务器 max_allowed_packet，已回滚。"
+                            f"请调大 max_allowed_packet (需不小于 {aiomysql.Cursor.max_stmt_length} 字节及最大单行大小) 或减少单批行数 "
+                            f"(Bulk insert statement exceeded the server's max_allowed_packet, rolled back. Raise max_allowed_packet "
+                            f"to at least {aiomysql.Cursor.max_stmt_length} bytes and the largest row, or send fewer rows per batch): {e}"
+                        )
+                        raise
                     _mysql_repo_logger.error(
-                        f"执行 create (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
+                        f"执行 create_many (实体类型 (Entity Type): {entity_type}) 时出错，已回滚 (Error, rolled back): {e}",
                         exc_info=True,
                     )
                     raise
+        # 与 create 一致，返回原始实体数据 (As in create, return the original entity data)
+        return list(entities_data)
 
     async def update(
-        self, entity_type: str, entity_id: str, update_data: Dict[str, Any]
+        self,
+        entity_type: str,
+        entity_id: str,
+        update_data: Dict[str, Any],
+        conn: Optional[Any] = None,
+        return_full_record: bool = True,
     ) -> Optional[Dict[str, Any]]:
-        """通过ID在MySQL数据库中更新现有实体。(Updates an existing entity by ID in the MySQL database.)"""
-        if not self.pool:
-            await self.connect()
-        assert self.pool is not None
+        """
+        通过ID在MySQL数据库中更新现有实体。可传入 `transaction()` 产出的 `conn` 以加入该事务。
+        (Updates an existing entity by ID in the MySQL database. Pass a `conn` from `transaction()` to join that transaction.)
+
+        默认在同一连接上重新读取并返回完整记录；不需要完整记录的调用方可传入 `return_full_record=False`，
+        此时省去这次往返，仅返回 `update_data` 加上主键。
+        (By default the full record is re-read on the same connection and returned; callers that do not need
+         it can pass `return_full_record=False` to skip that round trip and get just `update_data` plus the key.)
+        """
         table_name, id_column = self._get_table_info(entity_type)
 
         if not update_data:  # 如果没有提供更新数据，则直接返回当前实体
-            return await self.get_by_id(entity_type, entity_id)
+            return await self.get_by_id(entity_type, entity_id, conn=conn)
 
         data_to_update = self._serialize_json_fields(entity_type, update_data)
 
-        set_clause = ", ".join([f"`{col}` = %s" for col in data_to_update.keys()])
+        columns = tuple(data_to_update)
         sql_params_list: List[Any] = list(data_to_update.values())
+        is_qb_content = entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
 
-        # 特殊处理题库内容实体 (Special handling for qb_content)
-        if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
-            sql = f"UPDATE {table_name} SET {set_clause} WHERE difficulty_id = %s AND content_id = %s"
+        def build() -> str:
+            set_clause = ", ".join([f"`{col}` = %s" for col in columns])
+            # 特殊处理题库内容实体 (Special handling for qb_content)
+            if is_qb_content:
+                return f"UPDATE {table_name} SET {set_clause} WHERE difficulty_id = %s AND content_id = %s"
+            return f"UPDATE {table_name} SET {set_clause} WHERE `{id_column}` = %s"
+
+        sql = self._cached_sql(("update", table_name, is_qb_content, columns), build)
+        if is_qb_content:
             sql_params_list.extend([entity_id, "default"])  # entity_id is difficulty_id
         else:
-            sql = f"UPDATE {table_name} SET {set_clause} WHERE `{id_column}` = %s"
             sql_params_list.append(entity_id)
 
         sql_params = tuple(sql_params_list)
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
+        async with self._connection(conn) as active_conn:
+            async with active_conn.cursor(aiomysql.DictCursor) as cur:
                 try:
                     await cur.execute(sql, sql_params)
+                    if cur.rowcount > 0 and not return_full_record:
+                        key_field = "id" if is_qb_content else id_column
+                        return {**update_data, key_field: entity_id}
                     if cur.rowcount > 0:  # 如果有行被更新
                         return await self.get_by_id(
-                            entity_type, entity_id
+                            entity_type, entity_id, conn=active_conn
                         )  # 获取并返回更新后的记录
                     _mysql_repo_logger.warning(
                         f"更新操作未影响任何行 (Update operation affected 0 rows): 类型 (Type)='{entity_type}', ID='{entity_id}'"
@@ -508,25 +1074,31 @@ class MySQLStorageRepository(IDataStorageRepository):
                     )
                     return None
 
-    async def delete(self, entity_type: str, entity_id: str) -> bool:
-        """通过ID从MySQL数据库中删除实体。(Deletes an entity by ID from the MySQL database.)"""
-        if not self.pool:
-            await self.connect()
-        assert self.pool is not None
+    async def delete(
+        self, entity_type: str, entity_id: str, conn: Optional[Any] = None
+    ) -> bool:
+        """通过ID从MySQL数据库中删除实体。可传入 `transaction()` 产出的 `conn` 以加入该事务。
+        (Deletes an entity by ID from the MySQL database. Pass a `conn` from `transaction()` to join that transaction.)"""
         table_name, id_column = self._get_table_info(entity_type)
 
         # 特殊处理题库内容实体 (Special handling for qb_content)
         if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
-            sql = (
-                f"DELETE FROM {table_name} WHERE difficulty_id = %s AND content_id = %s"
+            sql = self._cached_sql(
+                ("delete", QB_CONTENT_ENTITY_TYPE_PREFIX),
+                lambda: (
+                    f"DELETE FROM {table_name} WHERE difficulty_id = %s AND content_id = %s"
+                ),
             )
             sql_params = (entity_id, "default")  # entity_id is difficulty_id
         else:
-            sql = f"DELETE FROM {table_name} WHERE `{id_column}` = %s"
+            sql = self._cached_sql(
+                ("delete", entity_type),
+                lambda: f"DELETE FROM {table_name} WHERE `{id_column}` = %s",
+            )
             sql_params = (entity_id,)
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor() as cur:
+        async with self._connection(conn) as active_conn:
+            async with active_conn.cursor() as cur:
                 try:
                     await cur.execute(sql, sql_params)
                     return (
@@ -545,20 +1117,107 @@ class MySQLStorageRepository(IDataStorageRepository):
         conditions: Dict[str, Any],
         skip: int = 0,
         limit: int = 100,
+        fields: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
-        """根据一组条件从MySQL数据库查询实体。(Queries entities from MySQL based on a set of conditions.)"""
-        if not self.pool:
-            await self.connect()
-        assert self.pool is not None
+        """根据一组条件从MySQL数据库查询实体；`fields` 指定只读取的列 (如列表页只需标量字段时跳过大 JSON 列)。
+        (Queries entities from MySQL based on a set of conditions; `fields` limits the columns read, e.g. to skip large JSON columns when a list view only needs scalars.)
+
+        与 `get_all` 相同，`skip` 越大代价越高。(As with `get_all`, cost grows with `skip`.)
+        """
+        try:
+            rows = [
+                row
+                async for row in self._fetch_rows(
+                    entity_type, conditions, skip, limit, fields=fields
+                )
+            ]
+            return await self._decode_records(entity_type, rows)
+        except OperationalError as e:
+            _mysql_repo_logger.error(
+                f"执行 query (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
+                exc_info=True,
+            )
+            return []
+
+    async def iter_query(
+        self,
+        entity_type: str,
+        conditions: Dict[str, Any],
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        与 `query` 条件相同，但通过服务器端游标 (SSDictCursor) 逐行流式返回实体，
+        内存中同时只保留一行，适合 JSON 列较大的结果集。数据库错误 (OperationalError) 会直接抛出。
+        (Same conditions as `query`, but streams entities one row at a time through a server-side
+         cursor (SSDictCursor), so only one row is held in memory at once; suited to result sets
+         with large JSON columns. Database errors (OperationalError) propagate to the caller.)
+        """
+        is_qb_content = entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
+        json_fields = _json_fields_for(entity_type)
+        async for record in self._fetch_rows(
+            entity_type, conditions, skip, limit, fields=fields
+        ):
+            record = self._deserialize_json_fields(entity_type, record, json_fields)
+            # 特殊处理题库内容返回结构 (Special handling for qb_content return structure)
+            if is_qb_content:
+                yield self._qb_content_view(record)
+            else:
+                yield record
+
+    async def _decode_records(
+        self, entity_type: str, records: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        辅助方法：反序列化整批原始行并适配题库内容结构。行数达到 `MYSQL_THREAD_DECODE_MIN_ROWS`
+        且含JSON字段时交给 `asyncio.to_thread`，其间事件循环可以继续服务其他请求。
+        (Helper: Deserializes a batch of raw rows and adapts the question bank content shape. When there
+         are at least `MYSQL_THREAD_DECODE_MIN_ROWS` rows with JSON fields, the work goes to
+         `asyncio.to_thread` so the event loop can keep serving other requests meanwhile.)
+        """
+        if len(records) >= MYSQL_THREAD_DECODE_MIN_ROWS and _json_fields_for(
+            entity_type
+        ):
+            return await asyncio.to_thread(
+                self._decode_records_sync, entity_type, records
+            )
+        return self._decode_records_sync(entity_type, records)
+
+    def _decode_records_sync(
+        self, entity_type: str, records: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """`_decode_records` 的同步实现 (Synchronous implementation of `_decode_records`)."""
+        json_fields = _json_fields_for(entity_type)
+        decoded = [
+            self._deserialize_json_fields(entity_type, record, json_fields)
+            for record in records
+        ]
+        if entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX):
+            return [self._qb_content_view(record) for record in decoded]
+        return decoded
+
+    async def _fetch_rows(
+        self,
+        entity_type: str,
+        conditions: Dict[str, Any],
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """辅助方法：构建 query 的 SQL 并通过服务器端游标逐行产出未反序列化的原始行。
+        (Helper: Builds the query SQL and yields raw, not yet deserialized rows one at a time through a server-side cursor.)"""
         table_name, id_column = self._get_table_info(entity_type)
+        columns = self._select_list(entity_type, fields)
         order_by_clause = (
             f"ORDER BY `{id_column}`"
             if id_column and not entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
             else ""
         )
 
-        where_clauses = []
+        where_columns = []
         sql_params_list: List[Any] = []
+        generated_columns = GENERATED_QUERY_COLUMNS.get(entity_type, {})
         for key, value in conditions.items():
             # 对于JSON字段的查询，直接比较可能不准确，取决于MySQL版本和JSON函数的使用。
             # (For JSON field queries, direct comparison might be inaccurate, depending on MySQL version and JSON function usage.)
@@ -567,48 +1226,46 @@ class MySQLStorageRepository(IDataStorageRepository):
             if isinstance(
                 value, (dict, list)
             ):  # 如果查询条件的值是字典或列表，尝试序列化为JSON字符串进行比较
-                where_clauses.append(f"`{key}` = %s")
-                sql_params_list.append(json.dumps(value))
+                where_columns.append(key)
+                sql_params_list.append(_json_dumps(value))
+            elif key in generated_columns:
+                # 改写为带索引的生成列，避免全表扫描 (Rewrite to the indexed generated column to avoid a full scan)
+                where_columns.append(generated_columns[key][0])
+                sql_params_list.append(value)
             else:
-                where_clauses.append(f"`{key}` = %s")
+                where_columns.append(key)
                 sql_params_list.append(value)
 
-        where_sql = (
-            " AND ".join(where_clauses) if where_clauses else "1=1"
-        )  # 如果没有条件，则选择所有
-        sql = f"SELECT * FROM {table_name} WHERE {where_sql} {order_by_clause} LIMIT %s OFFSET %s"
+        def build() -> str:
+            select_sql = f"SELECT {self._columns_sql(columns)} FROM {table_name}"
+            if where_columns:
+                where_sql = " AND ".join(f"`{column}` = %s" for column in where_columns)
+                select_sql += f" WHERE {where_sql}"
+            # 无条件时不生成 WHERE 子句，与 get_all 的语句相同 (No conditions means no WHERE clause, matching get_all)
+            return f"{select_sql} {order_by_clause} LIMIT %s OFFSET %s"
+
+        sql = self._cached_sql(
+            ("query", entity_type, tuple(where_columns), columns), build
+        )
         sql_params_list.extend([limit, skip])
-        sql_params = tuple(sql_params_list)
+        async for record in self._stream_rows(sql, tuple(sql_params_list)):
+            yield record
 
-        async with self.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                try:
-                    await cur.execute(sql, sql_params)
-                    records = await cur.fetchall()
-                    deserialized_records = [
-                        self._deserialize_json_fields(entity_type, record)
-                        for record in records
-                    ]
-
-                    # 特殊处理题库内容返回结构 (Special handling for qb_content return structure)
-                    if (
-                        entity_type.startswith(QB_CONTENT_ENTITY_TYPE_PREFIX)
-                        and deserialized_records
-                    ):
-                        return [
-                            {
-                                "id": r["difficulty_id"],
-                                "questions": r.get("questions", []),
-                            }
-                            for r in deserialized_records
-                        ]
-                    return deserialized_records
-                except OperationalError as e:
-                    _mysql_repo_logger.error(
-                        f"执行 query (实体类型 (Entity Type): {entity_type}) 时出错 (Error): {e}",
-                        exc_info=True,
-                    )
-                    return []
+    async def _stream_rows(
+        self, sql: str, sql_params: tuple
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """辅助方法：通过服务器端游标执行 SELECT 并逐行产出原始行。固定连接空闲时直接使用它，
+        否则借用连接池的连接；读取期间该连接被标记为忙碌，迭代中发起的其他语句会改用连接池的连接。
+        (Helper: Runs a SELECT through a server-side cursor and yields raw rows one at a time. Uses the
+         pinned connection when it is idle, a pooled one otherwise; the connection is marked busy while
+         rows are read, so statements issued mid-iteration go to a pooled connection.)"""
+        async with self._connection() as conn:
+            # 关闭游标时会读完剩余的未缓冲行，连接归还连接池时处于干净状态
+            # (Closing the cursor drains any unread unbuffered rows, so the connection goes back to the pool clean)
+            async with conn.cursor(aiomysql.SSDictCursor) as cur:
+                await cur.execute(sql, sql_params)
+                async for record in cur:
+                    yield record
 
     async def get_all_entity_types(self) -> List[str]:
         """返回此存储库已知或预期管理的所有实体类型的列表 (基于定义的表常量)。
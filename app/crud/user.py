@@ -23,9 +23,10 @@ from ..core.config import settings  # 导入全局配置实例 (Import global se
 from ..core.interfaces import (
     IDataStorageRepository,
 )  # 导入数据存储库接口 (Import data storage repository interface)
-from ..core.security import (
-    get_password_hash,
-)  # 导入密码哈希工具 (Import password hashing utility)
+from ..core.security import (  # 导入密码哈希与Token清理工具 (Import password hashing and token cleanup utilities)
+    aget_password_hash,
+    cleanup_expired_tokens_periodically,
+)
 from ..models.user_models import (  # 用户相关的Pydantic模型 (User-related Pydantic models)
     AdminUserUpdate,
     UserCreate,
@@ -124,7 +125,7 @@ class UserCRUD:
                     f"将使用配置中提供的初始密码为用户 '{admin_uid}' 设置密码。 (Using initial password from config for user '{admin_uid}'.)"
                 )
 
-            hashed_password = get_password_hash(initial_password)
+            hashed_password = await aget_password_hash(initial_password)
             admin_user_data_dict = UserInDB(
                 uid=admin_uid,
                 hashed_password=hashed_password,
@@ -178,7 +179,7 @@ class UserCRUD:
             )
             return None
 
-        hashed_password = get_password_hash(user_create_data.password)
+        hashed_password = await aget_password_hash(user_create_data.password)
         new_user_data_for_db = user_create_data.model_dump(exclude={"password"})
         new_user_data_for_db.update(
             {
@@ -305,7 +306,7 @@ class UserCRUD:
             "new_password" in update_payload_dict
             and update_payload_dict["new_password"]
         ):  # 如果提供了新密码
-            update_payload_dict["hashed_password"] = get_password_hash(
+            update_payload_dict["hashed_password"] = await aget_password_hash(
                 update_payload_dict["new_password"]
             )
         update_payload_dict.pop("new_password", None)  # 移除明文密码字段
@@ -344,18 +345,11 @@ class UserCRUD:
         (Cleans up all expired user access tokens from memory (or configured token storage).
         This method should be called periodically by a background task.)
         """
-        # 注意：当前的Token管理在 app.core.security 模块中，是内存方案。
-        # 如果UserCRUD需要直接参与Token清理（例如，如果Token存储在与用户数据相同的DB中），
-        # 则需要将Token管理逻辑移至此处或提供接口。
-        # 目前，此方法是一个占位符，实际清理逻辑在 security.py 的 cleanup_expired_tokens_periodically。
-        # 如果未来Token存储与用户数据紧密相关，则此方法应实现具体逻辑。
-        _user_crud_logger.debug(
-            "UserCRUD.cleanup_expired_tokens 被调用，但当前Token清理由 app.core.security 处理。 (UserCRUD.cleanup_expired_tokens called, but current token cleanup is handled by app.core.security.)"
-        )
-        # 调用 security 模块的清理函数 (如果需要 UserCRUD 主动触发)
-        # from ..core.security import cleanup_expired_tokens_periodically as security_cleanup
-        # await security_cleanup()
-        pass
+        # Token管理在 app.core.security 模块中，此处委托给其清理函数；
+        # 该函数分批处理并在批次之间让出事件循环，配置外部Token存储时为空操作。
+        # (Token management lives in app.core.security; this delegates to its cleanup, which works in
+        #  batches yielding to the event loop and is a no-op when an external token store is configured.)
+        await cleanup_expired_tokens_periodically()
 
 
 # endregion
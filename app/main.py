@@ -16,8 +16,9 @@ FastAPI 应用主入口文件。
 import asyncio
 import logging  # 用于配置应用级日志
 import os
+from contextlib import AbstractAsyncContextManager
 from datetime import datetime  # For export filename timestamp
-from typing import Any, Dict, List, Optional  # 确保导入 Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional  # 确保导入 Dict, Any
 from uuid import UUID
 
 import uvicorn
@@ -33,6 +34,8 @@ from fastapi import (
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
 
+from . import crud as crud_package  # 用于在请求时读取已初始化的存储库实例
+
 # --- 路由模块导入 ---
 from .admin_routes import admin_router  # 管理员接口路由
 
@@ -44,8 +47,12 @@ from .core.config import (  # 全局配置和枚举
 from .core.rate_limiter import is_rate_limited  # 速率限制检查函数
 from .core.security import (  # 安全和认证相关
     UserTag,  # 用户标签枚举
+    close_token_store,
+    configure_token_store,
     create_access_token,
     get_current_active_user_uid,  # 依赖注入函数，获取当前活跃用户UID
+    get_request_token,  # 依赖注入函数，按请求头优先的规则取出原始Token
+    tune_bcrypt_rounds,
 )
 
 # --- CRUD 操作模块实例 ---
@@ -184,6 +191,26 @@ async def startup_event():
     await initialize_crud_instances()
     app_logger.info("CRUD实例和存储库已成功初始化。")
 
+    # 按配置启用外部Token存储 (默认使用进程内存)
+    if settings.token_storage_type == "redis":
+        # 延迟导入，仅在启用时加载 aioredis
+        from .core.token_store import RedisTokenStore
+
+        token_store = RedisTokenStore(
+            redis_url=settings.REDIS_URL,
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD,
+        )
+        await token_store.connect()
+        configure_token_store(token_store)
+        app_logger.info("Token存储已切换为 Redis。")
+
+    # 按本机CPU调整 bcrypt 轮数，除非已显式固定 (CPU密集，放到线程中执行以免阻塞事件循环)
+    if settings.bcrypt_rounds is None and settings.bcrypt_target_ms > 0:
+        await asyncio.to_thread(tune_bcrypt_rounds, settings.bcrypt_target_ms)
+
     # 启动后台周期性任务
     asyncio.create_task(main_periodic_tasks())
     app_logger.info("后台周期性任务已启动。")
@@ -221,6 +248,11 @@ async def shutdown_event():
             "Repository实例未初始化，无法执行标准的数据持久化或断开连接操作。"
         )
 
+    try:
+        await close_token_store()
+    except Exception as e_token_store:
+        app_logger.error(f"关闭时断开Token存储连接失败: {e_token_store}", exc_info=True)
+
     app_logger.info("应用关闭任务完成。")
 
 
@@ -239,6 +271,22 @@ app.add_middleware(
     allow_methods=["*"],  # 允许所有HTTP方法
     allow_headers=["*"],  # 允许所有HTTP请求头
 )
+
+
+async def pin_repository_connection() -> AsyncIterator[None]:
+    """
+    FastAPI 依赖项：若存储库支持 `async with` (如 MySQL)，则在所挂载的接口内固定一个连接，
+    使该接口的多次数据库调用复用同一连接。只挂载在以数据库操作为主的路由上；
+    登录等含有耗时非数据库等待 (如 bcrypt) 的接口不使用它，以免长时间占住连接池的连接。
+    """
+    repository = crud_package.repository_instance
+    if not isinstance(repository, AbstractAsyncContextManager):
+        yield
+        return
+    async with repository:
+        yield
+
+
 # endregion
 
 # region 用户认证 API 端点
@@ -356,10 +404,10 @@ async def login_for_access_token(payload: UserCreate, request: Request):
             detail="登录请求过于频繁，请稍后再试。",
         )
 
-    from .core.security import verify_password
+    from .core.security import averify_password
 
     user = await user_crud_instance.get_user_by_uid(payload.uid)
-    if not user or not verify_password(payload.password, user.hashed_password):
+    if not user or not await averify_password(payload.password, user.hashed_password):
         app_logger.warning(
             f"用户 '{payload.uid}' 登录失败：用户名或密码错误 (IP: {client_ip})。"
         )
@@ -390,7 +438,7 @@ async def login_for_access_token(payload: UserCreate, request: Request):
 
 
 @auth_router.get(
-    "/login",  # 路径: GET /auth/login?token={old_token}
+    "/login",  # 路径: GET /auth/login (Token 通过 X-Auth-Token 请求头提供)
     response_model=Token,
     summary="刷新访问令牌",
     description="使用一个有效的旧访问令牌获取一个新的访问令牌。成功后，旧令牌将失效。",
@@ -399,14 +447,13 @@ async def login_for_access_token(payload: UserCreate, request: Request):
     },
 )
 async def refresh_access_token(
-    token_to_refresh: str = Query(
-        ..., alias="token", description="待刷新的有效旧访问令牌"
-    ),
+    token_to_refresh: str = Depends(get_request_token),
 ):
     """
     刷新访问令牌接口。
 
-    通过查询参数 `token` 接收一个有效的旧访问令牌。
+    通过 `X-Auth-Token` 请求头接收一个有效的旧访问令牌
+    (仅在 `allow_query_token` 开启时才接受查询参数 `token`)。
     如果旧令牌有效，系统将使其失效，并签发一个新的访问令牌。
 
     - **成功**: 返回 `200 OK` 状态码及新的 `Token` 对象。
@@ -420,7 +467,8 @@ async def refresh_access_token(
     user_info = await validate_token_and_get_user_info(token_to_refresh)
     if not user_info:
         app_logger.warning(
-            f"刷新令牌失败：提供的旧令牌无效或已过期 (部分令牌: {token_to_refresh[:8]}...)"
+            "刷新令牌失败：提供的旧令牌无效或已过期 (部分令牌: %s...)",
+            token_to_refresh[:8],
         )
         raise HTTPException(
             status_code=http_status.HTTP_401_UNAUTHORIZED,
@@ -433,7 +481,9 @@ async def refresh_access_token(
     )  # 创建新Token
 
     app_logger.info(
-        f"用户 '{user_info['user_uid']}' 的Token (部分旧Token: {token_to_refresh[:8]}...) 已成功刷新。"
+        "用户 '%s' 的Token (部分旧Token: %s...) 已成功刷新。",
+        user_info["user_uid"],
+        token_to_refresh[:8],
     )
     return Token(access_token=new_token_str)
 
@@ -562,7 +612,7 @@ async def update_users_me_password(
     - **失败 (请求体验证问题)**: 返回 `422 Unprocessable Entity`。
     - **失败 (服务器内部错误)**: 返回 `500 Internal Server Error`。
     """
-    from .core.security import get_password_hash, verify_password
+    from .core.security import aget_password_hash, averify_password
 
     user_in_db = await user_crud_instance.get_user_by_uid(current_user_uid)
     if not user_in_db:  # 理论上不应发生
@@ -571,7 +621,9 @@ async def update_users_me_password(
         )
 
     # 验证当前密码是否正确
-    if not verify_password(password_data.current_password, user_in_db.hashed_password):
+    if not await averify_password(
+        password_data.current_password, user_in_db.hashed_password
+    ):
         app_logger.warning(f"用户 '{current_user_uid}' 修改密码失败：当前密码不正确。")
         raise HTTPException(
             status_code=http_status.HTTP_400_BAD_REQUEST,
@@ -579,7 +631,7 @@ async def update_users_me_password(
         )
 
     # 对新密码进行哈希处理并更新到数据库
-    new_hashed_password = get_password_hash(password_data.new_password)
+    new_hashed_password = await aget_password_hash(password_data.new_password)
     success = await user_crud_instance.update_user_password(
         current_user_uid, new_hashed_password
     )
@@ -600,7 +652,10 @@ app.include_router(user_profile_router)  # 挂载用户个人资料路由
 
 # region 核心答题 API 端点
 exam_router = APIRouter(
-    dependencies=[Depends(get_current_active_user_uid)],  # 所有接口都需要有效Token
+    dependencies=[
+        Depends(get_current_active_user_uid),  # 所有接口都需要有效Token
+        Depends(pin_repository_connection),  # 每个接口的数据库调用复用同一连接
+    ],
     tags=["核心答题 (Exam Taking)"],
 )
 
@@ -628,6 +683,7 @@ exam_router = APIRouter(
 async def request_new_exam_paper(
     request: Request,
     current_user_uid: str = Depends(get_current_active_user_uid),
+    request_token: str = Depends(get_request_token),
     difficulty: DifficultyLevel = Query(
         default=DifficultyLevel.hybrid,
         description="新试卷的难度级别 (例如: easy, hybrid, hard)",
@@ -651,9 +707,7 @@ async def request_new_exam_paper(
 
     # 检查用户标签，管理员不受速率限制
     # 需要重新从Token获取用户信息以检查标签，因为依赖注入的UID不包含标签信息
-    user_info = await validate_token_and_get_user_info(
-        request.query_params.get("token", "")  # 从请求参数中获取Token
-    )
+    user_info = await validate_token_and_get_user_info(request_token)
     user_tags = user_info.get("tags", []) if user_info else []
 
     if UserTag.ADMIN not in user_tags:  # 如果用户不是管理员
@@ -55,11 +55,13 @@ class TokenData(BaseModel):
     """
     Token内部存储或解析后承载的数据模型。
     如果使用JWT，这可以代表JWT的载荷 (payload) 部分。
-    对于当前基于内存字典的简单Token方案，这是存储在 `_active_tokens` 中的值结构。
+    它描述外部Token存储（如Redis）中每个Token记录的字段；进程内存存储 `_active_tokens`
+    出于内存考虑使用带 `__slots__` 的 `app.core.security._TokenEntry`，其过期时间基于单调时钟。
     (Data model carried by a token when stored internally or after parsing.
     If using JWT, this can represent the payload part of the JWT.
-    For the current simple token scheme based on an in-memory dictionary, this is
-    the structure of the value stored in `_active_tokens`.)
+    It describes the fields of each token record in an external token store (e.g. Redis); the
+    in-process store `_active_tokens` uses the slotted `app.core.security._TokenEntry` instead to save
+    memory, with expiry on the monotonic clock.)
     """
 
     user_uid: str = Field(
@@ -13,8 +13,8 @@ acquisition, data structure processing, and random string generation.)
 import datetime
 import ipaddress  # 用于处理和验证IP地址 (For processing and validating IP addresses)
 import logging
+import os  # 用于生成安全的随机字节 (For generating cryptographically strong random bytes)
 import random
-import secrets  # 用于生成安全的随机数 (For generating cryptographically strong random numbers)
 from typing import Any, Dict, List, Optional, Tuple, Union  # 类型提示 (Type hinting)
 from uuid import UUID  # 用于类型提示 (For type hinting)
 
@@ -262,12 +262,10 @@ def generate_random_hex_string_of_bytes(length_bytes: int) -> str:
         )
         raise ValueError("字节长度必须至少为1。 (Byte length must be at least 1.)")
 
-    random_bytes: bytes = secrets.token_bytes(
-        length_bytes
-    )  # 生成安全的随机字节 (Generate secure random bytes)
-    return (
-        random_bytes.hex()
-    )  # 将字节转换为小写十六进制字符串 (Convert bytes to lowercase hex string)
+    # 直接读取 os.urandom 并转十六进制，省去 secrets 的包装调用；两者熵源相同。
+    # (Read os.urandom directly and hex-encode it, skipping the secrets wrapper;
+    # both draw from the same entropy source.)
+    return os.urandom(length_bytes).hex()
 
 
 # endregion
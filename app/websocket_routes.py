@@ -54,8 +54,12 @@ async def websocket_exam_monitor(websocket: WebSocket):
      information (e.g., examinee submission events).)
 
     认证 (Authentication):
-        连接时需要在查询参数中提供有效的管理员Token (例如: `/ws/exam_monitor?token=YOUR_ADMIN_TOKEN`)。
-        (A valid admin token must be provided as a query parameter upon connection
+        连接时需要在 `X-Auth-Token` 请求头中提供有效的管理员Token，与 HTTP 接口规则一致
+        (由 `_resolve_request_token` 处理)。无法设置请求头的客户端仅在 `allow_query_token` 开启时
+        可改用查询参数 (例如: `/ws/exam_monitor?token=YOUR_ADMIN_TOKEN`)。
+        (A valid admin token must be provided in the `X-Auth-Token` header upon connection, under the
+         same rules as the HTTP endpoints (handled by `_resolve_request_token`). Clients that cannot set
+         headers may use the query parameter instead only while `allow_query_token` is enabled
          (e.g., `/ws/exam_monitor?token=YOUR_ADMIN_TOKEN`).)
     """
     # 实际的管理员身份验证已由 `Depends(require_admin)` 在 APIRouter 级别（尝试）处理。
@@ -4,32 +4,63 @@ app.core.security 模块的单元测试。
 (Unit tests for the app.core.security module.)
 """
 
+import asyncio
+import heapq
 import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 
 import pytest
 from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette.requests import HTTPConnection
 
 from app.core.config import settings  # 需要settings来获取token有效期等配置
+from app.core.interfaces import ITokenStore
 
 # 被测试模块的导入 (Imports from the module under test)
 from app.core.security import (
+    _BULK_EVICT_MIN_COUNT,
+    _EXC_INVALID_TOKEN,
     RequireTags,
+    _rand_bytes,
+    _TokenEntry,
+    aget_password_hash,
+    auth_token_header,
+    averify_password,
+    cleanup_expired_tokens_periodically,
     create_access_token,
     get_all_active_token_info,
+    get_current_user_info_from_token,
     get_password_hash,
+    get_request_token,
     invalidate_all_tokens_for_user,
     invalidate_token,
+    tune_bcrypt_rounds,
     validate_token_and_get_user_info,
     verify_password,
 )
 from app.models.user_models import UserTag
 
+_NS = 1_000_000_000  # 每秒纳秒数，内存Token的过期时间使用单调时钟纳秒 (Nanoseconds per second)
+
 # (Need settings for token expiry config etc.)
 
 
 # region 密码工具函数测试 (Password Utility Function Tests)
 
 
+@pytest.fixture(autouse=True)
+def fast_bcrypt(mocker):
+    """测试中使用最低的 bcrypt 轮数 (4)，与 `bcrypt_rounds=4` 的测试配置一致，避免每次哈希耗时数百毫秒。"""
+    mocker.patch(
+        "app.core.security.pwd_context",
+        CryptContext(
+            schemes=["bcrypt"], deprecated="auto", bcrypt__ident="2b", bcrypt__rounds=4
+        ),
+    )
+
+
 def test_verify_password_correct():
     """测试 verify_password 函数能否正确验证匹配的密码。"""
     plain_password = "测试密码123!@#"
@@ -58,11 +89,38 @@ def test_get_password_hash_generates_valid_hash():
     hash1 = get_password_hash(password)
     hash2 = get_password_hash(password)
 
+    assert hash1.startswith("$2b$04$"), "未使用测试配置的 bcrypt 轮数。"
     assert verify_password(password, hash1) is True, "哈希1未能通过验证。"
     assert verify_password(password, hash2) is True, "哈希2未能通过验证。"
     assert hash1 != hash2, "同一密码生成的两个哈希值相同，盐值可能未生效。"
 
 
+@pytest.mark.asyncio
+async def test_async_password_helpers_round_trip():
+    """测试 aget_password_hash / averify_password 在线程池中执行并与同步版本结果一致。"""
+    password = "异步密码AsyncPassword1"
+    hashed = await aget_password_hash(password)
+
+    assert await averify_password(password, hashed) is True, (
+        "异步验证未能通过正确密码。"
+    )
+    assert await averify_password("wrong", hashed) is False, "异步验证通过了错误密码。"
+    assert verify_password(password, hashed) is True, "异步生成的哈希无法被同步验证。"
+
+
+def test_tune_bcrypt_rounds_never_goes_below_floor(mocker):
+    """测试 tune_bcrypt_rounds 在任何轮数都超出目标耗时时仍采用最低轮数，并更新 pwd_context。"""
+    tuned_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    mocker.patch("app.core.security.pwd_context", tuned_context)
+
+    chosen = tune_bcrypt_rounds(target_ms=0)
+
+    assert chosen == 10, "轮数低于安全下限。"
+    assert tuned_context.hash("密码").startswith("$2b$10$"), (
+        "pwd_context 未使用调整后的轮数。"
+    )
+
+
 # endregion
 
 # region Token 工具函数测试 (Token Utility Function Tests)
@@ -77,6 +135,8 @@ async def test_create_access_token_successful(mocker):
     # (Mock the global variable _active_tokens)
     mocked_active_tokens = {}
     mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocked_user_tokens = {}
+    mocker.patch("app.core.security._user_tokens", mocked_user_tokens)
 
     # _token_lock 是 asyncio.Lock，通常不需要模拟其行为，除非要测试并发细节
     # ( _token_lock is an asyncio.Lock, usually no need to mock its behavior unless testing concurrency details)
@@ -91,12 +151,37 @@ async def test_create_access_token_successful(mocker):
 
     assert token_str in mocked_active_tokens, "Token未添加到 _active_tokens。"
     token_data = mocked_active_tokens[token_str]
-    assert token_data["user_uid"] == user_uid, "存储的 user_uid 不正确。"
-    assert set(token_data["tags"]) == set([tag.value for tag in user_tags]), (
-        "存储的 tags 不正确。"
+    assert token_data.user_uid == user_uid, "存储的 user_uid 不正确。"
+    assert token_data.tags == frozenset(user_tags), "存储的 tags 不正确。"
+    assert token_data.expires_at_ns > time.monotonic_ns(), (
+        "Token的过期时间不正确（应在未来）。"
     )
-    assert "expires_at" in token_data, "Token数据中缺少 expires_at 字段。"
-    assert token_data["expires_at"] > time.time(), "Token的过期时间不正确（应在未来）。"
+    assert mocked_user_tokens == {user_uid: {token_str}}, "用户反向索引未记录新Token。"
+
+
+@pytest.mark.asyncio
+async def test_create_access_token_refuses_banned_user(mocker):
+    """测试 create_access_token 拒绝为被封禁用户签发Token。"""
+    mocked_active_tokens = {}
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await create_access_token("banned_user", [UserTag.USER, UserTag.BANNED])
+
+    assert exc_info.value.status_code == 403, "封禁用户应收到403。"
+    assert mocked_active_tokens == {}, "不应为被封禁用户存储Token。"
+
+
+def test_rand_bytes_refills_buffer_without_reuse(mocker):
+    """测试 _rand_bytes 在缓冲区耗尽时重新填充，且不会重复分发已使用的字节。"""
+    mocker.patch("app.core.security._RAND_BUFFER_SIZE", 48)
+    mocker.patch("app.core.security._rand_buf", bytearray())
+    mocker.patch("app.core.security._rand_pos", 0)
+
+    chunks = [_rand_bytes(32) for _ in range(4)]  # 每次都会跨越48字节的缓冲区边界
+
+    assert all(len(chunk) == 32 for chunk in chunks), "返回的字节数不正确。"
+    assert len(set(chunks)) == len(chunks), "随机字节块出现重复。"
 
 
 @pytest.mark.asyncio
@@ -104,15 +189,14 @@ async def test_validate_token_and_get_user_info_valid_token(mocker):
     """测试 validate_token_and_get_user_info 对有效Token的验证。"""
     user_uid = "valid_user"
     user_tags_enum = [UserTag.USER]
-    user_tags_value = [tag.value for tag in user_tags_enum]
     valid_token = "valid_token_string_example"
 
     mocked_active_tokens = {
-        valid_token: {
-            "user_uid": user_uid,
-            "tags": user_tags_value,
-            "expires_at": time.time() + settings.token_expiry_hours * 3600,
-        }
+        valid_token: _TokenEntry(
+            user_uid,
+            frozenset(user_tags_enum),
+            time.monotonic_ns() + settings.token_expiry_hours * 3600 * _NS,
+        )
     }
     mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
 
@@ -120,7 +204,30 @@ async def test_validate_token_and_get_user_info_valid_token(mocker):
 
     assert user_info is not None, "有效Token未能通过验证。"
     assert user_info["user_uid"] == user_uid, "返回的 user_uid 不正确。"
-    assert set(user_info["tags"]) == set(user_tags_enum), "返回的 tags 不正确。"
+    assert user_info["tags"] == frozenset(user_tags_enum), "返回的 tags 不正确。"
+
+
+@pytest.mark.asyncio
+async def test_validate_token_does_not_wait_for_token_lock(mocker):
+    """测试 validate_token_and_get_user_info 不获取 _token_lock，写操作持锁时验证仍可完成。"""
+    token = "lock_free_token"
+    mocked_active_tokens = {
+        token: _TokenEntry(
+            "lock_free_user",
+            frozenset({UserTag.USER}),
+            time.monotonic_ns() + 3600 * _NS,
+        )
+    }
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocked_lock = asyncio.Lock()
+    mocker.patch("app.core.security._token_lock", mocked_lock)
+
+    async with mocked_lock:
+        user_info = await asyncio.wait_for(
+            validate_token_and_get_user_info(token), timeout=1
+        )
+
+    assert user_info is not None and user_info["user_uid"] == "lock_free_user"
 
 
 @pytest.mark.asyncio
@@ -142,11 +249,9 @@ async def test_validate_token_and_get_user_info_expired_token(mocker):
     expired_token = "token_that_has_expired"
 
     mocked_active_tokens = {
-        expired_token: {
-            "user_uid": user_uid,
-            "tags": [UserTag.USER.value],
-            "expires_at": time.time() - 3600,  # 1小时前过期 (Expired 1 hour ago)
-        }
+        expired_token: _TokenEntry(
+            user_uid, frozenset({UserTag.USER}), time.monotonic_ns() - 3600 * _NS
+        ),  # 1小时前过期 (Expired 1 hour ago)
     }
     mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
 
@@ -163,19 +268,187 @@ async def test_invalidate_token_removes_token(mocker):
     """测试 invalidate_token 是否能成功移除Token。"""
     token_to_invalidate = "token_to_be_invalidated_soon"
     mocked_active_tokens = {
-        token_to_invalidate: {
-            "user_uid": "some_user",
-            "tags": [UserTag.USER.value],
-            "expires_at": time.time() + 3600,
-        }
+        token_to_invalidate: _TokenEntry(
+            "some_user", frozenset({UserTag.USER}), time.monotonic_ns() + 3600 * _NS
+        )
     }
     mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocked_user_tokens = {"some_user": {token_to_invalidate}}
+    mocker.patch("app.core.security._user_tokens", mocked_user_tokens)
 
     await invalidate_token(token_to_invalidate)
 
     assert token_to_invalidate not in mocked_active_tokens, (
         "invalidate_token 未能移除Token。"
     )
+    assert mocked_user_tokens == {}, "反向索引中仍残留已失效的Token。"
+
+
+@pytest.mark.asyncio
+async def test_cleanup_expired_tokens_pops_only_expired_heap_entries(mocker):
+    """测试 cleanup_expired_tokens_periodically 只清理堆顶已过期的Token，并丢弃陈旧条目。"""
+    now = time.monotonic_ns()
+    mocked_active_tokens = {
+        "expired_token": _TokenEntry("u1", frozenset(), now - 10 * _NS),
+        "live_token": _TokenEntry("u2", frozenset(), now + 3600 * _NS),
+    }
+    mocked_heap = [
+        (now - 20 * _NS, "already_invalidated_token"),  # 已被主动失效，仅剩陈旧堆条目
+        (now - 10 * _NS, "expired_token"),
+        (now + 3600 * _NS, "live_token"),
+    ]
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocker.patch("app.core.security._expiry_heap", mocked_heap)
+
+    await cleanup_expired_tokens_periodically()
+
+    assert "expired_token" not in mocked_active_tokens, "过期Token未被清理。"
+    assert "live_token" in mocked_active_tokens, "未过期Token被错误清理。"
+    assert mocked_heap == [(now + 3600 * _NS, "live_token")], "堆中仍残留已过期条目。"
+
+
+@pytest.mark.asyncio
+async def test_cleanup_expired_tokens_rebuilds_on_mass_expiry(mocker):
+    """测试大量Token同时过期时，cleanup_expired_tokens_periodically 整体重建Token表和堆。"""
+    now = time.monotonic_ns()
+    expired_total = _BULK_EVICT_MIN_COUNT * 2
+    mocked_active_tokens = {
+        f"expired_{i}": _TokenEntry("u1", frozenset(), now - 10 * _NS)
+        for i in range(expired_total)
+    }
+    mocked_active_tokens["live_token"] = _TokenEntry(
+        "u2", frozenset(), now + 3600 * _NS
+    )
+    mocked_heap = [
+        (entry.expires_at_ns, token) for token, entry in mocked_active_tokens.items()
+    ]
+    mocked_heap.append((now - 20 * _NS, "already_invalidated_token"))
+    heapq.heapify(mocked_heap)
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocker.patch("app.core.security._expiry_heap", mocked_heap)
+
+    await cleanup_expired_tokens_periodically()
+
+    assert list(mocked_active_tokens) == ["live_token"], "过期Token未被全部清理。"
+    assert mocked_heap == [(now + 3600 * _NS, "live_token")], "重建后的堆内容不正确。"
+
+
+@pytest.mark.asyncio
+async def test_cleanup_expired_tokens_mass_expiry_batches_logs_and_keeps_new_tokens(
+    mocker,
+):
+    """测试大批过期时分批重建：逐条记录被清理的Token，且重建期间新建的Token保留在堆中。"""
+    now = time.monotonic_ns()
+    expired_total = _BULK_EVICT_MIN_COUNT * 2
+    mocked_active_tokens = {
+        f"expired_{i:03d}": _TokenEntry("u1", frozenset(), now - 10 * _NS)
+        for i in range(expired_total)
+    }
+    mocked_heap = [
+        (entry.expires_at_ns, token) for token, entry in mocked_active_tokens.items()
+    ]
+    heapq.heapify(mocked_heap)
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocker.patch("app.core.security._expiry_heap", mocked_heap)
+    mocker.patch("app.core.security._user_tokens", {})
+    mocker.patch("app.core.security._CLEANUP_CHUNK_SIZE", 100)
+    mocked_logger = mocker.patch("app.core.security._security_module_logger")
+    mocked_logger.isEnabledFor.return_value = True
+
+    real_sleep = asyncio.sleep
+    created_tokens = []
+
+    async def sleep_and_create(delay):
+        if not created_tokens:  # 在第一次让出时模拟并发登录 (Simulate a concurrent login at the first yield)
+            created_tokens.append(await create_access_token("u3", [UserTag.USER]))
+        await real_sleep(delay)
+
+    mocker.patch("app.core.security.asyncio.sleep", side_effect=sleep_and_create)
+
+    await cleanup_expired_tokens_periodically()
+
+    assert list(mocked_active_tokens) == created_tokens, "过期Token未被全部清理。"
+    assert [token for _, token in mocked_heap] == created_tokens, (
+        "重建期间新建的Token应出现在新堆中。"
+    )
+    cleaned_log_calls = [
+        call
+        for call in mocked_logger.info.call_args_list
+        if call.args[0].startswith("后台任务：清理过期Token")
+    ]
+    assert len(cleaned_log_calls) == expired_total, (
+        "每个被清理的过期Token都应记录日志。"
+    )
+
+
+@pytest.mark.asyncio
+async def test_cleanup_expired_tokens_compacts_stale_heap_entries(mocker):
+    """测试提前失效留下的陈旧堆条目过多时，cleanup_expired_tokens_periodically 会压缩堆。"""
+    now = time.monotonic_ns()
+    mocked_active_tokens = {
+        "live_token": _TokenEntry("u1", frozenset(), now + 3600 * _NS)
+    }
+    mocked_heap = [
+        (now + 3600 * _NS + i, f"logged_out_{i}")
+        for i in range(_BULK_EVICT_MIN_COUNT + 8)
+    ]
+    mocked_heap.append((now + 3600 * _NS, "live_token"))
+    heapq.heapify(mocked_heap)
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocker.patch("app.core.security._expiry_heap", mocked_heap)
+
+    await cleanup_expired_tokens_periodically()
+
+    assert "live_token" in mocked_active_tokens, "未过期Token被错误清理。"
+    assert mocked_heap == [(now + 3600 * _NS, "live_token")], "陈旧堆条目未被压缩。"
+
+
+@pytest.mark.asyncio
+async def test_cleanup_expired_tokens_yields_between_batches(mocker):
+    """测试 cleanup_expired_tokens_periodically 分批清理，并在批次之间让出事件循环。"""
+    now = time.monotonic_ns()
+    mocked_active_tokens = {
+        f"expired_{i}": _TokenEntry("u1", frozenset(), now - 10 * _NS) for i in range(5)
+    }
+    mocked_heap = [(now - 10 * _NS, token) for token in mocked_active_tokens]
+    heapq.heapify(mocked_heap)
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocker.patch("app.core.security._expiry_heap", mocked_heap)
+    mocker.patch("app.core.security._CLEANUP_CHUNK_SIZE", 2)
+    sleep_spy = mocker.spy(asyncio, "sleep")
+
+    await cleanup_expired_tokens_periodically()
+
+    assert mocked_active_tokens == {}, "过期Token未被全部清理。"
+    assert sleep_spy.call_count == 2, "5个条目按每批2个处理，应在批次之间让出2次。"
+
+
+@pytest.mark.asyncio
+async def test_cleanup_expired_tokens_logs_outside_token_lock(mocker):
+    """测试 cleanup_expired_tokens_periodically 在释放 _token_lock 之后才输出逐条日志。"""
+    now = time.monotonic_ns()
+    mocked_active_tokens = {
+        f"expired_{i}": _TokenEntry("u1", frozenset(), now - 10 * _NS) for i in range(3)
+    }
+    mocked_heap = [(now - 10 * _NS, token) for token in mocked_active_tokens]
+    heapq.heapify(mocked_heap)
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocker.patch("app.core.security._expiry_heap", mocked_heap)
+    mocked_lock = asyncio.Lock()
+    mocker.patch("app.core.security._token_lock", mocked_lock)
+    lock_held_while_logging = []
+    mocked_logger = mocker.patch("app.core.security._security_module_logger")
+    mocked_logger.isEnabledFor.return_value = True
+    mocked_logger.info.side_effect = lambda *args: lock_held_while_logging.append(
+        mocked_lock.locked()
+    )
+
+    await cleanup_expired_tokens_periodically()
+
+    assert mocked_active_tokens == {}, "过期Token未被全部清理。"
+    assert lock_held_while_logging and not any(lock_held_while_logging), (
+        "日志不应在持有 _token_lock 时输出。"
+    )
 
 
 @pytest.mark.asyncio
@@ -201,16 +474,23 @@ async def test_get_all_active_token_info_with_data(mocker):
         ],
     )
     expires_at1 = time.time() + 3600
-    expires_at2 = time.time() + 7200
+    expires_at1_iso = datetime.fromtimestamp(expires_at1, tz=timezone.utc).isoformat()
 
     mocked_active_tokens = {
-        token1: {"user_uid": uid1, "tags": tags1_val, "expires_at": expires_at1},
-        token2: {"user_uid": uid2, "tags": tags2_val, "expires_at": expires_at2},
-        "expired_token": {
-            "user_uid": "user3",
-            "tags": [],
-            "expires_at": time.time() - 100,
-        },  # 已过期
+        token1: _TokenEntry(
+            uid1,
+            frozenset(UserTag(v) for v in tags1_val),
+            time.monotonic_ns() + 3600 * _NS,
+            expires_at1_iso,
+        ),
+        token2: _TokenEntry(
+            uid2,
+            frozenset(UserTag(v) for v in tags2_val),
+            time.monotonic_ns() + 7200 * _NS,
+        ),
+        "expired_token": _TokenEntry(
+            "user3", frozenset(), time.monotonic_ns() - 100 * _NS
+        ),  # 已过期
     }
     mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
 
@@ -226,7 +506,9 @@ async def test_get_all_active_token_info_with_data(mocker):
     assert info1 is not None, f"未能找到用户 {uid1} 的Token信息。"
     assert info1["token_prefix"].startswith(token1[:8]), "Token前缀不匹配。"
     assert info1["tags"] == tags1_val, "用户1的标签不匹配。"
-    assert "expires_at" in info1, "缺少 expires_at 字段。"  # 具体时间转换已在函数内完成
+    assert info1["expires_at"] == expires_at1_iso, (
+        "expires_at 应为创建时预先格式化的ISO字符串。"
+    )
 
     assert info2 is not None, f"未能找到用户 {uid2} 的Token信息。"
     assert info2["token_prefix"].startswith(token2[:8]), "Token前缀不匹配。"
@@ -243,23 +525,22 @@ async def test_invalidate_all_tokens_for_user(mocker):
     token3_other = "other_user_token1"
 
     mocked_active_tokens = {
-        token1: {
-            "user_uid": user_to_logout,
-            "tags": [],
-            "expires_at": time.time() + 3600,
-        },
-        token2: {
-            "user_uid": user_to_logout,
-            "tags": [],
-            "expires_at": time.time() + 7200,
-        },
-        token3_other: {
-            "user_uid": other_user,
-            "tags": [],
-            "expires_at": time.time() + 3600,
-        },
+        token1: _TokenEntry(
+            user_to_logout, frozenset(), time.monotonic_ns() + 3600 * _NS
+        ),
+        token2: _TokenEntry(
+            user_to_logout, frozenset(), time.monotonic_ns() + 7200 * _NS
+        ),
+        token3_other: _TokenEntry(
+            other_user, frozenset(), time.monotonic_ns() + 3600 * _NS
+        ),
     }
     mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocked_user_tokens = {
+        user_to_logout: {token1, token2},
+        other_user: {token3_other},
+    }
+    mocker.patch("app.core.security._user_tokens", mocked_user_tokens)
 
     invalidated_count = await invalidate_all_tokens_for_user(user_to_logout)
 
@@ -267,19 +548,21 @@ async def test_invalidate_all_tokens_for_user(mocker):
     assert token1 not in mocked_active_tokens, f"{user_to_logout} 的 Token1 未被吊销。"
     assert token2 not in mocked_active_tokens, f"{user_to_logout} 的 Token2 未被吊销。"
     assert token3_other in mocked_active_tokens, f"{other_user} 的Token被错误吊销。"
+    assert mocked_user_tokens == {other_user: {token3_other}}, "反向索引未同步更新。"
 
 
 @pytest.mark.asyncio
 async def test_invalidate_all_tokens_for_user_no_tokens(mocker):
     """测试 invalidate_all_tokens_for_user 在用户没有活动Token时的行为。"""
     mocked_active_tokens = {
-        "some_other_token": {
-            "user_uid": "another_user",
-            "tags": [],
-            "expires_at": time.time() + 3600,
-        }
+        "some_other_token": _TokenEntry(
+            "another_user", frozenset(), time.monotonic_ns() + 3600 * _NS
+        )
     }
     mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    mocker.patch(
+        "app.core.security._user_tokens", {"another_user": {"some_other_token"}}
+    )
 
     invalidated_count = await invalidate_all_tokens_for_user("user_with_no_tokens")
 
@@ -287,6 +570,119 @@ async def test_invalidate_all_tokens_for_user_no_tokens(mocker):
     assert len(mocked_active_tokens) == 1, "活动Token列表被错误修改。"
 
 
+class _FakeTokenStore(ITokenStore):
+    """用于测试的外部Token存储替身。(In-memory stand-in for an external token store.)"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def add(self, token, user_uid, tags, expires_at):
+        self.data[token] = {
+            "user_uid": user_uid,
+            "tags": tags,
+            "expires_at": expires_at,
+        }
+
+    async def get(self, token):
+        return self.data.get(token)
+
+    async def remove(self, token):
+        return self.data.pop(token, None) is not None
+
+    async def remove_all_for_user(self, user_uid):
+        tokens = [t for t, d in self.data.items() if d["user_uid"] == user_uid]
+        for token in tokens:
+            del self.data[token]
+        return len(tokens)
+
+    async def list_all(self):
+        return list(self.data.items())
+
+
+@pytest.mark.asyncio
+async def test_token_functions_delegate_to_external_store(mocker):
+    """测试配置外部Token存储后，Token的签发、验证、列出与吊销都委托给该存储。"""
+    mocked_active_tokens = {}
+    mocker.patch("app.core.security._active_tokens", mocked_active_tokens)
+    store = _FakeTokenStore()
+    mocker.patch("app.core.security._token_store", store)
+
+    token = await create_access_token("store_user", [UserTag.USER])
+    assert token in store.data, "Token未写入外部存储。"
+    assert mocked_active_tokens == {}, "配置外部存储后不应写入内存存储。"
+
+    user_info = await validate_token_and_get_user_info(token)
+    assert user_info["user_uid"] == "store_user"
+    assert user_info["tags"] == frozenset({UserTag.USER})
+
+    tokens_info = await get_all_active_token_info()
+    assert [t["user_uid"] for t in tokens_info] == ["store_user"]
+
+    assert await invalidate_all_tokens_for_user("store_user") == 1
+    assert await validate_token_and_get_user_info(token) is None
+
+
+@pytest.mark.asyncio
+async def test_external_store_validation_is_cached_until_invalidated(mocker):
+    """测试外部存储的验证结果被缓存，重复验证不再访问存储，失效后缓存被清除。"""
+    store = _FakeTokenStore()
+    mocker.patch("app.core.security._token_store", store)
+    mocker.patch("app.core.security._validate_cache", OrderedDict())
+    token = await create_access_token("cached_user", [UserTag.USER])
+    get_spy = mocker.spy(store, "get")
+
+    first = await validate_token_and_get_user_info(token)
+    second = await validate_token_and_get_user_info(token)
+
+    assert (
+        first
+        == second
+        == {
+            "user_uid": "cached_user",
+            "tags": frozenset({UserTag.USER}),
+        }
+    )
+    assert get_spy.call_count == 1, "缓存命中时不应再访问外部存储。"
+
+    await invalidate_token(token)
+    assert await validate_token_and_get_user_info(token) is None, (
+        "失效后的Token仍从缓存中通过验证。"
+    )
+
+
+# endregion
+
+# region 认证依赖项测试 (Authentication Dependency Tests)
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_info_from_token_invalid_raises_shared_401(mocker):
+    """测试无效Token抛出预构建的401异常，且多次抛出不会累积回溯。"""
+    mocker.patch("app.core.security._active_tokens", {})
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user_info_from_token(token="no_such_token")
+        assert exc_info.value is _EXC_INVALID_TOKEN, "应抛出共享的异常实例。"
+        assert exc_info.value.status_code == 401
+        assert exc_info.value.headers == {
+            "WWW-Authenticate": 'ApiKey header="X-Auth-Token"'
+        }
+
+    tb_depth = 0
+    tb = exc_info.value.__traceback__
+    while tb is not None:
+        tb_depth += 1
+        tb = tb.tb_next
+    assert tb_depth <= 3, "共享异常实例的回溯在多次抛出后持续增长。"
+
+
 # endregion
 
 # region RequireTags 依赖项测试 (RequireTags Dependency Tests)
@@ -305,11 +701,11 @@ async def test_require_tags_success():
         "tags": [UserTag.ADMIN, UserTag.MANAGER, UserTag.USER],
     }
 
-    # 直接调用 __call__ 方法进行测试
+    # 直接调用 check 方法进行测试
     # (Directly call __call__ method for testing)
     # 注意: Depends() 本身不会在这里被执行，我们模拟的是它解析后的行为
     # (Note: Depends() itself won't be executed here; we simulate its resolved behavior)
-    result_user_info = await checker(user_info=mock_user_info)
+    result_user_info = checker.check(mock_user_info)
 
     assert result_user_info == mock_user_info, "RequireTags 成功时不应修改用户信息。"
 
@@ -330,12 +726,41 @@ async def test_require_tags_failure_missing_tags():
     }
 
     with pytest.raises(HTTPException) as exc_info:
-        await checker(user_info=mock_user_info_missing_manager)
+        checker.check(mock_user_info_missing_manager)
 
     assert exc_info.value.status_code == 403, "权限不足时状态码应为403。"
     assert "权限不足" in exc_info.value.detail, "权限不足时的错误详情信息不正确。"
 
 
+@pytest.mark.asyncio
+async def test_require_tags_caches_decision_per_tag_set():
+    """测试 RequireTags 对同一标签集合只执行一次子集检查，且拒绝结果同样被缓存。"""
+    checker = RequireTags({UserTag.ADMIN, UserTag.MANAGER})
+    admin_tags = [UserTag.ADMIN, UserTag.MANAGER, UserTag.USER]
+    admin_info = {
+        "user_uid": "admin_a",
+        "tags": frozenset(admin_tags),
+    }
+    other_admin_info = {
+        "user_uid": "admin_b",
+        "tags": frozenset(admin_tags),
+    }
+    plain_info = {
+        "user_uid": "plain_user",
+        "tags": [UserTag.ADMIN, UserTag.USER],
+    }  # 标签不是 frozenset 时回退
+
+    assert checker.check(admin_info) == admin_info
+    assert checker.check(other_admin_info) == other_admin_info
+    assert len(checker._decision_cache) == 1, "相同标签集合应共享同一条缓存。"
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            checker.check(plain_info)
+        assert exc_info.value.status_code == 403
+    assert len(checker._decision_cache) == 2, "拒绝结果也应被缓存。"
+
+
 @pytest.mark.asyncio
 async def test_require_tags_empty_required_succeeds_for_any_user():
     """测试 RequireTags 在没有指定必需标签时允许任何已认证用户通过。"""
@@ -343,8 +768,105 @@ async def test_require_tags_empty_required_succeeds_for_any_user():
 
     mock_user_info_basic = {"user_uid": "test_basic_user", "tags": [UserTag.USER]}
 
-    result_user_info = await checker(user_info=mock_user_info_basic)
+    result_user_info = checker.check(mock_user_info_basic)
     assert result_user_info == mock_user_info_basic, "空必需标签集合应允许用户通过。"
 
 
+@pytest.mark.asyncio
+async def test_require_tags_single_tag_skips_decision_cache():
+    """测试只要求单个标签时直接做成员检查，不写入判定缓存。"""
+    checker = RequireTags({UserTag.ADMIN})
+    admin_info = {
+        "user_uid": "single_admin",
+        "tags": frozenset({UserTag.ADMIN}),
+    }
+    user_info = {
+        "user_uid": "single_user",
+        "tags": frozenset({UserTag.USER}),
+    }
+
+    assert checker.check(admin_info) == admin_info
+    with pytest.raises(HTTPException) as exc_info:
+        checker.check(user_info)
+    assert exc_info.value.status_code == 403
+    assert len(checker._decision_cache) == 0, "单标签检查不应使用判定缓存。"
+
+    # 非 frozenset 的标签容器同样直接做成员检查 (Non-frozenset tag containers are tested directly too)
+    list_info = {"user_uid": "single_list_admin", "tags": [UserTag.ADMIN]}
+    assert checker.check(list_info) is list_info
+    assert list_info["tags"] == [UserTag.ADMIN], "单标签检查不应改写用户信息中的标签。"
+
+
+@pytest.mark.asyncio
+async def test_require_tags_call_validates_token_in_one_dependency(mocker):
+    """测试 RequireTags 作为依赖项直接接收Token，在同一次调用中完成验证与标签检查。"""
+    admin_info = {
+        "user_uid": "fused_admin",
+        "tags": frozenset({UserTag.ADMIN}),
+    }
+    mocker.patch(
+        "app.core.security.validate_token_and_get_user_info",
+        side_effect=lambda token: admin_info if token == "good_token" else None,
+    )
+    checker = RequireTags({UserTag.ADMIN})
+
+    assert await checker(token="good_token") == admin_info
+    with pytest.raises(HTTPException) as exc_info:
+        await checker(token="bad_token")
+    assert exc_info.value.status_code == 401
+    with pytest.raises(HTTPException) as exc_info:
+        await RequireTags({UserTag.MANAGER})(token="good_token")
+    assert exc_info.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_token_header_preferred_and_query_fallback_configurable(mocker):
+    """测试依赖项优先读取 X-Auth-Token 请求头，查询参数仅在 allow_query_token 开启时被接受。"""
+    user_info = {"user_uid": "header_user", "tags": frozenset({UserTag.USER})}
+    mocker.patch(
+        "app.core.security.validate_token_and_get_user_info",
+        side_effect=lambda token: user_info if token == "good_token" else None,
+    )
+
+    assert (
+        await get_current_user_info_from_token(
+            header_token="good_token", token="bad_token"
+        )
+        == user_info
+    ), "请求头中的Token应优先于查询参数。"
+    assert await get_current_user_info_from_token(token="good_token") == user_info
+
+    mocker.patch.object(settings, "allow_query_token", False)
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user_info_from_token(token="good_token")
+    assert exc_info.value.status_code == 401, "关闭兼容模式后不应接受查询参数Token。"
+    assert await RequireTags({UserTag.USER})(header_token="good_token") == user_info
+    with pytest.raises(HTTPException) as exc_info:
+        await RequireTags({UserTag.USER})()
+    assert exc_info.value.status_code == 401, "缺少Token时应返回401。"
+
+
+@pytest.mark.asyncio
+async def test_get_request_token_follows_header_and_query_rules(mocker):
+    """测试 get_request_token 与认证依赖项使用相同的请求头/查询参数规则，且安全方案可用于 WebSocket 连接。"""
+    assert await get_request_token(header_token="h", token="q") == "h"
+    assert await get_request_token(token="q") == "q"
+
+    mocker.patch.object(settings, "allow_query_token", False)
+    with pytest.raises(HTTPException) as exc_info:
+        await get_request_token(token="q")
+    assert exc_info.value.status_code == 401, (
+        "关闭兼容模式后刷新接口也不应接受查询参数Token。"
+    )
+
+    ws_conn = HTTPConnection(
+        {"type": "websocket", "headers": [(b"x-auth-token", b"ws_token")]}
+    )
+    assert await auth_token_header(ws_conn) == "ws_token"
+    assert (
+        await auth_token_header(HTTPConnection({"type": "websocket", "headers": []}))
+        is None
+    )
+
+
 # endregion
@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import json
+import time
 from pathlib import Path
 from typing import Any, Dict, List
 import pytest
 import copy
 
-from app.crud.json_repository import JsonStorageRepository, COMMON_ID_FIELDS
+from app.crud.json_repository import JsonStorageRepository, JsonlStorageRepository, COMMON_ID_FIELDS
 
 # Define a common entity type for testing
 TEST_ENTITY_TYPE = "widgets"
@@ -215,50 +216,54 @@ async def test_get_by_id_success(initialized_repo: JsonStorageRepository):
     assert found_entity_std["data"] == "standard find"
 
 @pytest.mark.asyncio
-async def test_get_by_id_non_indexed_field_fallback(
-    temp_data_dir: Path, file_paths_config: Dict[str, Path]
-):
-    # This test needs a repo instance where TEST_ENTITY_ID_FIELD is NOT in COMMON_ID_FIELDS during instantiation
-    # to test the linear scan fallback.
-    original_common_id_fields = copy.deepcopy(COMMON_ID_FIELDS)
-    # Ensure TEST_ENTITY_ID_FIELD is not in COMMON_ID_FIELDS for this specific repo instance
-    if TEST_ENTITY_ID_FIELD in COMMON_ID_FIELDS:
-        COMMON_ID_FIELDS.remove(TEST_ENTITY_ID_FIELD)
+async def test_primary_id_field_is_cached_per_entity_type(initialized_repo: JsonStorageRepository):
+    repo = initialized_repo
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "primary_1", ALTERNATIVE_ID_FIELD: "alias_1"})
 
-    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
-    await repo.init_storage_if_needed(TEST_ENTITY_TYPE)
+    assert repo._primary_id_field[TEST_ENTITY_TYPE] == TEST_ENTITY_ID_FIELD
+    # Lookups by a secondary ID field still resolve through its own index
+    assert (await repo.get_by_id(TEST_ENTITY_TYPE, "alias_1"))[TEST_ENTITY_ID_FIELD] == "primary_1"
 
-    entity_data = {TEST_ENTITY_ID_FIELD: "widget_linear_scan", "data": "found by scan"}
-    await repo.create(TEST_ENTITY_TYPE, entity_data) # create will still work
+    repo.in_memory_data[TEST_ENTITY_TYPE] = []
+    repo._build_id_indexes(TEST_ENTITY_TYPE)
+    assert TEST_ENTITY_TYPE not in repo._primary_id_field  # Re-detected from the next record
 
-    # Since TEST_ENTITY_ID_FIELD was not in COMMON_ID_FIELDS at repo init, index for it shouldn't exist.
-    # However, get_by_id has a fallback to linear scan if the entity_type's index itself is missing,
-    # OR if the id_field is not in COMMON_ID_FIELDS (which means it wouldn't have an id_map in id_indexes[entity_type]).
-    # The current get_by_id logic iterates through COMMON_ID_FIELDS present in the index.
-    # To truly test linear scan for a field *not* in COMMON_ID_FIELDS, that field must be used for lookup,
-    # and the primary COMMON_ID_FIELDS must not match.
+@pytest.mark.asyncio
+async def test_get_by_id_returns_independent_copy(initialized_repo: JsonStorageRepository):
+    repo = initialized_repo
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "widget_clone", "tags": ["a"], "meta": {"n": 1}})
 
-    # Let's adjust the test: create an entity with a standard ID, then try to fetch it
-    # using a value from a non-indexed field, assuming get_by_id could hypothetically support this (it doesn't directly).
-    # The current get_by_id only looks up by entity_id against fields in COMMON_ID_FIELDS that are indexed.
-    # The "linear scan" in get_by_id is a fallback if the *entire index for the entity type* is missing.
+    found_entity = await repo.get_by_id(TEST_ENTITY_TYPE, "widget_clone")
+    found_entity["tags"].append("b")
+    found_entity["meta"]["n"] = 2
 
-    # Re-think: The linear scan in get_by_id is:
-    #   if entity_type not in self.id_indexes: ... iterate self.in_memory_data[entity_type]
-    # This happens if _build_id_indexes wasn't called or found no data.
+    stored_entity = repo.id_indexes[TEST_ENTITY_TYPE][TEST_ENTITY_ID_FIELD]["widget_clone"]
+    assert stored_entity["tags"] == ["a"]
+    assert stored_entity["meta"] == {"n": 1}
 
-    # To test the specific linear scan part of get_by_id:
-    # We need an entity type for which id_indexes[entity_type] does not exist or is empty.
-    # This can be simulated by manually removing the index after data is loaded/created.
-    repo.id_indexes[TEST_ENTITY_TYPE] = {} # Simulate index is missing for this entity type
+@pytest.mark.asyncio
+async def test_list_reads_return_independent_nested_copies(initialized_repo: JsonStorageRepository):
+    repo = initialized_repo
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "nested_clone", "rows": [{"cells": [1]}], "color": "red"})
 
-    found_entity = await repo.get_by_id(TEST_ENTITY_TYPE, "widget_linear_scan")
-    assert found_entity is not None
-    assert found_entity["data"] == "found by scan"
+    (listed_entity,) = await repo.get_all(TEST_ENTITY_TYPE)
+    listed_entity["rows"][0]["cells"].append(2)
+    (queried_entity,) = await repo.query(TEST_ENTITY_TYPE, {"color": "red"})
+    queried_entity["rows"].append({"cells": []})
 
-    # Restore COMMON_ID_FIELDS
-    COMMON_ID_FIELDS.clear()
-    COMMON_ID_FIELDS.extend(original_common_id_fields)
+    stored_entity = repo.id_indexes[TEST_ENTITY_TYPE][TEST_ENTITY_ID_FIELD]["nested_clone"]
+    assert stored_entity["rows"] == [{"cells": [1]}]
+
+@pytest.mark.asyncio
+async def test_get_by_id_index_miss_returns_none(initialized_repo: JsonStorageRepository):
+    # get_by_id relies on the ID indexes alone; there is no linear-scan fallback, so a row
+    # missing from the index (e.g. after the index was dropped) is reported as not found.
+    repo = initialized_repo
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "widget_unindexed", "data": "in list only"})
+    repo.id_indexes[TEST_ENTITY_TYPE] = {} # Simulate the index losing the entity
+
+    assert any(item[TEST_ENTITY_ID_FIELD] == "widget_unindexed" for item in repo.in_memory_data[TEST_ENTITY_TYPE])
+    assert await repo.get_by_id(TEST_ENTITY_TYPE, "widget_unindexed") is None
 
 
 @pytest.mark.asyncio
@@ -367,6 +372,21 @@ async def test_delete_entity_success(initialized_repo: JsonStorageRepository, te
     # Verify index
     assert "widget_delete_me" not in repo.id_indexes[TEST_ENTITY_TYPE][TEST_ENTITY_ID_FIELD]
 
+@pytest.mark.asyncio
+async def test_delete_keeps_position_index_consistent(initialized_repo: JsonStorageRepository):
+    repo = initialized_repo
+    for i in range(4):
+        await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: f"pos_{i}", "value": i})
+
+    assert await repo.delete(TEST_ENTITY_TYPE, "pos_1") is True
+    assert await repo.delete(TEST_ENTITY_TYPE, "pos_3") is True
+
+    remaining_ids = [item[TEST_ENTITY_ID_FIELD] for item in repo.in_memory_data[TEST_ENTITY_TYPE]]
+    assert remaining_ids == ["pos_0", "pos_2"]  # pos_3 was swapped into slot 1, then removed from there
+    for position, item in enumerate(repo.in_memory_data[TEST_ENTITY_TYPE]):
+        assert repo._item_positions[TEST_ENTITY_TYPE][id(item)] == position
+    assert (await repo.get_by_id(TEST_ENTITY_TYPE, "pos_2"))["value"] == 2
+
 @pytest.mark.asyncio
 async def test_delete_entity_not_found(initialized_repo: JsonStorageRepository):
     repo = initialized_repo
@@ -408,6 +428,40 @@ async def test_query_entities(initialized_repo: JsonStorageRepository):
     limited_red_widgets = await repo.query(TEST_ENTITY_TYPE, {"color": "red"}, limit=1)
     assert len(limited_red_widgets) == 1
 
+@pytest.mark.asyncio
+async def test_query_secondary_index_tracks_mutations(initialized_repo: JsonStorageRepository):
+    repo = initialized_repo
+    for i, color in enumerate(["red", "blue", "red", "red"]):
+        await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: f"s_w{i}", "color": color, "sizes": [i]})
+
+    red_ids = [w[TEST_ENTITY_ID_FIELD] for w in await repo.query(TEST_ENTITY_TYPE, {"color": "red"})]
+    assert red_ids == ["s_w0", "s_w2", "s_w3"]
+    assert "color" in repo._secondary_indexes[TEST_ENTITY_TYPE]
+
+    await repo.update(TEST_ENTITY_TYPE, "s_w1", {"color": "red"})
+    await repo.update(TEST_ENTITY_TYPE, "s_w2", {"color": "green"})
+    await repo.delete(TEST_ENTITY_TYPE, "s_w0")
+
+    red_ids = [w[TEST_ENTITY_ID_FIELD] for w in await repo.query(TEST_ENTITY_TYPE, {"color": "red"})]
+    list_order = [w[TEST_ENTITY_ID_FIELD] for w in repo.in_memory_data[TEST_ENTITY_TYPE]]
+    assert sorted(red_ids) == ["s_w1", "s_w3"]  # Index follows updates/deletes
+    assert red_ids == [w_id for w_id in list_order if w_id in red_ids]  # ...and keeps list order
+    assert await repo.query(TEST_ENTITY_TYPE, {"color": "green", "sizes": [2]}) != []
+    assert await repo.query(TEST_ENTITY_TYPE, {"color": "missing"}) == []
+
+@pytest.mark.asyncio
+async def test_query_orders_candidates_without_scanning(initialized_repo: JsonStorageRepository, mocker):
+    repo = initialized_repo
+    for i in range(4):
+        await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: f"o_w{i}", "color": "red"})
+    repo.in_memory_data[TEST_ENTITY_TYPE].append({"color": "red", "note": "no id"})  # Bypasses the repository
+    await repo.delete(TEST_ENTITY_TYPE, "o_w0")
+    mocker.patch.object(repo, "_find_position", side_effect=AssertionError("query must not scan for positions"))
+
+    results = await repo.query(TEST_ENTITY_TYPE, {"color": "red"}, clone=False)
+    list_order = [item for item in repo.in_memory_data[TEST_ENTITY_TYPE] if item.get("color") == "red"]
+    assert [id(item) for item in results] == [id(item) for item in list_order]
+
 @pytest.mark.asyncio
 async def test_get_all_entity_types(initialized_repo: JsonStorageRepository):
     repo = initialized_repo
@@ -446,19 +500,10 @@ async def test_persist_all_data(initialized_repo: JsonStorageRepository, temp_da
     # Modify data in memory for two different entity types
     widget_data_mem = {TEST_ENTITY_ID_FIELD: "persist_widget", "data": "memory_only_widget"}
     repo.in_memory_data[TEST_ENTITY_TYPE].append(widget_data_mem) # Add directly to bypass _persist in create
-    # Update index manually for this direct memory manipulation
-    repo.id_indexes[TEST_ENTITY_TYPE][TEST_ENTITY_ID_FIELD]["persist_widget"] = widget_data_mem
-
 
     gadget_data_mem = {"gadget_id": "persist_gadget", "data": "memory_only_gadget"}
-    # Ensure 'gadgets' type exists and gadget_id is indexable if not already by fixture
-    if "gadgets" not in repo.in_memory_data: repo.in_memory_data["gadgets"] = []
-    if "gadgets" not in repo.id_indexes: repo.id_indexes["gadgets"] = {}
-    if "gadget_id" not in repo.id_indexes["gadgets"]: repo.id_indexes["gadgets"]["gadget_id"] = {}
-
-    repo.in_memory_data["gadgets"].append(gadget_data_mem)
-    repo.id_indexes["gadgets"]["gadget_id"]["persist_gadget"] = gadget_data_mem
-
+    # persist_all_data writes the in-memory lists as they are; the ID indexes are not consulted
+    repo.in_memory_data.setdefault("gadgets", []).append(gadget_data_mem)
 
     await repo.persist_all_data()
 
@@ -473,3 +518,376 @@ async def test_persist_all_data(initialized_repo: JsonStorageRepository, temp_da
     with open(gadgets_file, "r") as f:
         data_in_file_gadgets = json.load(f)
         assert any(item["gadget_id"] == "persist_gadget" for item in data_in_file_gadgets)
+
+@pytest.mark.asyncio
+async def test_flush_interval_coalesces_writes(temp_data_dir: Path, file_paths_config: Dict[str, Path]):
+    repo = JsonStorageRepository(
+        file_paths_config=file_paths_config, base_data_dir=temp_data_dir, flush_interval=0.05
+    )
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+
+    for i in range(3):
+        await repo.create(TEST_ENTITY_TYPE, {"id": f"burst_{i}"})
+    assert not widgets_file.exists()  # Nothing written until the window closes
+
+    await asyncio.sleep(0.1)
+    with open(widgets_file, "r") as f:
+        assert [item["id"] for item in json.load(f)] == ["burst_0", "burst_1", "burst_2"]
+
+    await repo.create(TEST_ENTITY_TYPE, {"id": "burst_3"})
+    await repo.persist_all_data()  # Forces the pending write immediately
+    assert not repo._dirty_types
+    with open(widgets_file, "r") as f:
+        assert len(json.load(f)) == 4
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_orjson", [True, False])
+async def test_persist_round_trip_with_and_without_orjson(
+    monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path], use_orjson: bool
+):
+    from app.crud import json_repository as json_repository_module
+
+    if use_orjson and json_repository_module.orjson is None:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(json_repository_module, "orjson", None)
+
+    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    await repo.create(TEST_ENTITY_TYPE, {"id": "w1", "label": "小部件", "tags": ["a", "b"]})
+
+    reloaded = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    assert reloaded.in_memory_data[TEST_ENTITY_TYPE] == [{"id": "w1", "label": "小部件", "tags": ["a", "b"]}]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_orjson", [True, False])
+async def test_load_treats_undecodable_file_as_empty(
+    use_orjson: bool, monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    if use_orjson and json_repository_module.orjson is None:
+        pytest.skip("orjson not installed")
+    if not use_orjson:
+        monkeypatch.setattr(json_repository_module, "orjson", None)
+
+    (temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]).write_bytes(b'[{"id": "\xff"}]')
+    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    assert repo.in_memory_data[TEST_ENTITY_TYPE] == []
+
+@pytest.mark.asyncio
+async def test_persist_replaces_file_atomically(monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]):
+    from app.crud import json_repository as json_repository_module
+
+    fsynced_fds: List[int] = []
+    monkeypatch.setattr(json_repository_module.os, "fsync", fsynced_fds.append)
+
+    repo = JsonStorageRepository(
+        file_paths_config=file_paths_config,
+        base_data_dir=temp_data_dir,
+        durable_entity_types=[TEST_ENTITY_TYPE],
+    )
+    await repo.create(TEST_ENTITY_TYPE, {"id": "durable_1"})
+    await repo.create("gadgets", {"id": "gadget_1"})
+
+    assert len(fsynced_fds) == 1  # Only the durable entity type is fsynced
+    assert not list(temp_data_dir.rglob("*.tmp"))
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json_repository_module.os, "replace", failing_replace)
+    await repo.create(TEST_ENTITY_TYPE, {"id": "durable_2"})
+
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    with open(widgets_file, "r") as f:
+        assert json.load(f) == [{"id": "durable_1"}]  # Old content survives a failed write
+    assert not list(temp_data_dir.rglob("*.tmp"))
+
+def test_startup_recovers_leftover_temp_files(temp_data_dir: Path, file_paths_config: Dict[str, Path]):
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    widgets_file.write_text(json.dumps([{"id": "complete"}]), encoding="utf-8")
+    widgets_file.with_name(widgets_file.name + ".tmp").write_text('[{"id": "partial"', encoding="utf-8")
+    gadgets_file = temp_data_dir / file_paths_config["gadgets"]
+    gadgets_file.parent.mkdir(parents=True, exist_ok=True)
+    gadgets_file.with_name(gadgets_file.name + ".tmp").write_text(json.dumps([{"id": "first"}]), encoding="utf-8")
+
+    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+
+    assert [item["id"] for item in repo.in_memory_data[TEST_ENTITY_TYPE]] == ["complete"]
+    assert [item["id"] for item in repo.in_memory_data["gadgets"]] == ["first"]  # Promoted
+    assert not list(temp_data_dir.rglob("*.tmp"))
+
+@pytest.mark.asyncio
+async def test_concurrent_persists_skip_superseded_snapshots(
+    monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    written_payloads: List[bytes] = []
+    original_write = json_repository_module._atomic_write_bytes
+
+    def recording_write(file_path, data, durable=False):
+        written_payloads.append(data)
+        original_write(file_path, data, durable)
+
+    monkeypatch.setattr(json_repository_module, "_atomic_write_bytes", recording_write)
+    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+
+    await asyncio.gather(*(repo.create(TEST_ENTITY_TYPE, {"id": f"c_{i}"}) for i in range(5)))
+
+    assert len(written_payloads) < 5  # Queued stale snapshots were skipped
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    with open(widgets_file, "r") as f:
+        assert sorted(item["id"] for item in json.load(f)) == [f"c_{i}" for i in range(5)]
+
+@pytest.mark.asyncio
+async def test_superseded_persist_returns_only_after_its_change_is_on_disk(
+    monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    original_write = json_repository_module._atomic_write_bytes
+
+    def slow_write(file_path, data, durable=False):
+        time.sleep(0.05)
+        original_write(file_path, data, durable)
+
+    monkeypatch.setattr(json_repository_module, "_atomic_write_bytes", slow_write)
+    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+
+    async def create_and_check(entity_id: str) -> bool:
+        await repo.create(TEST_ENTITY_TYPE, {"id": entity_id})
+        with open(widgets_file, "r") as f:
+            return any(item["id"] == entity_id for item in json.load(f))
+
+    on_disk = await asyncio.gather(*(create_and_check(f"d_{i}") for i in range(3)))
+    assert on_disk == [True, True, True]  # No caller is acknowledged before its row is written
+
+
+# --- JSONL variant ---
+
+@pytest.mark.asyncio
+async def test_jsonl_stale_count_reset_only_by_actual_rewrites(
+    monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    original_write = json_repository_module._atomic_write_bytes
+
+    def slow_write(file_path, data, durable=False):
+        time.sleep(0.02)
+        original_write(file_path, data, durable)
+
+    monkeypatch.setattr(json_repository_module, "_atomic_write_bytes", slow_write)
+    repo = JsonlStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    await repo.create(TEST_ENTITY_TYPE, {"id": "s1"})
+
+    real_write_snapshot = repo._write_snapshot
+
+    async def write_then_append(entity_type, file_path, serialized_data):
+        written = await real_write_snapshot(entity_type, file_path, serialized_data)
+        repo._stale_line_counts[entity_type] = 7  # An append landing right after the rewrite
+        return written
+
+    monkeypatch.setattr(repo, "_write_snapshot", write_then_append)
+    results = await asyncio.gather(*(repo._persist_data_to_file(TEST_ENTITY_TYPE) for _ in range(3)))
+
+    assert results == [True, True, True]
+    assert repo._stale_line_counts[TEST_ENTITY_TYPE] == 7  # The skipped persist did not reset it
+
+    def failing_write(file_path, data, durable=False):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json_repository_module, "_atomic_write_bytes", failing_write)
+    assert await repo._persist_data_to_file(TEST_ENTITY_TYPE) is False
+    assert repo._stale_line_counts[TEST_ENTITY_TYPE] == 7
+
+
+@pytest.mark.asyncio
+async def test_jsonl_appends_changes_and_replays_them(temp_data_dir: Path, file_paths_config: Dict[str, Path]):
+    repo = JsonlStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    await repo.create(TEST_ENTITY_TYPE, {"id": "l1", "value": 1})
+    await repo.create(TEST_ENTITY_TYPE, {"id": "l2", "value": 2})
+    await repo.update(TEST_ENTITY_TYPE, "l1", {"value": 10})
+    await repo.delete(TEST_ENTITY_TYPE, "l2")
+
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    lines = widgets_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 4  # Every change is a single appended line
+    assert json.loads(lines[-1]) == {"__op__": "delete", "id": "l2"}
+
+    reloaded = JsonlStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    assert reloaded.in_memory_data[TEST_ENTITY_TYPE] == [{"id": "l1", "value": 10}]
+    assert reloaded._stale_line_counts[TEST_ENTITY_TYPE] == 3
+
+@pytest.mark.asyncio
+async def test_jsonl_converts_legacy_array_and_compacts(
+    monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    widgets_file.write_text(json.dumps([{"id": "old", "value": 0}]), encoding="utf-8")
+
+    repo = JsonlStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    assert repo.in_memory_data[TEST_ENTITY_TYPE] == [{"id": "old", "value": 0}]
+
+    await repo.create(TEST_ENTITY_TYPE, {"id": "new", "value": 1})
+    lines = widgets_file.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["old", "new"]  # Rewritten as JSONL
+
+    monkeypatch.setattr(json_repository_module, "_JSONL_COMPACTION_MIN_STALE_LINES", 3)
+    for value in range(2, 5):
+        await repo.update(TEST_ENTITY_TYPE, "new", {"value": value})
+
+    lines = widgets_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2  # Stale versions were compacted away
+    assert json.loads(lines[1]) == {"id": "new", "value": 4}
+
+@pytest.mark.asyncio
+async def test_lazy_load_defers_reading_until_first_access(temp_data_dir: Path, file_paths_config: Dict[str, Path]):
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    widgets_file.write_text(json.dumps([{"id": "lazy_1", "value": 1}]), encoding="utf-8")
+
+    repo = JsonStorageRepository(
+        file_paths_config=file_paths_config, base_data_dir=temp_data_dir, lazy_load=True
+    )
+    assert repo.in_memory_data == {}
+    assert set(await repo.get_all_entity_types()) == {TEST_ENTITY_TYPE, "gadgets"}
+
+    await repo.persist_all_data()  # Must not overwrite files that were never loaded
+    with open(widgets_file, "r") as f:
+        assert json.load(f) == [{"id": "lazy_1", "value": 1}]
+
+    assert (await repo.get_by_id(TEST_ENTITY_TYPE, "lazy_1"))["value"] == 1
+    assert "gadgets" not in repo.in_memory_data
+
+@pytest.mark.asyncio
+async def test_read_apis_can_skip_cloning(initialized_repo: JsonStorageRepository):
+    repo = initialized_repo
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "view_1", "color": "red"})
+    stored_entity = repo.id_indexes[TEST_ENTITY_TYPE][TEST_ENTITY_ID_FIELD]["view_1"]
+
+    assert await repo.get_by_id(TEST_ENTITY_TYPE, "view_1", clone=False) is stored_entity
+    assert (await repo.get_all(TEST_ENTITY_TYPE, clone=False))[0] is stored_entity
+    assert (await repo.query(TEST_ENTITY_TYPE, {"color": "red"}, clone=False))[0] is stored_entity
+    assert await repo.get_by_id(TEST_ENTITY_TYPE, "view_1") is not stored_entity
+
+@pytest.mark.asyncio
+async def test_persist_reuses_serialized_entities(
+    monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    monkeypatch.setattr(json_repository_module, "orjson", None)
+    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    for index in range(3):
+        await repo.create(TEST_ENTITY_TYPE, {"id": f"cached_{index}", "value": index})
+
+    encoded_items = []
+    original_encoder = json_repository_module._dumps_array_element
+    monkeypatch.setattr(
+        json_repository_module,
+        "_dumps_array_element",
+        lambda item: encoded_items.append(item["id"]) or original_encoder(item),
+    )
+    await repo.update(TEST_ENTITY_TYPE, "cached_1", {"value": 10})
+    assert encoded_items == ["cached_1"]  # Unchanged entities reuse their cached bytes
+
+    await repo.delete(TEST_ENTITY_TYPE, "cached_0")
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    expected_items = repo.in_memory_data[TEST_ENTITY_TYPE]
+    assert widgets_file.read_text(encoding="utf-8") == json.dumps(
+        expected_items, indent=4, ensure_ascii=False
+    )
+
+@pytest.mark.asyncio
+async def test_query_with_unhashable_conditions(initialized_repo: JsonStorageRepository):
+    repo = initialized_repo
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "tags_1", "tags": ["a", "b"], "meta": {"k": 1}})
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "tags_2", "tags": ["a", "b"]})
+    await repo.create(TEST_ENTITY_TYPE, {TEST_ENTITY_ID_FIELD: "tags_3", "tags": ["c"], "meta": {"k": 1}})
+
+    results = await repo.query(TEST_ENTITY_TYPE, {"tags": ["a", "b"]})
+    assert [item[TEST_ENTITY_ID_FIELD] for item in results] == ["tags_1", "tags_2"]
+
+    results = await repo.query(TEST_ENTITY_TYPE, {"tags": ["a", "b"], "meta": {"k": 1}})
+    assert [item[TEST_ENTITY_ID_FIELD] for item in results] == ["tags_1"]  # tags_2 lacks "meta"
+
+@pytest.mark.asyncio
+async def test_background_writer_flushes_on_disconnect(temp_data_dir: Path, file_paths_config: Dict[str, Path]):
+    repo = JsonStorageRepository(
+        file_paths_config=file_paths_config, base_data_dir=temp_data_dir, flush_interval=60
+    )
+    await repo.connect()
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+
+    await repo.create(TEST_ENTITY_TYPE, {"id": "queued_1"})
+    await repo.create("gadgets", {"id": "queued_2"})
+    assert repo._dirty_types == {TEST_ENTITY_TYPE, "gadgets"}
+    assert not widgets_file.exists()  # The caller did not wait for the write
+
+    await asyncio.wait_for(repo.disconnect(), timeout=0.5)  # Disconnect skips the remaining window
+    assert repo._writer_task is None
+    with open(widgets_file, "r") as f:
+        assert [item["id"] for item in json.load(f)] == ["queued_1"]
+
+@pytest.mark.asyncio
+async def test_persist_appends_new_entities_to_previous_snapshot(
+    monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    monkeypatch.setattr(json_repository_module, "orjson", None)
+    repo = JsonStorageRepository(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    await repo.create(TEST_ENTITY_TYPE, {"id": "append_0"})
+
+    encoded_items = []
+    original_encoder = json_repository_module._dumps_array_element
+    monkeypatch.setattr(
+        json_repository_module,
+        "_dumps_array_element",
+        lambda item: encoded_items.append(item["id"]) or original_encoder(item),
+    )
+    await repo.create(TEST_ENTITY_TYPE, {"id": "append_1"})
+    await repo.update(TEST_ENTITY_TYPE, "append_0", {"value": 1})
+    await repo.create(TEST_ENTITY_TYPE, {"id": "append_2"})
+    assert encoded_items == ["append_1", "append_0", "append_2"]  # Each entity encoded once
+
+    widgets_file = temp_data_dir / file_paths_config[TEST_ENTITY_TYPE]
+    assert widgets_file.read_text(encoding="utf-8") == json.dumps(
+        repo.in_memory_data[TEST_ENTITY_TYPE], indent=4, ensure_ascii=False
+    )
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("repo_class", [JsonStorageRepository, JsonlStorageRepository])
+async def test_create_many_validates_whole_batch_and_writes_once(
+    repo_class, monkeypatch, temp_data_dir: Path, file_paths_config: Dict[str, Path]
+):
+    from app.crud import json_repository as json_repository_module
+
+    repo = repo_class(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    await repo.create(TEST_ENTITY_TYPE, {"id": "bulk_0"})
+
+    with pytest.raises(ValueError):
+        await repo.create_many(TEST_ENTITY_TYPE, [{"id": "bulk_1"}, {"id": "bulk_1"}])
+    with pytest.raises(ValueError):
+        await repo.create_many(TEST_ENTITY_TYPE, [{"id": "bulk_1"}, {"id": "bulk_0"}])
+    assert len(repo.in_memory_data[TEST_ENTITY_TYPE]) == 1  # Nothing from the rejected batches
+
+    file_writes = []
+    for writer_name in ("_atomic_write_bytes", "_append_bytes"):
+        original_writer = getattr(json_repository_module, writer_name)
+        monkeypatch.setattr(
+            json_repository_module,
+            writer_name,
+            lambda *args, _writer=original_writer: file_writes.append(args[0]) or _writer(*args),
+        )
+    created = await repo.create_many(TEST_ENTITY_TYPE, [{"id": "bulk_1"}, {"id": "bulk_2"}])
+    assert [item["id"] for item in created] == ["bulk_1", "bulk_2"]
+    assert len(file_writes) == 1
+
+    reloaded = repo_class(file_paths_config=file_paths_config, base_data_dir=temp_data_dir)
+    assert (await reloaded.get_by_id(TEST_ENTITY_TYPE, "bulk_2")) == {"id": "bulk_2"}
+    assert len(reloaded.in_memory_data[TEST_ENTITY_TYPE]) == 3
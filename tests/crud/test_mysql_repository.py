@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+"""
+app.crud.mysql_repository.MySQLStorageRepository 的单元测试。
+使用记录执行语句的伪连接池/游标，无需 MySQL 服务器。
+(Unit tests for app.crud.mysql_repository.MySQLStorageRepository. They use a fake
+pool/cursor that records executed statements, so no MySQL server is needed.)
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import aiomysql
+import pytest
+import pytest_asyncio
+from pymysql.constants import ER
+from pymysql.err import IntegrityError, OperationalError
+
+from app.crud.mysql_repository import MySQLStorageRepository
+
+# region 伪连接池 (Fake Pool)
+
+
+class FakeCursor:
+    """记录执行的 SQL 并从所属连接的 `rows` 中返回结果的游标。(Cursor recording executed SQL and returning rows queued on its connection.)"""
+
+    def __init__(self, conn: "FakeConnection"):
+        self.conn = conn
+        self.rowcount = 0
+
+    async def __aenter__(self) -> "FakeCursor":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def execute(self, sql: str, params: Any = None) -> int:
+        self.conn.executed.append((sql, params))
+        self.rowcount = self.conn.rowcount
+        return self.rowcount
+
+    async def executemany(self, sql: str, seq_of_params: List[tuple]) -> int:
+        self.conn.executed_many.append((sql, list(seq_of_params)))
+        if self.conn.executemany_error is not None:
+            raise self.conn.executemany_error
+        self.rowcount = len(seq_of_params)
+        return self.rowcount
+
+    async def fetchone(self) -> Optional[Dict[str, Any]]:
+        return self.conn.rows.pop(0) if self.conn.rows else None
+
+    def __aiter__(self) -> "FakeCursor":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if not self.conn.rows:
+            raise StopAsyncIteration
+        return self.conn.rows.pop(0)
+
+
+class FakeConnection:
+    """伪连接：记录语句与事务事件。(Fake connection recording statements and transaction events.)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executed: List[tuple] = []
+        self.executed_many: List[tuple] = []
+        self.events: List[str] = []
+        self.rows: List[Dict[str, Any]] = []
+        self.rowcount = 1
+        self.executemany_error: Optional[BaseException] = None
+        self.closed = False
+
+    def cursor(self, cursor_class: Any = None) -> FakeCursor:
+        return FakeCursor(self)
+
+    async def begin(self) -> None:
+        self.events.append("begin")
+
+    async def commit(self) -> None:
+        self.events.append("commit")
+
+    async def rollback(self) -> None:
+        self.events.append("rollback")
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _FakeAcquire:
+    """与 aiomysql 相同，`pool.acquire()` 既可 await 也可用于 `async with`。
+    (As in aiomysql, `pool.acquire()` can be awaited or used with `async with`.)"""
+
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+        self.conn: Optional[FakeConnection] = None
+
+    def __await__(self):
+        return self.pool._acquire().__await__()
+
+    async def __aenter__(self) -> FakeConnection:
+        self.conn = await self.pool._acquire()
+        return self.conn
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.pool.release(self.conn)
+
+
+class FakePool:
+    """按顺序发放新伪连接并记录借还情况的连接池。(Pool handing out new fake connections and tracking borrows and returns.)"""
+
+    def __init__(self):
+        self.created: List[FakeConnection] = []
+        self.in_use: List[FakeConnection] = []
+        self.released: List[FakeConnection] = []
+
+    async def _acquire(self) -> FakeConnection:
+        conn = FakeConnection(f"conn{len(self.created)}")
+        self.created.append(conn)
+        self.in_use.append(conn)
+        return conn
+
+    def acquire(self) -> _FakeAcquire:
+        return _FakeAcquire(self)
+
+    async def release(self, conn: FakeConnection) -> None:
+        self.in_use.remove(conn)
+        self.released.append(conn)
+
+
+@pytest.fixture
+def fake_pool() -> FakePool:
+    return FakePool()
+
+
+@pytest_asyncio.fixture
+async def repo(fake_pool: FakePool) -> MySQLStorageRepository:
+    repository = MySQLStorageRepository(
+        host="localhost",
+        port=3306,
+        user="test",
+        password="test",
+        db="test",
+        loop=asyncio.get_running_loop(),
+    )
+    repository.pool = fake_pool
+    return repository
+
+
+# endregion
+
+# region 连接固定测试 (Connection Pinning Tests)
+
+
+@pytest.mark.asyncio
+async def test_pinned_connection_is_acquired_lazily_and_reused(repo, fake_pool):
+    """测试固定连接在首次数据库操作时才借出，之后的调用复用它，退出时归还。"""
+    async with repo:
+        assert fake_pool.created == [], "进入上下文时不应借出连接。"
+        await repo.delete("user", "u1")
+        await repo.delete("user", "u2")
+        assert len(fake_pool.created) == 1, "同一任务内的调用应复用固定连接。"
+        assert len(fake_pool.created[0].executed) == 2
+    assert fake_pool.in_use == [], "退出上下文时应归还固定连接。"
+    assert fake_pool.released == fake_pool.created
+
+
+@pytest.mark.asyncio
+async def test_pinned_context_without_db_work_holds_no_connection(repo, fake_pool):
+    """测试未访问数据库的上下文不借出也不归还连接。"""
+    async with repo:
+        await asyncio.sleep(0)
+    assert fake_pool.created == [] and fake_pool.released == []
+
+
+@pytest.mark.asyncio
+async def test_nested_pinned_contexts_release_only_at_outermost_exit(repo, fake_pool):
+    """测试嵌套进入只增加层数，内层退出不归还连接。"""
+    async with repo:
+        async with repo:
+            await repo.delete("user", "u1")
+        assert fake_pool.in_use == fake_pool.created, "内层退出不应归还固定连接。"
+        await repo.delete("user", "u2")
+        assert len(fake_pool.created) == 1
+    assert fake_pool.in_use == []
+
+
+@pytest.mark.asyncio
+async def test_pinned_connection_is_not_shared_with_other_tasks(repo, fake_pool):
+    """测试上下文中派生的任务不复用固定连接，也不能释放它。"""
+    async with repo:
+        await repo.delete("user", "u1")
+        pinned = fake_pool.created[0]
+
+        async def background() -> None:
+            await repo.delete("user", "u2")
+            await repo.__aexit__(None, None, None)  # 非所有者任务的退出应被忽略
+
+        await asyncio.create_task(background())
+        assert len(fake_pool.created) == 2, "派生任务应从连接池借用自己的连接。"
+        assert pinned in fake_pool.in_use, "非所有者任务不应释放固定连接。"
+    assert fake_pool.in_use == []
+
+
+@pytest.mark.asyncio
+async def test_busy_pinned_connection_falls_back_to_pool(repo, fake_pool):
+    """测试固定连接上有结果集未读完时，其他语句改用连接池的连接；读完后恢复复用。"""
+    async with repo:
+        await repo.delete("user", "warmup")
+        pinned = fake_pool.created[0]
+        pinned.rows = [{"uid": "a"}, {"uid": "b"}]
+        seen = []
+        async for record in repo.iter_query("user", {}):
+            seen.append(record["uid"])
+            await repo.delete("user", record["uid"])
+        assert seen == ["a", "b"]
+        assert len(fake_pool.created) == 3, (
+            "迭代期间的语句不应在未读完的固定连接上执行。"
+        )
+        assert all(conn in fake_pool.released for conn in fake_pool.created[1:])
+
+        await repo.delete("user", "after")
+        assert pinned.executed[-1] == (
+            "DELETE FROM users WHERE `uid` = %s",
+            ("after",),
+        ), "结果集读完后应恢复复用固定连接。"
+
+
+@pytest.mark.asyncio
+async def test_aexit_closes_pinned_connection_with_pending_results(repo, fake_pool):
+    """测试退出上下文时若固定连接仍有未读完的结果集，先关闭再归还。"""
+    async with repo:
+        await repo.delete("user", "warmup")
+        pinned = fake_pool.created[0]
+        pinned.rows = [{"uid": "a"}, {"uid": "b"}]
+        stream = repo.iter_query("user", {})
+        await stream.__anext__()
+    assert pinned.closed, "带未读结果集的连接应被关闭。"
+    assert fake_pool.in_use == []
+    await stream.aclose()
+
+
+# endregion
+
+# region 语句构造测试 (Statement Building Tests)
+
+
+@pytest.mark.asyncio
+async def test_create_many_groups_rows_by_column_set(repo, fake_pool):
+    """测试 create_many 按列集合分组，每组一次 executemany，并在同一事务中提交。"""
+    entities = [
+        {"uid": "a", "nickname": "A"},
+        {"uid": "b", "email": "b@example.com"},
+        {"uid": "c", "nickname": "C"},
+    ]
+    result = await repo.create_many("user", entities)
+
+    assert result == entities
+    conn = fake_pool.created[0]
+    assert conn.executed_many == [
+        (
+            "INSERT INTO users (`uid`, `nickname`) VALUES (%s, %s)",
+            [("a", "A"), ("c", "C")],
+        ),
+        (
+            "INSERT INTO users (`uid`, `email`) VALUES (%s, %s)",
+            [("b", "b@example.com")],
+        ),
+    ]
+    assert conn.events == ["begin", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_create_many_serializes_json_and_maps_qb_content_keys(repo, fake_pool):
+    """测试 create_many 序列化 JSON 字段，并将题库内容的 id 映射为 difficulty_id/content_id。"""
+    await repo.create_many("qb_content_easy", [{"id": "easy", "questions": [1]}])
+    sql, rows = fake_pool.created[0].executed_many[0]
+    assert sql == (
+        "INSERT INTO question_bank_contents (`questions`, `difficulty_id`, `content_id`) "
+        "VALUES (%s, %s, %s)"
+    )
+    assert rows == [("[1]", "easy", "default")]
+
+
+@pytest.mark.asyncio
+async def test_create_many_integrity_error_rolls_back_as_value_error(repo, fake_pool):
+    """测试批量插入出现完整性错误时整批回滚并转为 ValueError。"""
+    original_acquire = fake_pool._acquire
+
+    async def acquire_failing() -> FakeConnection:
+        conn = await original_acquire()
+        conn.executemany_error = IntegrityError(1062, "Duplicate entry")
+        return conn
+
+    fake_pool._acquire = acquire_failing
+    with pytest.raises(ValueError):
+        await repo.create_many("user", [{"uid": "a"}])
+    assert fake_pool.created[0].events == ["begin", "rollback"]
+
+
+@pytest.mark.asyncio
+async def test_create_many_packet_too_large_is_logged_and_reraised(
+    repo, fake_pool, caplog
+):
+    """测试语句超过服务器 max_allowed_packet 时回滚，并记录说明该上限的日志后重新抛出。"""
+    original_acquire = fake_pool._acquire
+
+    async def acquire_failing() -> FakeConnection:
+        conn = await original_acquire()
+        conn.executemany_error = OperationalError(
+            ER.NET_PACKET_TOO_LARGE, "Got a packet bigger than 'max_allowed_packet'"
+        )
+        return conn
+
+    fake_pool._acquire = acquire_failing
+    with pytest.raises(OperationalError):
+        await repo.create_many("user", [{"uid": "a"}])
+    assert fake_pool.created[0].events == ["begin", "rollback"]
+    assert str(aiomysql.Cursor.max_stmt_length) in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_upsert_updates_non_key_columns(repo, fake_pool):
+    """测试 upsert 生成 ON DUPLICATE KEY UPDATE，只更新非主键列。"""
+    await repo.upsert("user", {"uid": "a", "nickname": "A", "tags": ["x"]})
+    assert fake_pool.created[0].executed == [
+        (
+            "INSERT INTO users (`uid`, `nickname`, `tags`) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE `nickname` = VALUES(`nickname`), `tags` = VALUES(`tags`)",
+            ("a", "A", '["x"]'),
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_upsert_key_only_row_writes_key_back(repo, fake_pool):
+    """测试只含主键的行 (含题库内容的复合主键) 把主键写回自身，使重复插入成为空操作。"""
+    await repo.upsert("user", {"uid": "a"})
+    await repo.upsert("qb_content_easy", {"id": "easy"})
+    user_sql, qb_sql = [conn.executed[0][0] for conn in fake_pool.created]
+    assert user_sql == (
+        "INSERT INTO users (`uid`) VALUES (%s) ON DUPLICATE KEY UPDATE `uid` = VALUES(`uid`)"
+    )
+    assert qb_sql == (
+        "INSERT INTO question_bank_contents (`difficulty_id`, `content_id`) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE `difficulty_id` = VALUES(`difficulty_id`)"
+    )
+
+
+def test_select_list_rejects_unknown_fields(repo):
+    """测试读取投影中出现表中不存在的字段时抛出 ValueError。"""
+    with pytest.raises(ValueError):
+        repo._select_list("user", ["uid", "password"])
+    assert repo._select_list("user", None) == ("*",)
+    assert repo._select_list("user", ["nickname", "uid", "nickname"]) == (
+        "nickname",
+        "uid",
+    )
+
+
+@pytest.mark.asyncio
+async def test_qb_content_projection_maps_id_to_difficulty_id(repo, fake_pool):
+    """测试题库内容投影中的 id 映射为 difficulty_id，且结果仍为 {"id", ...} 结构。"""
+    assert repo._select_list("qb_content_easy", ["id"]) == ("difficulty_id",)
+
+    async with repo:
+        await repo.delete("user", "warmup")
+        conn = fake_pool.created[0]
+        conn.rows = [{"difficulty_id": "easy"}]
+        record = await repo.get_by_id("qb_content_easy", "easy", fields=["id"])
+    assert record == {"id": "easy"}
+    assert conn.executed[-1] == (
+        "SELECT `difficulty_id` FROM question_bank_contents "
+        "WHERE difficulty_id = %s AND content_id = %s",
+        ("easy", "default"),
+    )
+
+
+@pytest.mark.asyncio
+async def test_query_rewrites_conditions_to_generated_columns(repo, fake_pool):
+    """测试 paper 的 user_uid/pass_status 条件改写为生成列，且结果中去除生成列。"""
+    async with repo:
+        await repo.delete("user", "warmup")
+        conn = fake_pool.created[0]
+        conn.rows = [
+            {
+                "paper_id": "p1",
+                "user_uid": "u1",
+                "user_uid_idx": "u1",
+                "pass_status": "PASSED",
+                "pass_status_idx": "PASSED",
+            }
+        ]
+        records = await repo.query(
+            "paper", {"user_uid": "u1", "pass_status": "PASSED"}, skip=5, limit=10
+        )
+    assert conn.executed[-1] == (
+        "SELECT * FROM papers WHERE `user_uid_idx` = %s AND `pass_status_idx` = %s "
+        "ORDER BY `paper_id` LIMIT %s OFFSET %s",
+        ("u1", "PASSED", 10, 5),
+    )
+    assert records == [{"paper_id": "p1", "user_uid": "u1", "pass_status": "PASSED"}]
+
+
+@pytest.mark.asyncio
+async def test_get_page_first_page_and_cursor_sql(repo, fake_pool):
+    """测试 get_page 首页不带 WHERE，后续页按 `after_id` 做键集定位。"""
+    async with repo:
+        await repo.get_page("paper", limit=2)
+        await repo.get_page("paper", after_id="p2", limit=2, fields=["user_uid"])
+    first, second = fake_pool.created[0].executed
+    assert first == ("SELECT * FROM papers ORDER BY `paper_id` LIMIT %s", (2,))
+    assert second == (
+        "SELECT `paper_id`, `user_uid` FROM papers WHERE `paper_id` > %s "
+        "ORDER BY `paper_id` LIMIT %s",
+        ("p2", 2),
+    )
+
+
+@pytest.mark.asyncio
+async def test_transaction_rolls_back_on_exception(repo, fake_pool):
+    """测试 transaction() 中出现异常时回滚并重新抛出，且连接归还连接池。"""
+    with pytest.raises(RuntimeError):
+        async with repo.transaction() as conn:
+            await repo.delete("user", "a", conn=conn)
+            raise RuntimeError("boom")
+    conn = fake_pool.created[0]
+    assert conn.events == ["begin", "rollback"]
+    assert fake_pool.in_use == []
+
+    async with repo.transaction():
+        pass
+    assert fake_pool.created[1].events == ["begin", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_update_without_full_record_returns_update_data_and_key(repo, fake_pool):
+    """测试 return_full_record=False 时不再读回记录，仅返回 update_data 加主键。"""
+    result = await repo.update("user", "a", {"nickname": "A"}, return_full_record=False)
+    assert result == {"nickname": "A", "uid": "a"}
+    assert len(fake_pool.created[0].executed) == 1
+
+    qb_result = await repo.update(
+        "qb_content_easy", "easy", {"questions": [1]}, return_full_record=False
+    )
+    assert qb_result == {"questions": [1], "id": "easy"}
+    assert fake_pool.created[1].executed == [
+        (
+            "UPDATE question_bank_contents SET `questions` = %s "
+            "WHERE difficulty_id = %s AND content_id = %s",
+            ("[1]", "easy", "default"),
+        )
+    ]
+
+
+# endregion